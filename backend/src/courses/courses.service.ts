@@ -3,7 +3,7 @@ import { InjectRepository } from '@nestjs/typeorm';
 import { In, Repository } from 'typeorm';
 import axios from 'axios';
 import { RiskBucket } from '../common/enums/risk-bucket.enum';
-import { MlService } from '../ml/ml.service';
+import { MlCourseRiskFeatures, MlService } from '../ml/ml.service';
 import { User } from '../users/user.entity';
 import { UserRole } from '../users/user-role.enum';
 import { AdminStudentsQueryDto } from './dto/admin-students-query.dto';
@@ -281,24 +281,24 @@ export class CoursesService {
       where: query.courseId ? { studentId: In(studentIds), id: query.courseId } : { studentId: In(studentIds) },
     });
     const usersById = new Map(students.map((s) => [s.id, s]));
-    const rows = await Promise.all(
-      courses.map(async (course) => {
-        const risk = await this.calculateCourseRisk(course.id, course.studentId, false, false);
-        const student = usersById.get(course.studentId);
-        return {
-          studentId: course.studentId,
-          studentName: student?.fullName ?? student?.email ?? course.studentId,
-          studentEmail: student?.email ?? null,
-          courseId: course.id,
-          courseTitle: course.title,
-          weightedPercent: risk.weightedPercent,
-          probabilityFail: risk.probabilityFail,
-          bucket: risk.bucket,
-          totalAbsences: risk.totalAbsences,
-          canStillPass: risk.canStillPass,
-        };
-      }),
-    );
+    const computations = await Promise.all(courses.map((course) => this.buildComputation(course, course.studentId, {})));
+    const evaluations = await this.evaluateMany(computations);
+    const rows = computations.map((computation, index) => {
+      const evaluated = evaluations[index];
+      const student = usersById.get(computation.studentId);
+      return {
+        studentId: computation.studentId,
+        studentName: student?.fullName ?? student?.email ?? computation.studentId,
+        studentEmail: student?.email ?? null,
+        courseId: computation.course.id,
+        courseTitle: computation.course.title,
+        weightedPercent: computation.weightedPercent,
+        probabilityFail: evaluated.probabilityFail,
+        bucket: evaluated.bucket as RiskBucket,
+        totalAbsences: computation.totalAbsences,
+        canStillPass: computation.maxAchievablePercent >= 50 && !evaluated.isAutoFail,
+      };
+    });
     const filtered = rows.filter((r) => (!query.bucket || r.bucket === query.bucket) && (!query.highRiskOnly || r.probabilityFail >= 0.66));
     filtered.sort((a, b) => (query.sort === 'asc' ? a.probabilityFail - b.probabilityFail : b.probabilityFail - a.probabilityFail));
     const total = filtered.length;
@@ -457,20 +457,29 @@ export class CoursesService {
   private async evaluate(computation: Computation): Promise<CourseRiskResult> {
     let mlProbability: number | undefined;
     try {
-      const ml = await this.mlService.predictCourseRisk({
-        weightedPercent: computation.weightedPercent,
-        remainingWeight: computation.remainingWeight,
-        maxAchievablePercent: computation.maxAchievablePercent,
-        totalAbsences: computation.totalAbsences,
-        absencesRate: clamp(computation.totalAbsences / 30, 0, 1),
-        missingWeeksCount: computation.missingWeeksCount,
-        examCompletedRatio: computation.examCompletedRatio,
-        quizTrend: computation.quizTrend,
-      });
+      const ml = await this.mlService.predictCourseRisk(toMlCourseRiskFeatures(computation));
       mlProbability = ml.probabilityFail;
     } catch {
       mlProbability = undefined;
     }
+    return this.scoreComputation(computation, mlProbability);
+  }
+
+  // One /predict-risk/batch call for a whole listing instead of one HTTP round trip per course.
+  private async evaluateMany(computations: Computation[]): Promise<CourseRiskResult[]> {
+    let mlProbabilities: Array<number | undefined> = computations.map(() => undefined);
+    if (computations.length) {
+      try {
+        const ml = await this.mlService.predictCourseRiskBatch(computations.map(toMlCourseRiskFeatures));
+        mlProbabilities = ml.probabilityFail;
+      } catch {
+        mlProbabilities = computations.map(() => undefined);
+      }
+    }
+    return computations.map((computation, index) => this.scoreComputation(computation, mlProbabilities[index]));
+  }
+
+  private scoreComputation(computation: Computation, mlProbability: number | undefined): CourseRiskResult {
     return this.riskEngine.calculate({
       weightedPercent: computation.weightedPercent,
       remainingWeight: computation.remainingWeight,
@@ -617,6 +626,19 @@ function clamp(value: number, min: number, max: number) {
   return Math.min(Math.max(value, min), max);
 }
 
+function toMlCourseRiskFeatures(computation: Computation): MlCourseRiskFeatures {
+  return {
+    weightedPercent: computation.weightedPercent,
+    remainingWeight: computation.remainingWeight,
+    maxAchievablePercent: computation.maxAchievablePercent,
+    totalAbsences: computation.totalAbsences,
+    absencesRate: clamp(computation.totalAbsences / 30, 0, 1),
+    missingWeeksCount: computation.missingWeeksCount,
+    examCompletedRatio: computation.examCompletedRatio,
+    quizTrend: computation.quizTrend,
+  };
+}
+
 function toAbsenceStatus(totalAbsences: number): 'ok' | 'warning' | 'critical' | 'auto_fail' {
   if (totalAbsences > 30) return 'auto_fail';
   if (totalAbsences >= 25) return 'critical';
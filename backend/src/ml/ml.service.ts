@@ -42,6 +42,10 @@ export interface MlCourseRiskResponse {
   probabilityFail: number;
 }
 
+export interface MlCourseRiskBatchResponse {
+  probabilityFail: number[];
+}
+
 @Injectable()
 export class MlService {
   private readonly client: AxiosInstance;
@@ -101,4 +105,13 @@ export class MlService {
       throw new BadGatewayException('ML course risk request failed');
     }
   }
+
+  async predictCourseRiskBatch(rows: MlCourseRiskFeatures[]): Promise<MlCourseRiskBatchResponse> {
+    try {
+      const { data } = await this.client.post('/predict-risk/batch', { rows });
+      return data;
+    } catch (error) {
+      throw new BadGatewayException('ML course risk batch request failed');
+    }
+  }
 }
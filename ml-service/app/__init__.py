@@ -1 +1,6 @@
 # Package marker for app module.
+import time
+
+# Set when the package is first imported; app.main reports the time from here until its
+# own imports finish as the "imports" startup phase.
+IMPORT_STARTED_AT = time.perf_counter()
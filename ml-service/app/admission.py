@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from app.metrics import ADMISSION_EVENTS, ADMISSION_QUEUE_WAIT
+
+
+class AdmissionError(RuntimeError):
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class EndpointBusyError(AdmissionError):
+    # The endpoint's own limit and queue are used up; other endpoints may still have room.
+    pass
+
+
+class AdmissionTimeoutError(AdmissionError):
+    pass
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    # "predict=8,predict_batch=2": endpoint names are the request_scope labels.
+    limits: Dict[str, int] = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        endpoint, separator, value = entry.partition("=")
+        if not separator or not endpoint.strip() or not value.strip().isdigit() or int(value) < 1:
+            raise ValueError(f"Invalid admission limit '{entry.strip()}'; expected <endpoint>=<positive int>")
+        limits[endpoint.strip()] = int(value)
+    return limits
+
+
+def retry_after_seconds(seconds_per_call: float | None, backlog: int, slots: int) -> int:
+    # Whole seconds until the work ahead of a new request should have drained.
+    if seconds_per_call is None:
+        return 1
+    return max(1, math.ceil(seconds_per_call * backlog / max(slots, 1)))
+
+
+class _Gate:
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.seconds_per_request: float | None = None
+        self.counts = {"admitted": 0, "queued": 0, "rejected": 0, "timedOut": 0}
+
+
+class AdmissionController:
+    # Per-endpoint concurrency limits for the expensive routes. A request over the limit
+    # waits in a short bounded queue; a full queue is rejected at once and a wait longer
+    # than the timeout gives up, both with a Retry-After estimate. Handlers are sync and run
+    # on the server's threadpool, so waiting requests hold a thread: keep limits plus queues
+    # below the pool size and cheap routes such as /health always find a free thread.
+    def __init__(self, limits: Dict[str, int], queue_depth: int, queue_timeout_ms: float, alpha: float = 0.2) -> None:
+        self._gates = {endpoint: _Gate(limit) for endpoint, limit in limits.items()}
+        self._queue_depth = max(queue_depth, 0)
+        self._queue_timeout = max(queue_timeout_ms, 0.0) / 1000.0
+        self._alpha = alpha
+
+    @contextmanager
+    def admit(self, endpoint: str) -> Iterator[None]:
+        gate = self._gates.get(endpoint)
+        if gate is None:
+            yield
+            return
+
+        with gate.condition:
+            if gate.active >= gate.limit:
+                if gate.waiting >= self._queue_depth:
+                    gate.counts["rejected"] += 1
+                    ADMISSION_EVENTS.inc(endpoint=endpoint, event="rejected")
+                    raise EndpointBusyError(f"{endpoint} is at its concurrency limit, retry shortly", self._retry_after(gate))
+                gate.counts["queued"] += 1
+                ADMISSION_EVENTS.inc(endpoint=endpoint, event="queued")
+                gate.waiting += 1
+                queued_at = time.perf_counter()
+                try:
+                    while gate.active >= gate.limit:
+                        remaining = queued_at + self._queue_timeout - time.perf_counter()
+                        if remaining <= 0:
+                            gate.counts["timedOut"] += 1
+                            ADMISSION_EVENTS.inc(endpoint=endpoint, event="timed_out")
+                            raise AdmissionTimeoutError(f"{endpoint} stayed saturated, retry shortly", self._retry_after(gate))
+                        gate.condition.wait(remaining)
+                finally:
+                    gate.waiting -= 1
+                ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - queued_at, endpoint=endpoint)
+            gate.active += 1
+            gate.counts["admitted"] += 1
+        ADMISSION_EVENTS.inc(endpoint=endpoint, event="admitted")
+
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with gate.condition:
+                gate.active -= 1
+                if gate.seconds_per_request is None:
+                    gate.seconds_per_request = elapsed
+                else:
+                    gate.seconds_per_request += self._alpha * (elapsed - gate.seconds_per_request)
+                # Every waiter re-checks: one that just timed out must not swallow the wake-up.
+                gate.condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        endpoints: Dict[str, Any] = {}
+        for endpoint, gate in self._gates.items():
+            with gate.condition:
+                endpoints[endpoint] = {
+                    "limit": gate.limit,
+                    "active": gate.active,
+                    "waiting": gate.waiting,
+                    "secondsPerRequest": gate.seconds_per_request,
+                    **gate.counts,
+                }
+        return {"queueDepth": self._queue_depth, "queueTimeoutMs": self._queue_timeout * 1000.0, "endpoints": endpoints}
+
+    def _retry_after(self, gate: _Gate) -> int:
+        # Called with the gate's condition held.
+        return retry_after_seconds(gate.seconds_per_request, gate.active + gate.waiting, gate.limit)
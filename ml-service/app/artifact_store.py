@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Iterator, List, Tuple
+
+import joblib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock; single-process dev only.
+    fcntl = None  # type: ignore[assignment]
+
+
+@contextmanager
+def artifact_lock(path: str | Path) -> Iterator[None]:
+    # Exclusive advisory lock on "<artifact>.lock", shared by every worker process on the
+    # host, so only one of them trains or replaces the artifact at a time.
+    lock_path = Path(f"{path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def claim(path: str | Path) -> IO[str] | None:
+    # Non-blocking lock on "<path>.lock" for work that only one process should start. The
+    # claim lasts until the returned handle is closed or the process exits.
+    lock_path = Path(f"{path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    handle = open(lock_path, "a+")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+    return handle
+
+
+def file_identity(path: str | Path) -> Tuple[int, int]:
+    # Every write is a rename, so a new inode or mtime means a new artifact.
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def atomic_dump(payload: Any, target: str | Path) -> None:
+    # Write-then-rename: readers see the old file or the new one, never a partial dump, and
+    # processes that memory-mapped the old file keep its inode until they let go of it.
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        # Uncompressed, so load_artifact can memory-map the arrays.
+        joblib.dump(payload, temporary)
+        os.replace(temporary, target)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+
+
+def atomic_copy(source: str | Path, target: str | Path) -> None:
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        shutil.copyfile(source, temporary)
+        os.replace(temporary, target)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+
+
+def touch(path: str | Path) -> None:
+    # The modification time doubles as the last-used time for prune_least_recent.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_least_recent(directory: str | Path, pattern: str, keep: int) -> List[Path]:
+    # Deletes all but the `keep` most recently used files matching pattern; a process that
+    # still has a removed file memory-mapped keeps reading it until it lets go. Their
+    # "<path>.lock" files stay: a process may have one open, about to lock it, and a lock
+    # taken on a deleted file would not exclude one taken on its recreated namesake.
+    entries = []
+    for path in Path(directory).glob(pattern):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    removed: List[Path] = []
+    for _, path in entries[max(keep, 1) :]:
+        try:
+            path.unlink()
+            removed.append(path)
+        except OSError:
+            continue
+    return removed
+
+
+def load_artifact(path: str | Path, mmap: bool = True) -> Any:
+    # With mmap, numpy arrays stay read-only views of the file, so every worker that loads
+    # the same artifact shares one page-cache copy. Estimators that copy their arrays into
+    # native buffers on unpickling (sklearn trees) still get a private copy per process.
+    return joblib.load(path, mmap_mode="r" if mmap else None)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+
+from app.config import settings
+from app.service import ModelManager
+
+
+def bake() -> dict:
+    # Build-time step: train (or reuse) the artifact for the image's settings and warm it
+    # once, so a container starting from the image loads it instead of training, and a
+    # broken explainer or fast path fails the build rather than the first request.
+    started_at = time.perf_counter()
+    manager = ModelManager()
+    manager.ensure_ready()
+    # A stale artifact is served while it rebuilds in the background; the image needs the rebuilt one.
+    while manager.retrain_status()["state"] == "running":
+        time.sleep(1)
+    retrain = manager.retrain_status()
+    if retrain["state"] not in ("idle", "succeeded"):
+        raise RuntimeError(f"Rebuild of the stale artifact {retrain['state']}: {retrain.get('reason') or retrain.get('error')}")
+    manager.warm()
+    health = manager.health()
+    if health["artifact"]["stale"]:
+        raise RuntimeError(f"Artifact {health['artifact']['key']} does not match the image's settings ({health['artifact']['expectedKey']})")
+    if health["startup"].get("warm", {}).get("state") != "done":
+        raise RuntimeError(f"Warm-up failed: {health['startup'].get('warm')}")
+    return {
+        "artifactDir": settings.artifact_dir,
+        "modelName": health["modelName"],
+        "modelVersion": health["modelVersion"],
+        "artifactKey": health["artifact"]["key"],
+        "source": health["startup"]["load"]["source"],
+        "seconds": time.perf_counter() - started_at,
+        "startup": health["startup"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train and warm the model artifact ahead of time (e.g. in a Docker build).")
+    parser.add_argument("--report", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+    try:
+        report = bake()
+    except Exception as error:
+        print(f"Bake failed: {error}", file=sys.stderr)
+        sys.exit(1)
+    if args.report:
+        print(json.dumps(report, indent=2))
+    print(
+        f"Baked {report['modelName']} {report['modelVersion']} (key {report['artifactKey']}, {report['source']}) "
+        f"into {report['artifactDir']} in {report['seconds']:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
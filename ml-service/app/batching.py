@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from app.metrics import MICRO_BATCH_QUEUE_WAIT, MICRO_BATCH_SIZE, request_scope
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+# Longest stop() waits for the batch in progress before shutdown goes on without it.
+STOP_TIMEOUT_SECONDS = 5.0
+
+
+@dataclass
+class _PendingPrediction:
+    features: Dict[str, Any]
+    # (explanation_mode, top_k, latency_budget_ms) as passed to ModelManager.predict.
+    options: Tuple[str | None, int | None, float | None] = (None, None, None)
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    def __init__(self, model_manager: Any, max_wait_ms: float, max_batch_size: int, queue_depth: int) -> None:
+        self._model_manager = model_manager
+        self._max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self._max_batch_size = max(max_batch_size, 1)
+        self._queue: queue.Queue[_PendingPrediction | None] = queue.Queue(maxsize=max(queue_depth, 1))
+        self._thread: threading.Thread | None = None
+        self._last_batch_size = 1
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        try:
+            self._queue.put(None, timeout=STOP_TIMEOUT_SECONDS)
+        except queue.Full:
+            pass
+        thread.join(timeout=STOP_TIMEOUT_SECONDS)
+        # Requests still queued get an error instead of waiting on a thread that is gone.
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not None:
+                pending.future.set_exception(QueueFullError("Prediction queue is shutting down"))
+
+    def predict(
+        self,
+        features: Dict[str, Any],
+        explanation_mode: str | None = None,
+        top_k: int | None = None,
+        latency_budget_ms: float | None = None,
+    ) -> Dict[str, Any]:
+        return self.submit(features, explanation_mode, top_k, latency_budget_ms).result()
+
+    def submit(
+        self,
+        features: Dict[str, Any],
+        explanation_mode: str | None = None,
+        top_k: int | None = None,
+        latency_budget_ms: float | None = None,
+    ) -> Future:
+        pending = _PendingPrediction(features=features, options=(explanation_mode, top_k, latency_budget_ms))
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full as error:
+            raise QueueFullError("Prediction queue is full") from error
+        return pending.future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._thread is not None,
+            "queued": self._queue.qsize(),
+            "batchSize": MICRO_BATCH_SIZE.snapshot().get("total", {}),
+            "queueWaitSeconds": MICRO_BATCH_QUEUE_WAIT.snapshot().get("total", {}),
+        }
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop_requested = self._collect(batch)
+            self._execute(batch)
+            if stop_requested:
+                return
+
+    def _collect(self, batch: List[_PendingPrediction]) -> bool:
+        # Only hold the window open while recent traffic actually produced batches;
+        # an isolated request is dispatched immediately instead of paying max_wait.
+        deadline = batch[0].enqueued_at + (self._max_wait if self._last_batch_size > 1 else 0.0)
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    def _execute(self, batch: List[_PendingPrediction]) -> None:
+        started_at = time.perf_counter()
+        for pending in batch:
+            MICRO_BATCH_QUEUE_WAIT.observe(started_at - pending.enqueued_at)
+        MICRO_BATCH_SIZE.observe(len(batch))
+        self._last_batch_size = len(batch)
+
+        # Requests asking for different explanation settings are scored as separate sub-batches.
+        # Budgets only split batches by whether one was given; a group runs under the
+        # tightest budget left among its requests.
+        groups: Dict[Tuple[str | None, int | None, bool], List[_PendingPrediction]] = {}
+        for pending in batch:
+            explanation_mode, top_k, latency_budget_ms = pending.options
+            groups.setdefault((explanation_mode, top_k, latency_budget_ms is not None), []).append(pending)
+        for (explanation_mode, top_k, budgeted), group in groups.items():
+            latency_budget_ms = None
+            if budgeted:
+                # Each budget started when its request was queued, not when the batch runs.
+                now = time.perf_counter()
+                latency_budget_ms = max(
+                    min(pending.options[2] - (now - pending.enqueued_at) * 1000.0 for pending in group), 1e-3
+                )
+            self._execute_group(group, explanation_mode, top_k, latency_budget_ms)
+
+    def _execute_group(
+        self,
+        group: List[_PendingPrediction],
+        explanation_mode: str | None,
+        top_k: int | None,
+        latency_budget_ms: float | None,
+    ) -> None:
+        try:
+            # Stages of a coalesced batch are recorded under their own endpoint label.
+            with request_scope("micro_batch"):
+                results = self._model_manager.predict_many(
+                    [pending.features for pending in group], explanation_mode, top_k, latency_budget_ms
+                )
+        except Exception as error:
+            for pending in group:
+                pending.future.set_exception(error)
+            return
+
+        for pending, result in zip(group, results):
+            if "error" in result:
+                pending.future.set_exception(ValueError(result["error"]))
+                continue
+            result.pop("index", None)
+            pending.future.set_result(result)
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+import shap
+import sklearn
+
+from app.config import settings
+from app.data_loader import load_training_data, resolve_test_dataset_path, resolve_train_dataset_path
+from app.explainability import local_explanations
+from app.feature_map import FEATURE_KEYS, FEATURE_TYPES_BY_KEY
+from app.service import ModelManager, bundle_from_artifacts, train_with_settings, write_bundle
+from app.utils import ensure_feature_frame_dict
+
+BATCH_SIZES = (1, 10, 100, 1000)
+DEFAULT_TOLERANCE = 0.25
+
+
+def run_benchmarks(
+    iterations: int = 200,
+    batch_sizes: Sequence[int] = BATCH_SIZES,
+    time_budget_seconds: float = 2.0,
+) -> Dict[str, Any]:
+    dataset_path = resolve_train_dataset_path(settings.data_root, settings.train_dataset)
+    holdout_path = resolve_test_dataset_path(settings.data_root) or dataset_path
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with tempfile.TemporaryDirectory(prefix="riskedu-bench-") as scratch:
+        scratch_dir = Path(scratch)
+
+        # Data loading: a cold parse, then reads served from a freshly written cache.
+        results["load_training_data.parse"] = _latency(
+            lambda: load_training_data(dataset_path, None, settings.ingest_chunk_rows),
+            iterations=max(iterations // 20, 5),
+            budget_seconds=time_budget_seconds,
+        )
+        load_training_data(dataset_path, scratch_dir / "cache", settings.ingest_chunk_rows)
+        results["load_training_data.cached"] = _latency(
+            lambda: load_training_data(dataset_path, scratch_dir / "cache", settings.ingest_chunk_rows),
+            iterations=max(iterations // 20, 5),
+            budget_seconds=time_budget_seconds,
+        )
+
+        features_df, labels = load_training_data(dataset_path, None, settings.ingest_chunk_rows)
+        started_at = time.perf_counter()
+        artifacts = train_with_settings(features_df, labels)
+        results["train_best_model"] = _summarize([time.perf_counter() - started_at])
+
+        holdout_df, _ = load_training_data(holdout_path, None, settings.ingest_chunk_rows)
+        rows = _feature_rows(holdout_df)
+        rng = np.random.default_rng(settings.random_state)
+
+        # Every candidate is benchmarked so both the linear and the tree explainer paths are covered.
+        for model_name in artifacts.candidate_models:
+            artifact_dir = scratch_dir / model_name
+            write_bundle(bundle_from_artifacts(artifacts, dataset_path, model_name=model_name), artifact_dir / "model.joblib")
+
+            # A fresh manager per call measures joblib load plus explainer/compiled preprocessor setup.
+            # Read-only managers serve the scratch bundle as written instead of checking its key.
+            results[f"artifact_load.{model_name}"] = _latency(
+                lambda: _load_warm(artifact_dir),
+                iterations=max(iterations // 20, 3),
+                budget_seconds=time_budget_seconds,
+            )
+
+            # The prediction cache is disabled so every call exercises the scoring path.
+            manager = _load_warm(artifact_dir)
+            bundle = manager.current_bundle()
+            row_cycle = _cycle(rows)
+
+            results[f"predict.{model_name}"] = _latency(
+                lambda: manager.predict(next(row_cycle)),
+                iterations=iterations,
+                budget_seconds=time_budget_seconds,
+            )
+            results[f"what_if.{model_name}"] = _latency(
+                lambda: manager.what_if(next(row_cycle), _what_if_override(rng)),
+                iterations=iterations,
+                budget_seconds=time_budget_seconds,
+            )
+
+            transformed_rows = [
+                bundle["preprocessor"].transform(pd.DataFrame([row], columns=FEATURE_KEYS)) for row in rows
+            ]
+            explanation_inputs = _cycle(list(zip(transformed_rows, rows)))
+
+            def explain_one() -> Any:
+                transformed_row, row = next(explanation_inputs)
+                return local_explanations(
+                    model=bundle["model"],
+                    transformed_feature_names=bundle["transformedFeatureNames"],
+                    background_matrix=bundle["backgroundMatrix"],
+                    transformed_row=transformed_row,
+                    original_row=pd.DataFrame([row], columns=FEATURE_KEYS),
+                    explainer=bundle.get("explainer"),
+                )
+
+            results[f"local_explanations.{model_name}"] = _latency(
+                explain_one, iterations=iterations, budget_seconds=time_budget_seconds
+            )
+
+            for batch_size in batch_sizes:
+                batch = [rows[index] for index in rng.integers(0, len(rows), size=batch_size)]
+                results[f"predict_many.{model_name}.batch{batch_size}"] = _throughput(
+                    lambda: manager.predict_many(batch),
+                    rows_per_call=batch_size,
+                    iterations=max(iterations // max(batch_size, 1), 3),
+                    budget_seconds=time_budget_seconds,
+                )
+
+    return {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+            "shap": shap.__version__,
+        },
+        "config": {
+            "datasetPath": str(dataset_path),
+            "holdoutPath": str(holdout_path),
+            "trainRows": int(len(features_df)),
+            "selectedModel": artifacts.model_name,
+            "cvFolds": settings.cv_folds,
+            "trainWorkers": settings.train_workers,
+            "compiledInference": settings.compiled_inference,
+            "backgroundSize": settings.background_size,
+            "backgroundMethod": settings.background_method,
+            "iterations": iterations,
+            "batchSizes": list(batch_sizes),
+        },
+        "benchmarks": results,
+    }
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> Dict[str, Any]:
+    # Latencies regress when the median grows, throughputs when rows/sec shrinks, by more than tolerance.
+    rows: List[Dict[str, Any]] = []
+    for name, current_entry in current["benchmarks"].items():
+        baseline_entry = baseline.get("benchmarks", {}).get(name)
+        if baseline_entry is None or baseline_entry.get("kind") != current_entry.get("kind"):
+            continue
+        if current_entry["kind"] == "throughput":
+            metric, higher_is_better = "rowsPerSecond", True
+        else:
+            metric, higher_is_better = "p50", False
+        before, after = baseline_entry[metric], current_entry[metric]
+        if not before:
+            continue
+        ratio = after / before
+        regressed = ratio < 1.0 - tolerance if higher_is_better else ratio > 1.0 + tolerance
+        rows.append({"name": name, "metric": metric, "baseline": before, "current": after, "ratio": ratio, "regressed": regressed})
+
+    return {
+        "tolerance": tolerance,
+        "compared": rows,
+        "regressions": [row["name"] for row in rows if row["regressed"]],
+        "missing": sorted(set(baseline.get("benchmarks", {})) - set(current["benchmarks"])),
+    }
+
+
+def _latency(call: Callable[[], Any], iterations: int, budget_seconds: float) -> Dict[str, Any]:
+    return _summarize(_time_calls(call, iterations, budget_seconds))
+
+
+def _throughput(call: Callable[[], Any], rows_per_call: int, iterations: int, budget_seconds: float) -> Dict[str, Any]:
+    durations = _time_calls(call, iterations, budget_seconds)
+    summary = _summarize(durations)
+    summary.update({"kind": "throughput", "rowsPerCall": rows_per_call, "rowsPerSecond": rows_per_call / summary["p50"]})
+    return summary
+
+
+def _time_calls(call: Callable[[], Any], iterations: int, budget_seconds: float) -> List[float]:
+    # One untimed warm-up call; then stop at the iteration count or the time budget, keeping at least three samples.
+    call()
+    durations: List[float] = []
+    deadline = time.perf_counter() + budget_seconds
+    while len(durations) < iterations and (len(durations) < 3 or time.perf_counter() < deadline):
+        started_at = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - started_at)
+    return durations
+
+
+def _summarize(durations: List[float]) -> Dict[str, Any]:
+    samples = np.asarray(durations, dtype=float)
+    return {
+        "kind": "latency",
+        "unit": "seconds",
+        "samples": int(samples.size),
+        "mean": float(samples.mean()),
+        "p50": float(np.percentile(samples, 50)),
+        "p90": float(np.percentile(samples, 90)),
+        "p99": float(np.percentile(samples, 99)),
+        "min": float(samples.min()),
+        "max": float(samples.max()),
+    }
+
+
+def _feature_rows(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    return [ensure_feature_frame_dict(record) for record in records]
+
+
+def _what_if_override(rng: np.random.Generator) -> Dict[str, Any]:
+    numeric_keys = [key for key in FEATURE_KEYS if FEATURE_TYPES_BY_KEY[key] == "numeric"]
+    return {numeric_keys[int(rng.integers(0, len(numeric_keys)))]: float(rng.uniform(0, 100))}
+
+
+def _load_warm(artifact_dir: Path) -> ModelManager:
+    manager = ModelManager(artifact_path=artifact_dir / "model.joblib", prediction_cache_size=0, read_only=True)
+    manager.ensure_ready()
+    manager.warm()
+    return manager
+
+
+def _cycle(items: List[Any]):
+    while True:
+        yield from items
+
+
+def _print_results(report: Dict[str, Any]) -> None:
+    for name, entry in report["benchmarks"].items():
+        line = f"{name:<45} p50={entry['p50'] * 1000:9.3f}ms p90={entry['p90'] * 1000:9.3f}ms p99={entry['p99'] * 1000:9.3f}ms"
+        if entry["kind"] == "throughput":
+            line += f" {entry['rowsPerSecond']:12.1f} rows/s"
+        print(line)
+
+
+def _print_comparison(comparison: Dict[str, Any]) -> None:
+    for row in comparison["compared"]:
+        flag = "REGRESSION" if row["regressed"] else "ok"
+        print(f"{row['name']:<45} {row['metric']:<13} x{row['ratio']:6.2f}  {flag}")
+    for name in comparison["missing"]:
+        print(f"{name:<45} missing from current run")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the ML service hot paths against the bundled data.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the suite and write the results as JSON")
+    run_parser.add_argument("--output", default=str(Path(settings.artifact_dir) / "benchmark.json"))
+    run_parser.add_argument("--iterations", type=int, default=200, help="Samples per single-row benchmark")
+    run_parser.add_argument("--batch-sizes", type=int, nargs="*", default=list(BATCH_SIZES))
+    run_parser.add_argument("--time-budget", type=float, default=2.0, help="Soft seconds cap per benchmark")
+    run_parser.add_argument("--baseline", help="Compare against this results file after the run")
+    run_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+
+    compare_parser = subparsers.add_parser("compare", help="Flag regressions between two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_benchmarks(args.iterations, args.batch_sizes, args.time_budget)
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(json.dumps(report, indent=2))
+        _print_results(report)
+        print(f"Wrote {output_path}")
+        if not args.baseline:
+            return
+        baseline = json.loads(Path(args.baseline).read_text())
+    else:
+        baseline = json.loads(Path(args.baseline).read_text())
+        report = json.loads(Path(args.current).read_text())
+
+    comparison = compare_results(baseline, report, args.tolerance)
+    _print_comparison(comparison)
+    if comparison["regressions"]:
+        print(f"{len(comparison['regressions'])} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Tuple
+
+from app.feature_map import FEATURE_KEYS
+from app.metrics import PREDICTION_CACHE_EVENTS
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, max_bytes: int = 0) -> None:
+        # Bounded by entry count and, when max_bytes is set, by the estimated size of the
+        # entries: a SHAP entry is about ten times the size of a bare probability.
+        self._max_entries = max(max_entries, 0)
+        self._max_bytes = max(max_bytes, 0)
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0
+
+    def get(self, key: Hashable) -> Dict[str, Any] | None:
+        return self.get_first([key])
+
+    def get_first(self, keys: Iterable[Hashable]) -> Dict[str, Any] | None:
+        # The first live entry among alternative keys; counts as one hit or one miss.
+        if not self.enabled:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value, size = entry
+                if self._ttl_seconds > 0 and expires_at < now:
+                    del self._entries[key]
+                    self._bytes -= size
+                    PREDICTION_CACHE_EVENTS.inc(event="expired")
+                    continue
+                self._entries.move_to_end(key)
+                PREDICTION_CACHE_EVENTS.inc(event="hit")
+                return dict(value)
+            PREDICTION_CACHE_EVENTS.inc(event="miss")
+            return None
+
+    def put(self, key: Hashable, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        size = estimate_bytes(key) + estimate_bytes(value)
+        if self._max_bytes and size > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (time.monotonic() + self._ttl_seconds, dict(value), size)
+            self._bytes += size
+            while len(self._entries) > self._max_entries or (self._max_bytes and self._bytes > self._max_bytes):
+                self._bytes -= self._entries.popitem(last=False)[1][2]
+                PREDICTION_CACHE_EVENTS.inc(event="eviction")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size, used_bytes = len(self._entries), self._bytes
+        return {
+            "enabled": self.enabled,
+            "size": size,
+            "maxEntries": self._max_entries,
+            "bytes": used_bytes,
+            "maxBytes": self._max_bytes,
+            "hits": PREDICTION_CACHE_EVENTS.value(event="hit"),
+            "misses": PREDICTION_CACHE_EVENTS.value(event="miss"),
+            "evictions": PREDICTION_CACHE_EVENTS.value(event="eviction"),
+            "expired": PREDICTION_CACHE_EVENTS.value(event="expired"),
+        }
+
+
+class CacheJournal(PredictionCache):
+    # Cache for offload workers: it never hits (the server looks rows up before offloading)
+    # and records the last max_entries writes, which the worker sends back for the server's cache.
+    def __init__(self, max_entries: int) -> None:
+        super().__init__(0, 0.0)
+        self._written: Deque[Tuple[Hashable, Dict[str, Any]]] = deque(maxlen=max(max_entries, 0))
+
+    def put(self, key: Hashable, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._written.append((key, dict(value)))
+
+    def drain(self) -> List[Tuple[Hashable, Dict[str, Any]]]:
+        with self._lock:
+            written = list(self._written)
+            self._written.clear()
+        return written
+
+
+def feature_cache_key(model_version: str, row: Dict[str, Any], explanation_mode: str = "shap") -> Tuple[Any, ...]:
+    # Rows come from ensure_feature_frame_dict; NaN never equals itself, so missing
+    # values are folded to None to keep equal rows hashing to the same key.
+    return (model_version, explanation_mode) + tuple(_hashable(row.get(key)) for key in FEATURE_KEYS)
+
+
+def estimate_bytes(value: Any) -> int:
+    # Deep sys.getsizeof over the dicts, lists and tuples a cached prediction is made of.
+    # Strings shared between entries are counted for each, so it errs on the large side.
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_bytes(key) + estimate_bytes(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_bytes(item) for item in value)
+    return size
+
+
+def _hashable(value: Any) -> Any:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.feature_map import FEATURE_KEYS
+
+if TYPE_CHECKING:
+    from sklearn.compose import ColumnTransformer
+
+
+@dataclass(frozen=True)
+class CompiledPreprocessor:
+    # Plain-array copy of the fitted build_preprocessor() pipeline. Numeric columns
+    # dropped by the imputer (no observed values at fit time) are already excluded.
+    numeric_keys: List[str]
+    numeric_medians: np.ndarray
+    numeric_means: np.ndarray
+    numeric_scales: np.ndarray
+    categorical_keys: List[str]
+    categorical_modes: List[str]
+    categorical_offsets: np.ndarray
+    category_columns: List[Dict[str, int]]
+    n_output_features: int
+
+    def transform_row(self, row: Dict[str, Any]) -> np.ndarray:
+        return self.transform_rows([row])
+
+    def transform_rows(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        n_rows = len(rows)
+        n_numeric = len(self.numeric_keys)
+        output = np.zeros((n_rows, self.n_output_features), dtype=np.float64)
+
+        numeric = np.array(
+            [[_as_float(row.get(key)) for key in self.numeric_keys] for row in rows],
+            dtype=np.float64,
+        ).reshape(n_rows, n_numeric)
+        missing = np.isnan(numeric)
+        if missing.any():
+            numeric[missing] = np.broadcast_to(self.numeric_medians, numeric.shape)[missing]
+        # Same operation order as StandardScaler.transform so outputs match bit for bit.
+        numeric -= self.numeric_means
+        numeric /= self.numeric_scales
+        output[:, :n_numeric] = numeric
+
+        for feature_index, key in enumerate(self.categorical_keys):
+            lookup = self.category_columns[feature_index]
+            offset = int(self.categorical_offsets[feature_index])
+            mode = self.categorical_modes[feature_index]
+            for row_index, row in enumerate(rows):
+                value = row.get(key)
+                if _is_missing(value):
+                    value = mode
+                column = lookup.get(str(value))
+                # Unknown categories encode as all zeros, like handle_unknown="ignore".
+                if column is not None:
+                    output[row_index, offset + column] = 1.0
+        return output
+
+
+def compile_preprocessor(preprocessor: ColumnTransformer) -> CompiledPreprocessor:
+    transformers = {name: (transformer, columns) for name, transformer, columns in preprocessor.transformers_}
+    if set(transformers) - {"num", "cat", "remainder"}:
+        raise ValueError("Unsupported preprocessor layout for compiled inference")
+
+    numeric_pipeline, numeric_columns = transformers["num"]
+    numeric_imputer = numeric_pipeline.named_steps["imputer"]
+    scaler = numeric_pipeline.named_steps["scaler"]
+    medians = np.asarray(numeric_imputer.statistics_, dtype=np.float64)
+    kept = ~np.isnan(medians)
+    numeric_keys = [key for key, keep in zip(numeric_columns, kept) if keep]
+    n_numeric = len(numeric_keys)
+    means = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(n_numeric)
+    scales = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(n_numeric)
+
+    categorical_pipeline, categorical_columns = transformers["cat"]
+    categorical_imputer = categorical_pipeline.named_steps["imputer"]
+    encoder = categorical_pipeline.named_steps["onehot"]
+    if encoder.drop_idx_ is not None or getattr(encoder, "infrequent_categories_", None):
+        raise ValueError("Compiled inference does not support dropped or infrequent categories")
+
+    categorical_keys: List[str] = []
+    categorical_modes: List[str] = []
+    category_columns: List[Dict[str, int]] = []
+    offsets: List[int] = []
+    offset = n_numeric
+    kept_categorical = [
+        (key, mode) for key, mode in zip(categorical_columns, categorical_imputer.statistics_) if not _is_missing(mode)
+    ]
+    for (key, mode), categories in zip(kept_categorical, encoder.categories_):
+        categorical_keys.append(key)
+        categorical_modes.append(str(mode))
+        category_columns.append({str(category): index for index, category in enumerate(categories)})
+        offsets.append(offset)
+        offset += len(categories)
+
+    if offset != len(preprocessor.get_feature_names_out()):
+        raise ValueError("Compiled preprocessor does not match the fitted output width")
+
+    return CompiledPreprocessor(
+        numeric_keys=numeric_keys,
+        numeric_medians=medians[kept],
+        numeric_means=means,
+        numeric_scales=scales,
+        categorical_keys=categorical_keys,
+        categorical_modes=categorical_modes,
+        categorical_offsets=np.asarray(offsets, dtype=np.int64),
+        category_columns=category_columns,
+        n_output_features=offset,
+    )
+
+
+def max_parity_error(compiled: CompiledPreprocessor, preprocessor: ColumnTransformer, rows: List[Dict[str, Any]]) -> float:
+    expected = preprocessor.transform(pd.DataFrame(rows, columns=FEATURE_KEYS))
+    if hasattr(expected, "toarray"):
+        expected = expected.toarray()
+    actual = compiled.transform_rows(rows)
+    if actual.shape != expected.shape:
+        return float("inf")
+    return float(np.max(np.abs(actual - np.asarray(expected, dtype=np.float64)), initial=0.0))
+
+
+def _as_float(value: Any) -> float:
+    if value is None:
+        return np.nan
+    return float(value)
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
@@ -8,6 +8,52 @@ class Settings:
     artifact_dir: str = os.getenv("ARTIFACT_DIR", "/app/artifacts")
     train_dataset: str = os.getenv("TRAIN_DATASET", "none.csv")
     random_state: int = int(os.getenv("RANDOM_STATE", "42"))
+    cv_folds: int = int(os.getenv("CV_FOLDS", "5"))
+    train_workers: int = int(os.getenv("TRAIN_WORKERS", "0"))
+    data_cache_dir: str = os.getenv("DATA_CACHE_DIR", os.path.join(os.getenv("ARTIFACT_DIR", "/app/artifacts"), "cache"))
+    background_size: int = int(os.getenv("BACKGROUND_SIZE", "100"))
+    background_method: str = os.getenv("BACKGROUND_METHOD", "kmeans")
+    background_fidelity_tolerance: float = float(os.getenv("BACKGROUND_FIDELITY_TOLERANCE", "0.05"))
+    ingest_chunk_rows: int = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+    retrain_min_f1: float = float(os.getenv("RETRAIN_MIN_F1", "0.0"))
+    retrain_max_f1_drop: float = float(os.getenv("RETRAIN_MAX_F1_DROP", "0.05"))
+    outcome_rebuild_rows: int = int(os.getenv("OUTCOME_REBUILD_ROWS", "5000"))
+    outcome_drift_threshold: float = float(os.getenv("OUTCOME_DRIFT_THRESHOLD", "0.5"))
+    outcome_learning_rate: float = float(os.getenv("OUTCOME_LEARNING_RATE", "0.01"))
+    outcome_update_epochs: int = int(os.getenv("OUTCOME_UPDATE_EPOCHS", "5"))
+    max_batch_rows: int = int(os.getenv("MAX_BATCH_ROWS", "10000"))
+    max_risk_batch_rows: int = int(os.getenv("MAX_RISK_BATCH_ROWS", "50000"))
+    max_sweep_points: int = int(os.getenv("MAX_SWEEP_POINTS", "2500"))
+    explanation_mode: str = os.getenv("EXPLANATION_MODE", "shap")
+    explanation_top_k: int = int(os.getenv("EXPLANATION_TOP_K", "5"))
+    persist_explainer: bool = os.getenv("PERSIST_EXPLAINER", "0") == "1"
+    artifact_mmap: bool = os.getenv("ARTIFACT_MMAP", "1") == "1"
+    artifact_cache_entries: int = int(os.getenv("ARTIFACT_CACHE_ENTRIES", "4"))
+    artifact_versions_kept: int = int(os.getenv("ARTIFACT_VERSIONS_KEPT", "20"))
+    preload_model: bool = os.getenv("PRELOAD_MODEL", "0") == "1"
+    model_registry_dir: str = os.getenv("MODEL_REGISTRY_DIR", os.path.join(os.getenv("ARTIFACT_DIR", "/app/artifacts"), "models"))
+    model_memory_budget_mb: float = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "1024"))
+    shadow_model: str = os.getenv("SHADOW_MODEL", "")
+    shadow_sample_rate: float = float(os.getenv("SHADOW_SAMPLE_RATE", "0"))
+    shadow_queue_depth: int = int(os.getenv("SHADOW_QUEUE_DEPTH", "64"))
+    compiled_inference: bool = os.getenv("COMPILED_INFERENCE", "1") == "1"
+    flat_forest_inference: bool = os.getenv("FLAT_FOREST_INFERENCE", "1") == "1"
+    flat_forest_max_rows: int = int(os.getenv("FLAT_FOREST_MAX_ROWS", "256"))
+    prediction_cache_size: int = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+    prediction_cache_ttl_seconds: float = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "600"))
+    prediction_cache_max_mb: float = float(os.getenv("PREDICTION_CACHE_MAX_MB", "32"))
+    micro_batch_enabled: bool = os.getenv("MICRO_BATCH_ENABLED", "0") == "1"
+    micro_batch_max_wait_ms: float = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2"))
+    micro_batch_max_size: int = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+    micro_batch_queue_depth: int = int(os.getenv("MICRO_BATCH_QUEUE_DEPTH", "1024"))
+    counterfactual_time_budget_ms: float = float(os.getenv("COUNTERFACTUAL_TIME_BUDGET_MS", "500"))
+    counterfactual_max_evaluations: int = int(os.getenv("COUNTERFACTUAL_MAX_EVALUATIONS", "20000"))
+    offload_workers: int = int(os.getenv("OFFLOAD_WORKERS", "0"))
+    offload_queue_depth: int = int(os.getenv("OFFLOAD_QUEUE_DEPTH", "16"))
+    admission_limits: str = os.getenv("ADMISSION_LIMITS", "predict=8,predict_batch=2,whatif=4,whatif_sweep=2,sensitivity=2,counterfactual=2")
+    admission_queue_depth: int = int(os.getenv("ADMISSION_QUEUE_DEPTH", "3"))
+    admission_queue_timeout_ms: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
 
 
 settings = Settings()
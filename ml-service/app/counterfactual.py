@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+# Rows per scored population: one flat-forest batch (FLAT_FOREST_MAX_ROWS defaults to 256).
+POPULATION_SIZE = 256
+GRID_POINTS = 16
+ELITES = 32
+MAX_ROUNDS = 100
+# Rounds without a better top result before the search stops early.
+PATIENCE = 5
+
+
+@dataclass(frozen=True)
+class SearchSpace:
+    # Per actionable feature: current value, inclusive bounds, the spread distances are
+    # measured in, and whether values are whole numbers.
+    origin: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    scales: np.ndarray
+    integral: np.ndarray
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    # Best first: fewest changed features, then smallest distance; one per changed set.
+    values: np.ndarray
+    probabilities: np.ndarray
+    distances: np.ndarray
+    evaluations: int
+    stopped_by: str
+
+
+def find_counterfactuals(
+    evaluate: Callable[[np.ndarray], np.ndarray],
+    space: SearchSpace,
+    threshold: float,
+    max_results: int,
+    time_budget_seconds: float,
+    max_evaluations: int,
+    random_state: int = 42,
+) -> SearchResult:
+    # Finds value vectors whose probability (from evaluate, one row per candidate) falls
+    # below threshold while changing as little as possible. Every feature alone across its
+    # range comes first; each round then scores one population: random sparse changes,
+    # plus elites pulled back towards the current values or with features reset.
+    started_at = time.perf_counter()
+    rng = np.random.default_rng(random_state)
+    found_values = np.empty((0, space.origin.size))
+    found_probabilities = np.empty(0)
+    evaluations = 0
+    best_key: Tuple[Tuple[int, float], ...] = ()
+    stale_rounds = 0
+    stopped_by = "completed"
+
+    population = _single_feature_grid(space)
+    for _ in range(MAX_ROUNDS):
+        population = population[: max_evaluations - evaluations]
+        probabilities = np.asarray(evaluate(population), dtype=float)
+        evaluations += len(population)
+        valid = probabilities < threshold
+        found_values = np.vstack([found_values, population[valid]])
+        found_probabilities = np.concatenate([found_probabilities, probabilities[valid]])
+
+        # Only the best few hundred are kept, ranked, plus the best of each changed-feature set
+        # so alternatives survive a head full of variations on one change. The head of the
+        # ranking seeds the next round.
+        order, changed, distances = _rank(found_values, space)
+        distinct = _distinct_changes(found_values[order], space)[:max_results]
+        order = order[sorted(set(range(min(len(order), ELITES * 4))) | set(distinct))]
+        found_values, found_probabilities = found_values[order], found_probabilities[order]
+        changed, distances = changed[order], distances[order]
+        key = tuple((int(count), round(float(distance), 9)) for count, distance in zip(changed, distances))[:max_results]
+        stale_rounds = stale_rounds + 1 if key == best_key else 0
+        best_key = key
+
+        if evaluations >= max_evaluations:
+            stopped_by = "max_evaluations"
+            break
+        if time.perf_counter() - started_at >= time_budget_seconds:
+            stopped_by = "time_budget"
+            break
+        if found_values.size and stale_rounds >= PATIENCE:
+            stopped_by = "converged"
+            break
+        population = _next_population(rng, space, found_values[:ELITES])
+
+    keep = _distinct_changes(found_values, space)[:max_results]
+    return SearchResult(
+        values=found_values[keep],
+        probabilities=found_probabilities[keep],
+        distances=distances[keep],
+        evaluations=evaluations,
+        stopped_by=stopped_by,
+    )
+
+
+def _single_feature_grid(space: SearchSpace) -> np.ndarray:
+    rows: List[np.ndarray] = []
+    for index in range(space.origin.size):
+        grid = np.tile(space.origin, (GRID_POINTS, 1))
+        grid[:, index] = np.linspace(space.lower[index], space.upper[index], GRID_POINTS)
+        rows.append(grid)
+    return _snap(np.vstack(rows), space)
+
+
+def _next_population(rng: np.random.Generator, space: SearchSpace, elites: np.ndarray) -> np.ndarray:
+    n_features = space.origin.size
+    n_random = POPULATION_SIZE // 2 if len(elites) else POPULATION_SIZE
+
+    # Random candidates change few features: subset size s is drawn with weight 1/s^2.
+    weights = 1.0 / np.arange(1, n_features + 1) ** 2
+    sizes = rng.choice(np.arange(1, n_features + 1), size=n_random, p=weights / weights.sum())
+    ranks = np.argsort(rng.random((n_random, n_features)), axis=1).argsort(axis=1)
+    values = space.lower + rng.random((n_random, n_features)) * (space.upper - space.lower)
+    population = [np.where(ranks < sizes[:, None], values, space.origin)]
+
+    if len(elites):
+        # Each feature of a picked elite is kept, reset to its current value, or moved part
+        # of the way back, so known solutions shrink towards the smallest change.
+        n_refined = POPULATION_SIZE - n_random
+        picked = elites[rng.integers(0, len(elites), size=n_refined)]
+        pull = rng.random((n_refined, n_features))
+        choice = rng.random((n_refined, n_features))
+        pull = np.where(choice < 0.25, 0.0, np.where(choice < 0.5, 1.0, pull))
+        population.append(space.origin + pull * (picked - space.origin))
+    return _snap(np.vstack(population), space)
+
+
+def _snap(values: np.ndarray, space: SearchSpace) -> np.ndarray:
+    # Untouched features keep their current value even when it is fractional (an imputed
+    # median) or outside the bounds, so they never count as a change.
+    snapped = np.clip(np.where(space.integral, np.round(values), values), space.lower, space.upper)
+    return np.where(values == space.origin, space.origin, snapped)
+
+
+def _rank(values: np.ndarray, space: SearchSpace) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    moved = np.abs(values - space.origin)
+    changed = (moved > 0).sum(axis=1)
+    distances = (moved / space.scales).sum(axis=1)
+    return np.lexsort((distances, changed)), changed, distances
+
+
+def _distinct_changes(values: np.ndarray, space: SearchSpace) -> List[int]:
+    # values arrive ranked; keep the best candidate per set of changed features, skipping
+    # those dominated by a kept smaller change (see _dominates).
+    moves = values - space.origin
+    seen = set()
+    keep: List[int] = []
+    for index, move in enumerate(moves):
+        pattern = tuple(move != 0)
+        if pattern in seen or any(_dominates(moves[kept], move) for kept in keep):
+            continue
+        seen.add(pattern)
+        keep.append(index)
+    return keep
+
+
+def _dominates(smaller: np.ndarray, move: np.ndarray) -> bool:
+    # move adds features to smaller and moves each of smaller's features at least as far in
+    # the same direction, so it asks for strictly more than a change that already works.
+    changed = smaller != 0
+    if np.count_nonzero(move) <= np.count_nonzero(changed):
+        return False
+    return bool(np.all(move[changed] * smaller[changed] > 0) and np.all(np.abs(move[changed]) >= np.abs(smaller[changed])))
@@ -1,14 +1,29 @@
 from __future__ import annotations
 
+import hashlib
+import os
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
 
-from app.feature_map import FEATURE_KEYS, FEATURE_TYPES_BY_KEY, RAW_OR_INTERNAL_TO_KEY, normalize_feature_key
+from app.feature_map import (
+    FEATURE_DEFINITIONS,
+    FEATURE_KEYS,
+    FEATURE_TYPES_BY_KEY,
+    RAW_OR_INTERNAL_TO_KEY,
+    normalize_feature_key,
+)
 
 LABEL_CANDIDATES = ["label", "fail_pass", "target", "result", "outcome", "fail"]
+LABEL_LOOKUP: Dict[str, float] = {
+    **{word: 1.0 for word in ("1", "fail", "failed", "true", "yes")},
+    **{word: 0.0 for word in ("0", "pass", "passed", "false", "no")},
+}
+LOADER_VERSION = "2"
+CACHED_LABEL_COLUMN = "__label__"
+DEFAULT_CHUNK_ROWS = 100_000
 
 
 def resolve_train_dataset_path(data_root: str, dataset_name: str) -> Path:
@@ -42,15 +57,64 @@ def resolve_train_dataset_path(data_root: str, dataset_name: str) -> Path:
     )
 
 
-def load_training_data(dataset_path: Path) -> Tuple[pd.DataFrame, pd.Series]:
-    dataframe = pd.read_csv(dataset_path, dtype=str)
-    # Dataset contains empty strings in numeric columns; normalize to NaN for imputation.
-    dataframe = dataframe.replace(r"^\s*$", np.nan, regex=True)
+def resolve_test_dataset_path(data_root: str) -> Path | None:
+    base = Path(data_root) / "test"
+    candidates = sorted((base / "csv").glob("*.csv")) + sorted(base.glob("*.csv"))
+    return candidates[0] if candidates else None
 
+
+def load_training_data(
+    dataset_path: Path,
+    cache_dir: str | Path | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Tuple[pd.DataFrame, pd.Series]:
+    cache_path = _cache_path(dataset_path, cache_dir) if cache_dir else None
+    if cache_path is not None and cache_path.exists():
+        try:
+            return _read_cache(cache_path)
+        except Exception:
+            pass
+
+    # Column mapping is resolved once from the header, then only mapped columns are parsed.
+    header = list(pd.read_csv(dataset_path, nrows=0).columns)
+    rename_map, label_column = _resolve_columns(header)
+    numeric_columns = [column for column, key in rename_map.items() if FEATURE_TYPES_BY_KEY[key] == "numeric"]
+    usecols = list(rename_map) + [label_column]
+
+    try:
+        # Fast path: the C parser types numeric columns directly (empty cells become NaN).
+        dtypes = {column: (np.float64 if column in numeric_columns else str) for column in usecols}
+        chunks = [
+            _clean_chunk(chunk, rename_map, label_column)
+            for chunk in pd.read_csv(dataset_path, usecols=usecols, dtype=dtypes, chunksize=chunk_rows)
+        ]
+    except ValueError:
+        # Junk or whitespace-only numeric cells: parse as text and coerce per column.
+        chunks = [
+            _clean_chunk(chunk, rename_map, label_column)
+            for chunk in pd.read_csv(dataset_path, usecols=usecols, dtype=str, chunksize=chunk_rows)
+        ]
+
+    if chunks:
+        cleaned = pd.concat([features for features, _ in chunks], ignore_index=True)
+        labels = pd.concat([chunk_labels for _, chunk_labels in chunks], ignore_index=True)
+    else:
+        cleaned = _empty_features()
+        labels = pd.Series([], dtype=int)
+
+    if cache_path is not None:
+        try:
+            _write_cache(cache_path, cleaned, labels)
+        except Exception:
+            pass
+    return cleaned, labels
+
+
+def _resolve_columns(columns: List[str]) -> Tuple[Dict[str, str], str]:
     rename_map: Dict[str, str] = {}
     label_column = None
 
-    for original_column in dataframe.columns:
+    for original_column in columns:
         normalized_name = normalize_feature_key(str(original_column))
         if normalized_name in RAW_OR_INTERNAL_TO_KEY:
             rename_map[original_column] = RAW_OR_INTERNAL_TO_KEY[normalized_name]
@@ -59,7 +123,7 @@ def load_training_data(dataset_path: Path) -> Tuple[pd.DataFrame, pd.Series]:
             label_column = original_column
 
     if label_column is None:
-        for original_column in dataframe.columns:
+        for original_column in columns:
             normalized_name = normalize_feature_key(str(original_column))
             if normalized_name == "label" or normalized_name.startswith("label"):
                 label_column = original_column
@@ -67,36 +131,94 @@ def load_training_data(dataset_path: Path) -> Tuple[pd.DataFrame, pd.Series]:
 
     if label_column is None:
         raise ValueError("Could not detect label column. Expected one of: label/fail_pass/target/result/outcome/fail")
+    return rename_map, label_column
 
-    dataframe = dataframe.rename(columns=rename_map)
-    for key in FEATURE_KEYS:
-        if key not in dataframe.columns:
-            dataframe[key] = np.nan
 
+def _clean_chunk(chunk: pd.DataFrame, rename_map: Dict[str, str], label_column: str) -> Tuple[pd.DataFrame, pd.Series]:
+    labels = _parse_labels(chunk[label_column])
+    chunk = chunk.rename(columns=rename_map)
+
+    columns: Dict[str, pd.Series] = {}
     for key in FEATURE_KEYS:
+        if key not in chunk.columns:
+            columns[key] = pd.Series(np.nan, index=chunk.index, dtype=np.float64 if FEATURE_TYPES_BY_KEY[key] == "numeric" else object)
+            continue
+        column = chunk[key]
         if FEATURE_TYPES_BY_KEY[key] == "numeric":
-            dataframe[key] = pd.to_numeric(dataframe[key], errors="coerce")
+            columns[key] = column if column.dtype == np.float64 else pd.to_numeric(column, errors="coerce")
         else:
-            dataframe[key] = dataframe[key].astype("string")
+            # Plain object strings with NaN for missing: pd.NA breaks SimpleImputer's mask.
+            blank = column.isna() | (column.str.strip() == "")
+            columns[key] = column.astype(object).where(~blank, np.nan)
+
+    features = pd.DataFrame(columns, index=chunk.index)
+    valid_mask = labels.notna()
+    return features.loc[valid_mask].reset_index(drop=True), labels.loc[valid_mask].astype(int).reset_index(drop=True)
+
+
+def _parse_labels(column: pd.Series) -> pd.Series:
+    # Vectorized equivalent of the old per-row parser: known words first, then integral 0/1.
+    normalized = column.astype(str).str.strip().str.lower().where(column.notna())
+    labels = normalized.map(LABEL_LOOKUP)
+    unresolved = labels.isna() & normalized.notna()
+    if unresolved.any():
+        numeric = np.trunc(pd.to_numeric(normalized[unresolved], errors="coerce"))
+        labels.loc[unresolved] = numeric.where(numeric.isin([0.0, 1.0]))
+    return labels.astype("Float64").astype("Int64")
+
+
+def file_digest(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(dataset_path: Path, cache_dir: str | Path) -> Path:
+    digest = hashlib.sha256(file_digest(dataset_path).encode())
+    # The feature map and loader version are part of the key: either changes the cleaned frame.
+    digest.update(LOADER_VERSION.encode())
+    digest.update(repr(FEATURE_DEFINITIONS).encode())
+    suffix = ".parquet" if _parquet_available() else ".pkl"
+    return Path(cache_dir) / f"{Path(dataset_path).stem}-{digest.hexdigest()[:24]}{suffix}"
+
+
+def _read_cache(cache_path: Path) -> Tuple[pd.DataFrame, pd.Series]:
+    if cache_path.suffix == ".parquet":
+        frame = pd.read_parquet(cache_path)
+    else:
+        frame = pd.read_pickle(cache_path)
+    labels = frame.pop(CACHED_LABEL_COLUMN).astype(int)
+    for key in FEATURE_KEYS:
+        if FEATURE_TYPES_BY_KEY[key] == "categorical":
+            frame[key] = frame[key].astype(object).where(frame[key].notna(), np.nan)
+    return frame[FEATURE_KEYS], labels
 
-    label_series = dataframe[label_column].apply(_parse_label).astype("Int64")
-    valid_mask = label_series.notna()
-    cleaned = dataframe.loc[valid_mask, FEATURE_KEYS].copy()
-    labels = label_series.loc[valid_mask].astype(int)
-    return cleaned, labels
 
+def _write_cache(cache_path: Path, features: pd.DataFrame, labels: pd.Series) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    frame = features.assign(**{CACHED_LABEL_COLUMN: labels.to_numpy()})
+    temporary = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+    if cache_path.suffix == ".parquet":
+        frame.to_parquet(temporary, index=False)
+    else:
+        frame.to_pickle(temporary)
+    os.replace(temporary, cache_path)
 
-def _parse_label(value: object) -> int | None:
-    if value is None or (isinstance(value, float) and np.isnan(value)):
-        return None
 
-    as_string = str(value).strip().lower()
-    if as_string in {"1", "fail", "failed", "true", "yes"}:
-        return 1
-    if as_string in {"0", "pass", "passed", "false", "no"}:
-        return 0
+def _parquet_available() -> bool:
     try:
-        numeric = int(float(as_string))
-        return 1 if numeric == 1 else 0 if numeric == 0 else None
-    except ValueError:
-        return None
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _empty_features() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            key: pd.Series([], dtype=np.float64 if FEATURE_TYPES_BY_KEY[key] == "numeric" else object)
+            for key in FEATURE_KEYS
+        }
+    )
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
 from scipy import sparse
 
-from app.training import map_transformed_to_base_feature
-from app.utils import display_name
+from app.metrics import EXPLAINER_CACHE_HITS, EXPLAINER_REBUILDS, SHAP_FALLBACKS, timed_stage
+from app.utils import display_name, map_transformed_to_base_feature
 
 
 def local_explanations(
@@ -17,65 +18,248 @@ def local_explanations(
     transformed_row: Any,
     original_row: pd.DataFrame,
     top_k: int = 5,
+    explainer: Any | None = None,
 ) -> List[Dict[str, Any]]:
-    contributions = _calculate_contributions(
+    return batch_local_explanations(
         model=model,
-        transformed_row=transformed_row,
+        transformed_feature_names=transformed_feature_names,
         background_matrix=background_matrix,
+        transformed_rows=transformed_row,
+        original_rows=[original_row.iloc[0].to_dict()],
+        top_k=top_k,
+        explainer=explainer,
+    )[0]
+
+
+def batch_local_explanations(
+    model: Any,
+    transformed_feature_names: List[str],
+    background_matrix: np.ndarray,
+    transformed_rows: Any,
+    original_rows: List[Dict[str, Any]],
+    top_k: int = 5,
+    explainer: Any | None = None,
+) -> List[List[Dict[str, Any]]]:
+    return explain_batch(
+        model=model,
+        transformed_feature_names=transformed_feature_names,
+        background_matrix=background_matrix,
+        transformed_rows=transformed_rows,
+        original_rows=original_rows,
+        top_k=top_k,
+        explainer=explainer,
+    )[0]
+
+
+def explain_batch(
+    model: Any,
+    transformed_feature_names: List[str],
+    background_matrix: np.ndarray,
+    transformed_rows: Any,
+    original_rows: List[Dict[str, Any]],
+    method: str = "shap",
+    top_k: int | None = 5,
+    explainer: Any | None = None,
+    proxy_weights: np.ndarray | None = None,
+    flat_forest: Any | None = None,
+) -> Tuple[List[List[Dict[str, Any]]], str]:
+    # Returns the explanations and the method that produced them: "fast" when the proxy
+    # was requested or SHAP fell back to it. top_k=None keeps every base feature.
+    contributions, method_used = _calculate_contributions(
+        model=model,
+        transformed_rows=transformed_rows,
+        background_matrix=background_matrix,
+        explainer=explainer,
+        method=method,
+        proxy_weights=proxy_weights,
+        flat_forest=flat_forest,
     )
 
-    grouped: Dict[str, float] = {}
-    for index, transformed_name in enumerate(transformed_feature_names):
+    # Group one-hot columns back to their base feature once for the whole batch.
+    base_features: List[str] = []
+    group_index: List[int] = []
+    for transformed_name in transformed_feature_names:
         base_feature = map_transformed_to_base_feature(transformed_name)
-        grouped[base_feature] = grouped.get(base_feature, 0.0) + float(contributions[index])
+        if base_feature not in base_features:
+            base_features.append(base_feature)
+        group_index.append(base_features.index(base_feature))
+
+    grouped = np.zeros((contributions.shape[0], len(base_features)), dtype=float)
+    np.add.at(grouped, (slice(None), np.asarray(group_index, dtype=int)), contributions)
 
-    original_values = original_row.iloc[0].to_dict()
-    explained = []
-    for feature_key, contribution in grouped.items():
-        explained.append(
-            {
-                "featureKey": feature_key,
-                "displayName": display_name(feature_key),
-                "contribution": contribution,
-                "direction": "increase_risk" if contribution >= 0 else "decrease_risk",
-                "value": _safe_json_value(original_values.get(feature_key)),
-            }
-        )
+    results: List[List[Dict[str, Any]]] = []
+    for row_index, original_values in enumerate(original_rows):
+        explained = []
+        for feature_index, feature_key in enumerate(base_features):
+            contribution = float(grouped[row_index, feature_index])
+            explained.append(
+                {
+                    "featureKey": feature_key,
+                    "displayName": display_name(feature_key),
+                    "contribution": contribution,
+                    "direction": "increase_risk" if contribution >= 0 else "decrease_risk",
+                    "value": _safe_json_value(original_values.get(feature_key)),
+                }
+            )
+        explained.sort(key=lambda item: abs(float(item["contribution"])), reverse=True)
+        results.append(explained if top_k is None else explained[:top_k])
+    return results, method_used
 
-    explained.sort(key=lambda item: abs(float(item["contribution"])), reverse=True)
-    return explained[:top_k]
 
+def build_explainer(model: Any, background_matrix: np.ndarray, background_weights: np.ndarray | None = None) -> Any | None:
+    # Explainer setup (tree traversal for forests, background statistics for linear
+    # models) is the expensive part of SHAP, so callers build it once per bundle.
+    explainer = _new_explainer(model, background_matrix, background_weights)
+    if explainer is not None:
+        EXPLAINER_REBUILDS.inc(model=model.__class__.__name__)
+    return explainer
 
-def _calculate_contributions(model: Any, transformed_row: Any, background_matrix: np.ndarray) -> np.ndarray:
-    dense_row = _dense(transformed_row)
+
+def background_fidelity(
+    model: Any,
+    background_matrix: np.ndarray,
+    background_weights: np.ndarray | None,
+    reference_matrix: np.ndarray,
+    rows: np.ndarray,
+    tolerance: float,
+) -> Dict[str, Any]:
+    # Compares attributions under the summarized background with those under the full
+    # training matrix; relativeError is the largest difference over the largest reference value.
+    if _is_tree_model(model):
+        # TreeExplainer runs path-dependent without background data, so the summary cannot change it.
+        return {"applicable": False}
+    summary_explainer = _new_explainer(model, background_matrix, background_weights)
+    reference_explainer = _new_explainer(model, reference_matrix, None)
+    if summary_explainer is None or reference_explainer is None or len(rows) == 0:
+        return {"applicable": False}
+
+    summary_values = np.asarray(summary_explainer.shap_values(rows), dtype=float)
+    reference_values = np.asarray(reference_explainer.shap_values(rows), dtype=float)
+    max_abs_error = float(np.max(np.abs(summary_values - reference_values)))
+    relative_error = max_abs_error / max(float(np.max(np.abs(reference_values))), 1e-12)
+    return {
+        "applicable": True,
+        "rows": int(len(rows)),
+        "maxAbsError": max_abs_error,
+        "relativeError": relative_error,
+        "tolerance": tolerance,
+        "withinTolerance": relative_error <= tolerance,
+    }
+
+
+def _new_explainer(model: Any, background_matrix: np.ndarray, background_weights: np.ndarray | None) -> Any | None:
+    try:
+        import shap  # type: ignore
+
+        if _is_tree_model(model):
+            return shap.TreeExplainer(model)
+        # The background goes in as its (weighted) mean and covariance: shap would otherwise
+        # subsample matrices above 100 rows and ignore k-means cluster weights.
+        background = np.asarray(background_matrix, dtype=float)
+        weights = None if background_weights is None else np.asarray(background_weights, dtype=float)
+        mean = np.average(background, axis=0, weights=weights)
+        covariance = np.atleast_2d(np.cov(background, rowvar=False, aweights=weights))
+        return shap.LinearExplainer(model, (mean, covariance))
+    except Exception:
+        return None
+
+
+def _calculate_contributions(
+    model: Any,
+    transformed_rows: Any,
+    background_matrix: np.ndarray,
+    explainer: Any | None = None,
+    method: str = "shap",
+    proxy_weights: np.ndarray | None = None,
+    flat_forest: Any | None = None,
+) -> Tuple[np.ndarray, str]:
+    dense_rows = _dense(transformed_rows)
+    if method == "fast":
+        with timed_stage("proxy"):
+            return _proxy_contributions(model, dense_rows, proxy_weights, flat_forest), "fast"
 
     # SHAP is preferred; if it fails for a specific model/input shape we fallback
     # to model-native proxy contributions to keep latency predictable.
+    model_class = model.__class__.__name__
     try:
-        import shap  # type: ignore
+        if explainer is None:
+            with timed_stage("explainer_build"):
+                explainer = build_explainer(model, background_matrix)
+            if explainer is None:
+                SHAP_FALLBACKS.inc(model=model_class, reason="explainer_unavailable")
+                return _proxy_contributions(model, dense_rows, proxy_weights, flat_forest), "fast"
+        else:
+            EXPLAINER_CACHE_HITS.inc(model=model_class)
 
-        if model.__class__.__name__.lower().startswith("randomforest"):
-            explainer = shap.TreeExplainer(model)
-            shap_values = explainer.shap_values(dense_row)
-            if isinstance(shap_values, list):
-                return np.asarray(shap_values[1][0], dtype=float)
-            shap_array = np.asarray(shap_values, dtype=float)
-            if shap_array.ndim == 3:
-                return shap_array[0, :, 1]
-            return shap_array[0]
-
-        explainer = shap.LinearExplainer(model, background_matrix)
-        shap_values = explainer.shap_values(dense_row)
+        with timed_stage("shap"):
+            shap_values = explainer.shap_values(dense_rows)
+        if isinstance(shap_values, list):
+            return np.asarray(shap_values[1], dtype=float), "shap"
         shap_array = np.asarray(shap_values, dtype=float)
-        if shap_array.ndim == 2:
-            return shap_array[0]
-        return shap_array
+        if shap_array.ndim == 3:
+            return shap_array[:, :, 1], "shap"
+        if shap_array.ndim == 1:
+            return shap_array.reshape(1, -1), "shap"
+        return shap_array, "shap"
     except Exception:
-        if hasattr(model, "coef_"):
-            return dense_row[0] * np.asarray(model.coef_[0], dtype=float)
-        if hasattr(model, "feature_importances_"):
-            return dense_row[0] * np.asarray(model.feature_importances_, dtype=float)
-        return np.zeros(dense_row.shape[1], dtype=float)
+        SHAP_FALLBACKS.inc(model=model_class, reason="shap_error")
+        return _proxy_contributions(model, dense_rows, proxy_weights, flat_forest), "fast"
+
+
+def _proxy_contributions(
+    model: Any,
+    dense_rows: np.ndarray,
+    proxy_weights: np.ndarray | None,
+    flat_forest: Any | None = None,
+) -> np.ndarray:
+    # A flattened forest gives per-row path contributions, which track the prediction far
+    # better than value * global importance.
+    if flat_forest is not None:
+        return flat_forest.path_contributions(dense_rows)
+    if proxy_weights is None:
+        proxy_weights = build_proxy_weights(model)
+    if proxy_weights is None:
+        return np.zeros(dense_rows.shape, dtype=float)
+    return dense_rows * proxy_weights
+
+
+def build_proxy_weights(model: Any) -> np.ndarray | None:
+    # Per-feature weights of the model-native proxy (contribution = value * weight). For
+    # forests feature_importances_ walks every tree on each access, so callers cache this.
+    coefficients = getattr(model, "coef_", None)
+    if coefficients is not None:
+        return np.asarray(coefficients[0], dtype=float)
+    importances = getattr(model, "feature_importances_", None)
+    if importances is not None:
+        return np.asarray(importances, dtype=float)
+    return None
+
+
+class ExplanationCostEstimator:
+    # EWMA of observed SHAP seconds per explained row; "auto" mode uses it to predict
+    # whether a SHAP pass fits the caller's latency budget before running it.
+    def __init__(self, alpha: float = 0.2) -> None:
+        self._alpha = alpha
+        self._lock = threading.Lock()
+        self._seconds_per_row: float | None = None
+
+    def observe(self, seconds: float, rows: int) -> None:
+        if rows <= 0:
+            return
+        sample = seconds / rows
+        with self._lock:
+            if self._seconds_per_row is None:
+                self._seconds_per_row = sample
+            else:
+                self._seconds_per_row += self._alpha * (sample - self._seconds_per_row)
+
+    def estimate(self, rows: int) -> float | None:
+        with self._lock:
+            return None if self._seconds_per_row is None else self._seconds_per_row * rows
+
+
+def _is_tree_model(model: Any) -> bool:
+    return model.__class__.__name__.lower().startswith("randomforest")
 
 
 def _dense(matrix: Any) -> np.ndarray:
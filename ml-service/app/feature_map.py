@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Literal
 
 FeatureType = Literal["numeric", "categorical"]
@@ -10,31 +10,37 @@ class FeatureDefinition:
     raw_names: List[str]
     display_name: str
     feature_type: FeatureType
+    # Something a student can change (counterfactual search only moves these). Left out of
+    # repr, which the artifact key and data cache hash: it does not affect training.
+    actionable: bool = field(default=False, repr=False)
 
 
 FEATURE_DEFINITIONS: List[FeatureDefinition] = [
     FeatureDefinition("gender", ["Gender"], "Gender", "categorical"),
     FeatureDefinition("age", ["Age"], "Age", "numeric"),
-    FeatureDefinition("logins", ["Logins"], "Logins", "numeric"),
+    FeatureDefinition("logins", ["Logins"], "Logins", "numeric", actionable=True),
     FeatureDefinition(
         "totalHoursInModuleArea",
         ["Total Hours in Module Area"],
         "Total Hours in Module Area",
         "numeric",
+        actionable=True,
     ),
     FeatureDefinition(
         "percentOfAverageHours",
         ["% of Average Hours", "Percent of Average Hours"],
         "% of Average Hours",
         "numeric",
+        actionable=True,
     ),
-    FeatureDefinition("presence", ["Presence"], "Presence", "numeric"),
-    FeatureDefinition("absence", ["Absence"], "Absence", "numeric"),
+    FeatureDefinition("presence", ["Presence"], "Presence", "numeric", actionable=True),
+    FeatureDefinition("absence", ["Absence"], "Absence", "numeric", actionable=True),
     FeatureDefinition(
         "percentAttended",
         ["Percent Attended", "% Attended"],
         "Percent Attended",
         "numeric",
+        actionable=True,
     ),
     FeatureDefinition(
         "attendingFromHome",
@@ -86,6 +92,7 @@ FEATURE_TYPES_BY_KEY: Dict[str, FeatureType] = {
 NUMERIC_FEATURES: List[str] = [f.key for f in FEATURE_DEFINITIONS if f.feature_type == "numeric"]
 CATEGORICAL_FEATURES: List[str] = [f.key for f in FEATURE_DEFINITIONS if f.feature_type == "categorical"]
 FEATURE_KEYS: List[str] = [f.key for f in FEATURE_DEFINITIONS]
+ACTIONABLE_FEATURES: List[str] = [f.key for f in FEATURE_DEFINITIONS if f.actionable]
 
 
 def normalize_feature_key(name: str) -> str:
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from scipy import sparse
+
+
+@dataclass(frozen=True)
+class FlatForest:
+    # Every tree of a fitted RandomForestClassifier packed into shared node arrays. Child
+    # indices are global, so one vectorized step advances all (row, tree) pairs at once
+    # without per-tree Python work.
+    roots: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    children: np.ndarray
+    is_leaf: np.ndarray
+    missing_left: np.ndarray
+    node_proba: np.ndarray
+    n_features: int
+
+    @property
+    def n_trees(self) -> int:
+        return int(self.roots.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            sum(
+                array.nbytes
+                for array in (
+                    self.roots,
+                    self.feature,
+                    self.threshold,
+                    self.children,
+                    self.is_leaf,
+                    self.missing_left,
+                    self.node_proba,
+                )
+            )
+        )
+
+    def apply(self, rows: Any) -> np.ndarray:
+        return self._walk(self._prepare(rows))[0]
+
+    def predict_proba(self, rows: Any) -> np.ndarray:
+        leaves = self.apply(rows)
+        # sklearn accumulates tree probabilities one tree at a time, then divides by the
+        # tree count; cumsum keeps that exact left-to-right order.
+        per_tree = self.node_proba[leaves.T]
+        return np.cumsum(per_tree, axis=0)[-1] / self.n_trees
+
+    def path_contributions(self, rows: Any) -> np.ndarray:
+        # Saabas-style attribution: each split credits its feature with the change in the
+        # positive-class probability between parent and child, averaged over the trees.
+        # Row sums equal predict_proba minus the mean root probability.
+        _, contributions = self._walk(self._prepare(rows), with_contributions=True)
+        return contributions / self.n_trees
+
+    def expected_value(self) -> float:
+        return float(self.node_proba[self.roots, 1].mean())
+
+    def _prepare(self, rows: Any) -> np.ndarray:
+        if sparse.issparse(rows):
+            rows = rows.toarray()
+        # sklearn casts inputs to float32 too; thresholds are stored rounded down to float32,
+        # which keeps every x <= threshold comparison exact.
+        return np.ascontiguousarray(rows, dtype=np.float32)
+
+    def _walk(self, matrix: np.ndarray, with_contributions: bool = False) -> tuple[np.ndarray, np.ndarray | None]:
+        n_rows, n_columns = matrix.shape
+        # (row, tree) pairs are walked as one flat vector; pairs that reach a leaf drop out,
+        # so each step only touches the paths that are still descending.
+        leaves = np.broadcast_to(self.roots, (n_rows, self.n_trees)).ravel().copy()
+        pair_rows = np.repeat(np.arange(n_rows), self.n_trees)
+        active = np.arange(leaves.size)
+        nodes = leaves.copy()
+        flat_values = matrix.ravel()
+        has_missing = bool(np.isnan(flat_values).any())
+        contributions = np.zeros((n_rows, self.n_features), dtype=float) if with_contributions else None
+
+        while active.size:
+            features = self.feature[nodes]
+            values = flat_values[pair_rows[active] * n_columns + features]
+            if has_missing:
+                # NaN goes where sklearn recorded missing values went during fitting.
+                go_left = (values <= self.threshold[nodes]) | (np.isnan(values) & self.missing_left[nodes])
+                go_right = ~go_left
+            else:
+                go_right = values > self.threshold[nodes]
+            next_nodes = self.children[nodes, go_right.view(np.int8)]
+            if contributions is not None:
+                delta = self.node_proba[next_nodes, 1] - self.node_proba[nodes, 1]
+                np.add.at(contributions, (pair_rows[active], features), delta)
+            descending = ~self.is_leaf[next_nodes]
+            leaves[active] = next_nodes
+            active = active[descending]
+            nodes = next_nodes[descending]
+        return leaves.reshape(n_rows, self.n_trees), contributions
+
+
+def flatten_forest(model: Any) -> FlatForest:
+    estimators = list(model.estimators_)
+    if not estimators or getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only fitted single-output forests can be flattened")
+
+    offsets = np.cumsum([0] + [estimator.tree_.node_count for estimator in estimators])
+    total_nodes = int(offsets[-1])
+    n_classes = int(model.n_classes_)
+
+    feature = np.zeros(total_nodes, dtype=np.intp)
+    threshold = np.full(total_nodes, np.inf, dtype=np.float64)
+    children = np.zeros((total_nodes, 2), dtype=np.intp)
+    leaf_mask = np.zeros(total_nodes, dtype=bool)
+    missing_left = np.zeros(total_nodes, dtype=bool)
+    node_proba = np.zeros((total_nodes, n_classes), dtype=np.float64)
+
+    for offset, estimator in zip(offsets[:-1], estimators):
+        tree = estimator.tree_
+        span = slice(int(offset), int(offset) + tree.node_count)
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(tree.node_count) + offset
+        leaf_mask[span] = is_leaf
+        feature[span] = np.where(is_leaf, 0, tree.feature)
+        threshold[span] = np.where(is_leaf, np.inf, tree.threshold)
+        children[span, 0] = np.where(is_leaf, node_ids, tree.children_left + offset)
+        children[span, 1] = np.where(is_leaf, node_ids, tree.children_right + offset)
+        missing_go_to_left = getattr(tree, "missing_go_to_left", None)
+        if missing_go_to_left is not None:
+            missing_left[span] = np.asarray(missing_go_to_left, dtype=bool) & ~is_leaf
+        # DecisionTreeClassifier.predict_proba returns these per-node class fractions as-is.
+        node_proba[span] = tree.value[:, 0, :n_classes]
+
+    # For a float32 x, x <= t holds exactly when x <= (largest float32 not above t).
+    threshold32 = threshold.astype(np.float32)
+    rounded_up = threshold32.astype(np.float64) > threshold
+    threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+
+    return FlatForest(
+        roots=np.asarray(offsets[:-1], dtype=np.intp),
+        feature=feature,
+        threshold=threshold32,
+        children=children,
+        is_leaf=leaf_mask,
+        missing_left=missing_left,
+        node_proba=node_proba,
+        n_features=int(model.n_features_in_),
+    )
+
+
+def reference_predict_proba(model: Any, rows: Any) -> np.ndarray:
+    # With n_jobs > 1 sklearn adds tree outputs in completion order, so the last bit can
+    # vary between calls; the single-threaded sum is the deterministic reference.
+    sequential = copy.copy(model)
+    sequential.n_jobs = 1
+    return sequential.predict_proba(rows)
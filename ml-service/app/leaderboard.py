@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score, brier_score_loss, f1_score, roc_auc_score
+
+from app.artifact_store import artifact_lock, atomic_dump
+from app.config import settings
+from app.data_loader import load_training_data, resolve_test_dataset_path
+from app.registry import DEFAULT_MODEL, ModelRegistry
+from app.service import artifact_key, bundle_from_artifacts, train_with_settings, training_config_digest, write_bundle
+from app.training import ModelArtifacts, resolve_worker_budget
+
+
+def run_leaderboard(
+    variant_paths: List[Path],
+    output_path: Path,
+    n_workers: int = 0,
+    promote: bool = True,
+    registry_name: str | None = None,
+) -> Dict[str, Any]:
+    test_path = resolve_test_dataset_path(settings.data_root)
+    if test_path is None:
+        raise FileNotFoundError("Leaderboard needs a holdout under data/test to rank variants")
+    holdout_features, holdout_labels = load_training_data(test_path, settings.data_cache_dir or None, settings.ingest_chunk_rows)
+
+    # Variant files are read concurrently; each one is trained at most once per content hash.
+    with ThreadPoolExecutor(max_workers=max(1, len(variant_paths))) as pool:
+        loaded = list(pool.map(_load_variant, variant_paths))
+
+    workers = resolve_worker_budget(n_workers)
+    n_parallel = max(1, min(workers, len(loaded)))
+    inner_workers = max(1, workers // n_parallel)
+    cache_dir = Path(settings.artifact_dir) / "leaderboard-cache"
+    trained: List[Tuple[Path, ModelArtifacts]] = Parallel(n_jobs=n_parallel)(
+        delayed(_train_variant)(path, digest, features, labels, cache_dir, inner_workers)
+        for path, digest, features, labels in loaded
+    )
+
+    entries: List[Dict[str, Any]] = []
+    for path, artifacts in trained:
+        # The holdout is transformed once per variant preprocessor and shared by its candidates.
+        transformed = artifacts.preprocessor.transform(holdout_features)
+        for model_name, model in artifacts.candidate_models.items():
+            entries.append(
+                {
+                    "variant": path.stem,
+                    "datasetPath": str(path),
+                    "model": model_name,
+                    **_holdout_scores(model, transformed, holdout_labels),
+                    "cvF1Mean": artifacts.metrics[model_name].get("cvF1Mean"),
+                    "validationF1": artifacts.metrics[model_name].get("f1"),
+                }
+            )
+
+    entries.sort(key=lambda entry: (entry["testF1"], entry["cvF1Mean"] or 0.0), reverse=True)
+    for rank, entry in enumerate(entries, start=1):
+        entry["rank"] = rank
+
+    report: Dict[str, Any] = {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "holdoutPath": str(test_path),
+        "rankedBy": "testF1",
+        "entries": entries,
+        "promoted": None,
+    }
+
+    if promote and entries:
+        best = entries[0]
+        best_path, best_artifacts = next(item for item in trained if str(item[0]) == best["datasetPath"])
+        bundle = bundle_from_artifacts(best_artifacts, best_path, model_name=best["model"])
+        # Pinned to the current artifact key: the service keeps serving it even though it was
+        # not trained from TRAIN_DATASET, until the dataset, training settings or code change.
+        bundle["pinned"] = artifact_key()
+        # With a model name the winner goes into the registry instead of replacing the default.
+        artifact_path = (
+            Path(settings.model_registry_dir) / registry_name / "model.joblib"
+            if registry_name
+            else Path(settings.artifact_dir) / "model.joblib"
+        )
+        with artifact_lock(artifact_path):
+            write_bundle(bundle, artifact_path)
+        report["promoted"] = {
+            "variant": best["variant"],
+            "model": best["model"],
+            "modelVersion": bundle["modelVersion"],
+            "artifactPath": str(artifact_path),
+        }
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(report, indent=2))
+    return report
+
+
+def _load_variant(path: Path) -> Tuple[Path, str, pd.DataFrame, pd.Series]:
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    features, labels = load_training_data(path, settings.data_cache_dir or None, settings.ingest_chunk_rows)
+    return path, digest, features, labels
+
+
+def _train_variant(
+    path: Path,
+    digest: str,
+    features: pd.DataFrame,
+    labels: pd.Series,
+    cache_dir: Path,
+    n_workers: int,
+) -> Tuple[Path, ModelArtifacts]:
+    # The config digest covers the training settings, the feature map and the code versions.
+    cache_path = cache_dir / f"{path.stem}-{digest[:16]}-{training_config_digest()}.joblib"
+    if cache_path.exists():
+        try:
+            return path, joblib.load(cache_path)
+        except Exception:
+            pass
+    artifacts = train_with_settings(features, labels, n_workers)
+    atomic_dump(artifacts, cache_path)
+    return path, artifacts
+
+
+def _holdout_scores(model: Any, transformed: Any, labels: pd.Series) -> Dict[str, float | None]:
+    probabilities = model.predict_proba(transformed)[:, 1]
+    predictions = (probabilities >= 0.5).astype(int)
+    try:
+        roc_auc: float | None = float(roc_auc_score(labels, probabilities))
+    except ValueError:
+        roc_auc = None
+    return {
+        "testF1": float(f1_score(labels, predictions, zero_division=0)),
+        "testAccuracy": float(accuracy_score(labels, predictions)),
+        "testRocAuc": roc_auc,
+        "testBrier": float(brier_score_loss(labels, probabilities)),
+        "testPositiveRate": float(np.mean(predictions)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train every dataset variant and rank (variant, model) pairs.")
+    parser.add_argument("--variants", nargs="*", help="CSV names under data/train_validate/csv (default: all)")
+    parser.add_argument("--output", default=str(Path(settings.artifact_dir) / "leaderboard.json"))
+    parser.add_argument("--workers", type=int, default=settings.train_workers)
+    parser.add_argument("--no-promote", action="store_true", help="Only write the leaderboard")
+    parser.add_argument("--model-name", help="Promote into the model registry under this name instead of the default model")
+    args = parser.parse_args()
+    if args.model_name and ("@" in args.model_name or ModelRegistry.normalize(args.model_name) == DEFAULT_MODEL):
+        raise SystemExit("--model-name must be a registry name without a version; omit it to replace the default")
+
+    variant_dir = Path(settings.data_root) / "train_validate" / "csv"
+    if args.variants:
+        variant_paths = [variant_dir / (name if name.endswith(".csv") else f"{name}.csv") for name in args.variants]
+    else:
+        variant_paths = sorted(variant_dir.glob("*.csv"))
+    if not variant_paths:
+        raise SystemExit(f"No dataset variants found in {variant_dir}")
+
+    report = run_leaderboard(
+        variant_paths, Path(args.output), args.workers, promote=not args.no_promote, registry_name=args.model_name
+    )
+    for entry in report["entries"]:
+        print(f"{entry['rank']:>2}. {entry['variant']:<18} {entry['model']:<20} testF1={entry['testF1']:.3f}")
+    if report["promoted"]:
+        print(f"Promoted {report['promoted']['variant']}/{report['promoted']['model']} -> {report['promoted']['artifactPath']}")
+        print("Restart the ml-service to serve it: running workers keep the model they loaded.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,41 @@
 from __future__ import annotations
 
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Tuple
 
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+
+from app import IMPORT_STARTED_AT
+from app.admission import AdmissionController, AdmissionError, EndpointBusyError, parse_limits
+from app.batching import MicroBatcher, QueueFullError
+from app.config import settings
+from app.metrics import render_prometheus, request_scope
+from app.offload import OffloadPool
+from app.registry import DEFAULT_MODEL, ModelRegistry
+from app.retraining import RetrainInProgressError
 from app.schemas import (
+    BatchPredictRequest,
+    BatchPredictResponse,
+    CounterfactualRequest,
+    CounterfactualResponse,
+    CourseRiskBatchPredictRequest,
+    CourseRiskBatchPredictResponse,
     CourseRiskPredictRequest,
     CourseRiskPredictResponse,
+    IngestOutcomesRequest,
+    IngestOutcomesResponse,
     PredictRequest,
     PredictResponse,
+    SensitivityRequest,
+    SensitivityResponse,
     WhatIfRequest,
     WhatIfResponse,
+    WhatIfSweepRequest,
+    WhatIfSweepResponse,
 )
-from app.service import ModelManager
+from app.service import ModelManager, ModelNotFoundError
 
 app = FastAPI(
     title="RiskEdu ML Service",
@@ -19,39 +44,297 @@ app = FastAPI(
 )
 
 model_manager = ModelManager()
+model_manager.record_startup_phase("imports", time.perf_counter() - IMPORT_STARTED_AT)
+if settings.preload_model:
+    # Under `gunicorn --preload` this runs once in the master before it forks, so every
+    # worker starts with the loaded, warmed bundle and shares its pages copy-on-write.
+    # Warm-up runs inline here because threads do not survive the fork.
+    model_manager.ensure_ready()
+    model_manager.warm()
+model_registry = ModelRegistry(
+    model_manager,
+    default_dir=settings.artifact_dir,
+    root=settings.model_registry_dir,
+    memory_budget_bytes=int(settings.model_memory_budget_mb * 1024 * 1024),
+    shadow_model=settings.shadow_model,
+    shadow_sample_rate=settings.shadow_sample_rate,
+    shadow_queue_depth=settings.shadow_queue_depth,
+)
+micro_batcher = (
+    MicroBatcher(
+        model_manager,
+        max_wait_ms=settings.micro_batch_max_wait_ms,
+        max_batch_size=settings.micro_batch_max_size,
+        queue_depth=settings.micro_batch_queue_depth,
+    )
+    if settings.micro_batch_enabled
+    else None
+)
+admission = AdmissionController(
+    parse_limits(settings.admission_limits),
+    queue_depth=settings.admission_queue_depth,
+    queue_timeout_ms=settings.admission_queue_timeout_ms,
+)
+offload_pool = (
+    OffloadPool(model_manager, workers=settings.offload_workers, queue_depth=settings.offload_queue_depth)
+    if settings.offload_workers > 0
+    else None
+)
 
 
 @app.on_event("startup")
 def startup_event() -> None:
+    # Serve as soon as the bundle is loaded; the explainer and the parity-checked fast
+    # paths are warmed in the background (requests use the sklearn paths until then).
     model_manager.ensure_ready()
+    model_manager.start_warmup()
+    if micro_batcher is not None:
+        micro_batcher.start()
+    if offload_pool is not None:
+        offload_pool.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    if micro_batcher is not None:
+        micro_batcher.stop()
+    if offload_pool is not None:
+        offload_pool.stop()
 
 
 @app.get("/health")
 def health() -> dict:
-    return model_manager.health()
+    status = model_manager.health()
+    status["registry"] = model_registry.stats()
+    if micro_batcher is not None:
+        status["microBatching"] = micro_batcher.stats()
+    status["admission"] = admission.stats()
+    if offload_pool is not None:
+        status["offload"] = offload_pool.stats()
+    return status
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/predict", response_model=PredictResponse)
-def predict(payload: PredictRequest) -> dict:
+def predict(payload: PredictRequest, response: Response, x_model: str | None = Header(default=None)) -> dict:
     if not payload.features:
         raise HTTPException(status_code=400, detail="features must not be empty")
-    return model_manager.predict(payload.features)
+    selected, manager = _select_model(payload.model or x_model, response)
+    with _admitted("predict"), request_scope("predict"):
+        # The micro-batcher queues for the default model only; named models score directly.
+        if micro_batcher is not None and selected == DEFAULT_MODEL:
+            try:
+                result = micro_batcher.predict(
+                    payload.features, payload.explanationMode, payload.topK, payload.latencyBudgetMs
+                )
+            except QueueFullError:
+                raise HTTPException(
+                    status_code=503, detail="prediction queue is full, retry shortly", headers={"Retry-After": "1"}
+                )
+        elif _explains(payload.explanationMode):
+            result = _score(
+                selected, manager, "predict", payload.features, payload.explanationMode, payload.topK, payload.latencyBudgetMs
+            )
+        else:
+            result = manager.predict(payload.features, payload.explanationMode, payload.topK, payload.latencyBudgetMs)
+    model_registry.shadow(selected, [payload.features], [result])
+    return result
+
+
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+def predict_batch(payload: BatchPredictRequest, response: Response, x_model: str | None = Header(default=None)) -> dict:
+    if not payload.rows:
+        raise HTTPException(status_code=400, detail="rows must not be empty")
+    if len(payload.rows) > settings.max_batch_rows:
+        raise HTTPException(status_code=400, detail=f"rows must not exceed {settings.max_batch_rows} items")
+    selected, manager = _select_model(payload.model or x_model, response)
+    with _admitted("predict_batch"), request_scope("predict_batch"):
+        results = _score(
+            selected, manager, "predict_many", payload.rows, payload.explanationMode, payload.topK, payload.latencyBudgetMs
+        )
+    model_registry.shadow(selected, payload.rows, results)
+    return {"results": results}
 
 
 @app.post("/whatif", response_model=WhatIfResponse)
-def what_if(payload: WhatIfRequest) -> dict:
+def what_if(payload: WhatIfRequest, response: Response, x_model: str | None = Header(default=None)) -> dict:
+    if not payload.baselineFeatures:
+        raise HTTPException(status_code=400, detail="baselineFeatures must not be empty")
+    selected, manager = _select_model(payload.model or x_model, response)
+    with _admitted("whatif"), request_scope("whatif"):
+        arguments = (
+            payload.baselineFeatures,
+            payload.overrides,
+            payload.explanationMode,
+            payload.topK,
+            payload.latencyBudgetMs,
+        )
+        if _explains(payload.explanationMode):
+            return _score(selected, manager, "what_if", *arguments)
+        return manager.what_if(*arguments)
+
+
+@app.post("/whatif/sweep", response_model=WhatIfSweepResponse)
+def what_if_sweep(payload: WhatIfSweepRequest, response: Response, x_model: str | None = Header(default=None)) -> dict:
     if not payload.baselineFeatures:
         raise HTTPException(status_code=400, detail="baselineFeatures must not be empty")
-    return model_manager.what_if(payload.baselineFeatures, payload.overrides)
+    selected, manager = _select_model(payload.model or x_model, response)
+    try:
+        with _admitted("whatif_sweep"), request_scope("whatif_sweep"):
+            return _score(
+                selected,
+                manager,
+                "what_if_sweep",
+                payload.baselineFeatures,
+                [(axis.featureKey, axis.values) for axis in payload.axes],
+                payload.includeExplanations,
+            )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
+@app.post("/sensitivity", response_model=SensitivityResponse)
+def sensitivity(payload: SensitivityRequest, response: Response, x_model: str | None = Header(default=None)) -> dict:
+    if not payload.baselineFeatures:
+        raise HTTPException(status_code=400, detail="baselineFeatures must not be empty")
+    selected, manager = _select_model(payload.model or x_model, response)
+    try:
+        with _admitted("sensitivity"), request_scope("sensitivity"):
+            return _score(
+                selected,
+                manager,
+                "sensitivity",
+                payload.baselineFeatures,
+                payload.perturbation,
+                payload.step,
+                payload.percentiles,
+                payload.features,
+                payload.topK,
+            )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
+@app.post("/counterfactual", response_model=CounterfactualResponse)
+def counterfactual(payload: CounterfactualRequest, response: Response, x_model: str | None = Header(default=None)) -> dict:
+    if not payload.baselineFeatures:
+        raise HTTPException(status_code=400, detail="baselineFeatures must not be empty")
+    selected, manager = _select_model(payload.model or x_model, response)
+    try:
+        with _admitted("counterfactual"), request_scope("counterfactual"):
+            return _score(
+                selected,
+                manager,
+                "counterfactual",
+                payload.baselineFeatures,
+                payload.targetBucket,
+                payload.features,
+                {key: (bounds.min, bounds.max) for key, bounds in payload.bounds.items()},
+                payload.maxScenarios,
+                payload.timeBudgetMs,
+                payload.maxEvaluations,
+            )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+
+@app.post("/admin/retrain", status_code=202)
+def start_retrain(x_admin_token: str | None = Header(default=None)) -> dict:
+    _require_admin(x_admin_token)
+    try:
+        return model_manager.start_retrain()
+    except RetrainInProgressError as error:
+        raise HTTPException(status_code=409, detail=str(error))
+
+
+@app.get("/admin/retrain")
+def retrain_status(x_admin_token: str | None = Header(default=None)) -> dict:
+    _require_admin(x_admin_token)
+    return model_manager.retrain_status()
+
+
+@app.post("/ingest-outcomes", response_model=IngestOutcomesResponse)
+def ingest_outcomes(payload: IngestOutcomesRequest, x_admin_token: str | None = Header(default=None)) -> dict:
+    _require_admin(x_admin_token)
+    if not payload.rows:
+        raise HTTPException(status_code=400, detail="rows must not be empty")
+    if len(payload.rows) > settings.max_batch_rows:
+        raise HTTPException(status_code=400, detail=f"rows must not exceed {settings.max_batch_rows} items")
+    if any(not row.features for row in payload.rows):
+        raise HTTPException(status_code=400, detail="features must not be empty")
+    return model_manager.ingest_outcomes(
+        [row.features for row in payload.rows],
+        [row.label for row in payload.rows],
+    )
 
 
 @app.get("/feature-importance")
-def feature_importance() -> dict:
-    return model_manager.feature_importance()
+def feature_importance(response: Response, model: str | None = None, x_model: str | None = Header(default=None)) -> dict:
+    _, manager = _select_model(model or x_model, response)
+    return manager.feature_importance()
 
 
 @app.post("/predict-risk", response_model=CourseRiskPredictResponse)
 def predict_course_risk(payload: CourseRiskPredictRequest) -> dict:
     if not payload.features:
         raise HTTPException(status_code=400, detail="features must not be empty")
-    return model_manager.predict_course_risk(payload.features)
+    with request_scope("predict_risk"):
+        return model_manager.predict_course_risk(payload.features)
+
+
+@app.post("/predict-risk/batch", response_model=CourseRiskBatchPredictResponse)
+def predict_course_risk_batch(payload: CourseRiskBatchPredictRequest) -> dict:
+    if not payload.rows:
+        raise HTTPException(status_code=400, detail="rows must not be empty")
+    if len(payload.rows) > settings.max_risk_batch_rows:
+        raise HTTPException(status_code=400, detail=f"rows must not exceed {settings.max_risk_batch_rows} items")
+    with request_scope("predict_risk_batch"):
+        return model_manager.predict_course_risk_many(payload.rows)
+
+
+def _select_model(selector: str | None, response: Response) -> Tuple[str, ModelManager]:
+    # The X-Model response header names the model that answered, for A/B bookkeeping.
+    try:
+        selected, manager = model_registry.resolve(selector)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except ModelNotFoundError as error:
+        raise HTTPException(status_code=404, detail=str(error))
+    response.headers["X-Model"] = selected
+    return selected, manager
+
+
+@contextmanager
+def _admitted(endpoint: str) -> Iterator[None]:
+    # A full endpoint queue answers 429; a queue wait that timed out or saturated scoring
+    # workers answer 503. Both say when to retry.
+    try:
+        with admission.admit(endpoint):
+            yield
+    except AdmissionError as error:
+        status_code = 429 if isinstance(error, EndpointBusyError) else 503
+        raise HTTPException(status_code=status_code, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+
+def _explains(explanation_mode: str | None) -> bool:
+    return (explanation_mode or settings.explanation_mode) != "none"
+
+
+def _score(selected: str, manager: ModelManager, method: str, *args: Any) -> Any:
+    # Default-model scoring goes to the worker processes when they run; named models are
+    # loaded in this process only, so they score here.
+    if offload_pool is not None and selected == DEFAULT_MODEL:
+        return offload_pool.call(method, *args)
+    return getattr(manager, method)(*args)
+
+
+def _require_admin(token: str | None) -> None:
+    # Admin routes stay disabled until an ADMIN_TOKEN is configured.
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled; set ADMIN_TOKEN")
+    if token != settings.admin_token:
+        raise HTTPException(status_code=401, detail="invalid admin token")
@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = self._label_key(labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {",".join(key) or "total": value for key, value in self._values.items()}
+
+    def raw(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values: Dict[LabelValues, float]) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0.0) + value
+
+    @staticmethod
+    def subtract(value: float, previous: float | None) -> float:
+        return value - (previous or 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+    def _label_key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float],
+        label_names: Tuple[str, ...] = (),
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        # Per label set: one count per bucket, then the +Inf bucket, sum and count.
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple([str(labels.get(name, "")) for name in self.label_names])
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 3)
+                self._values[key] = state
+            # bisect_left finds the first bucket with value <= upper (len(buckets) is +Inf).
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def raw(self) -> Dict[LabelValues, List[float]]:
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+    def merge(self, values: Dict[LabelValues, List[float]]) -> None:
+        with self._lock:
+            for key, added in values.items():
+                state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 3))
+                for index, value in enumerate(added):
+                    state[index] += value
+
+    @staticmethod
+    def subtract(value: List[float], previous: List[float] | None) -> List[float]:
+        return [current - before for current, before in zip(value, previous or [0.0] * len(value))]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result: Dict[str, Dict[str, Any]] = {}
+            for key, state in self._values.items():
+                count = state[-1]
+                result[",".join(key) or "total"] = {
+                    "count": count,
+                    "sum": state[-2],
+                    "mean": state[-2] / count if count else 0.0,
+                }
+            return result
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                # Stored bucket counts are per bucket; the exposition format wants them cumulative.
+                cumulative = 0.0
+                for upper, count in zip(self.buckets + (math.inf,), state):
+                    cumulative += count
+                    labels = _format_labels(self.label_names + ("le",), key + (_format_value(upper),))
+                    lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+                lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+REGISTRY: List[Any] = []
+
+
+def counter(name: str, description: str, label_names: Tuple[str, ...] = ()) -> Counter:
+    metric = Counter(name, description, label_names)
+    REGISTRY.append(metric)
+    return metric
+
+
+def histogram(
+    name: str,
+    description: str,
+    buckets: Sequence[float],
+    label_names: Tuple[str, ...] = (),
+) -> Histogram:
+    metric = Histogram(name, description, buckets, label_names)
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def metric_state() -> Dict[str, Dict[LabelValues, Any]]:
+    return {metric.name: metric.raw() for metric in REGISTRY}
+
+
+def metric_changes(before: Dict[str, Dict[LabelValues, Any]]) -> Dict[str, Dict[LabelValues, Any]]:
+    # What this process recorded since metric_state() returned before; offload workers send
+    # it back with each result so the server's /metrics and /health include their work.
+    changes: Dict[str, Dict[LabelValues, Any]] = {}
+    for metric in REGISTRY:
+        previous = before.get(metric.name, {})
+        changed = {
+            key: metric.subtract(value, previous.get(key))
+            for key, value in metric.raw().items()
+            if value != previous.get(key)
+        }
+        if changed:
+            changes[metric.name] = changed
+    return changes
+
+
+def merge_metrics(changes: Dict[str, Dict[LabelValues, Any]]) -> None:
+    for metric in REGISTRY:
+        if metric.name in changes:
+            metric.merge(changes[metric.name])
+
+
+@dataclass
+class StageScope:
+    endpoint: str
+    model: str = ""
+
+
+_STAGE_SCOPE: ContextVar[StageScope | None] = ContextVar("riskedu_stage_scope", default=None)
+
+
+@contextmanager
+def request_scope(endpoint: str) -> Iterator[StageScope]:
+    # Stage timers below read the endpoint/model from here, so hot paths need no extra arguments.
+    started_at = time.perf_counter()
+    with stage_scope(endpoint) as scope:
+        try:
+            yield scope
+        finally:
+            STAGE_LATENCY.observe(time.perf_counter() - started_at, endpoint=endpoint, model=scope.model, stage="total")
+
+
+@contextmanager
+def stage_scope(endpoint: str) -> Iterator[StageScope]:
+    # request_scope without the total, for offload workers timing the stages of a request
+    # the server times as a whole.
+    scope = StageScope(endpoint=endpoint)
+    token = _STAGE_SCOPE.set(scope)
+    try:
+        yield scope
+    finally:
+        _STAGE_SCOPE.reset(token)
+
+
+def current_endpoint() -> str:
+    scope = _STAGE_SCOPE.get()
+    return scope.endpoint if scope is not None else "internal"
+
+
+def bind_model(model_name: str) -> None:
+    scope = _STAGE_SCOPE.get()
+    if scope is not None:
+        scope.model = model_name
+
+
+class timed_stage:
+    # A plain class rather than @contextmanager: this wraps every hot-path stage, so keep it cheap.
+    __slots__ = ("_stage", "_started_at")
+
+    def __init__(self, stage: str) -> None:
+        self._stage = stage
+        self._started_at = 0.0
+
+    def __enter__(self) -> None:
+        self._started_at = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        elapsed = time.perf_counter() - self._started_at
+        scope = _STAGE_SCOPE.get()
+        if scope is None:
+            STAGE_LATENCY.observe(elapsed, endpoint="internal", model="", stage=self._stage)
+        else:
+            STAGE_LATENCY.observe(elapsed, endpoint=scope.endpoint, model=scope.model, stage=self._stage)
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+EXPLAINER_CACHE_HITS = counter(
+    "riskedu_explainer_cache_hits_total",
+    "Explanation calls served by the explainer cached on the model bundle.",
+    ("model",),
+)
+EXPLAINER_REBUILDS = counter(
+    "riskedu_explainer_rebuilds_total",
+    "SHAP explainers constructed, either on bundle load/train or as an uncached fallback.",
+    ("model",),
+)
+MICRO_BATCH_SIZE = histogram(
+    "riskedu_micro_batch_size",
+    "Rows per micro-batch executed in front of ModelManager.",
+    (1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+MICRO_BATCH_QUEUE_WAIT = histogram(
+    "riskedu_micro_batch_queue_wait_seconds",
+    "Time a /predict request waited in the micro-batch queue before its batch ran.",
+    (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+PREDICTION_CACHE_EVENTS = counter(
+    "riskedu_prediction_cache_events_total",
+    "Prediction cache lookups and maintenance events (hit, miss, eviction, expired).",
+    ("event",),
+)
+STAGE_LATENCY = histogram(
+    "riskedu_stage_latency_seconds",
+    "Time spent per inference stage (stage=total covers the whole request).",
+    (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    ("endpoint", "model", "stage"),
+)
+SHAP_FALLBACKS = counter(
+    "riskedu_shap_fallbacks_total",
+    "Explanation calls answered by the proxy contributions because SHAP was unavailable or failed.",
+    ("model", "reason"),
+)
+MODEL_REGISTRY_EVENTS = counter(
+    "riskedu_model_registry_events_total",
+    "Named bundles loaded into or evicted from the model registry.",
+    ("event",),
+)
+SHADOW_EVENTS = counter(
+    "riskedu_shadow_events_total",
+    "Shadow scoring of sampled default-model traffic (scored, dropped when the queue is full, failed).",
+    ("challenger", "event"),
+)
+SHADOW_ABS_DELTA = histogram(
+    "riskedu_shadow_abs_delta",
+    "Absolute probability difference between the challenger and the default model per shadowed row.",
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5),
+    ("challenger",),
+)
+ADMISSION_EVENTS = counter(
+    "riskedu_admission_events_total",
+    "Admission control per endpoint (admitted, queued, rejected when the queue is full, timed_out).",
+    ("endpoint", "event"),
+)
+ADMISSION_QUEUE_WAIT = histogram(
+    "riskedu_admission_queue_wait_seconds",
+    "Time a request waited for its endpoint's concurrency limit before it ran.",
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+    ("endpoint",),
+)
+OFFLOAD_EVENTS = counter(
+    "riskedu_offload_events_total",
+    "Calls for the process pool (offloaded, inline before it is up, saturated, stale worker, restarted).",
+    ("event",),
+)
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Dict, List, Tuple
+
+from app.admission import AdmissionError, retry_after_seconds
+from app.artifact_store import file_identity
+from app.cache import CacheJournal
+from app.config import settings
+from app.metrics import OFFLOAD_EVENTS, current_endpoint, merge_metrics, metric_changes, metric_state, stage_scope
+from app.service import ModelManager
+
+# Methods whose result the server may already have cached, and the manager's cache-only variant.
+CACHED_METHODS = {"predict": "cached_prediction"}
+
+
+class PoolSaturatedError(AdmissionError):
+    pass
+
+
+class StaleWorkerError(RuntimeError):
+    pass
+
+
+class OffloadPool:
+    # CPU-heavy scoring for the default model (explanations, sweeps, batches) runs in spawned
+    # worker processes that each load the artifact read-only, so a long SHAP pass holds
+    # neither the server's GIL nor its cores. Calls run in-process instead until the first
+    # worker is up, when the workers lag behind the server's model, and after a crash.
+    # Workers send back the metrics they recorded and the predictions they would have
+    # cached, so /metrics, /health and the prediction cache cover offloaded calls.
+    def __init__(self, manager: ModelManager, workers: int, queue_depth: int, alpha: float = 0.2) -> None:
+        self._manager = manager
+        self._workers = max(workers, 1)
+        self._capacity = self._workers + max(queue_depth, 0)
+        self._alpha = alpha
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._ready = False
+        self._error: str | None = None
+        self._in_flight = 0
+        self._seconds_per_call: float | None = None
+        self._counts = {"offloaded": 0, "inline": 0, "saturated": 0, "stale": 0, "restarted": 0}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                return
+            executor, pings = self._launch()
+        self._watch(executor, pings)
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor, self._ready = self._executor, None, False
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def call(self, method: str, *args: Any) -> Any:
+        # Inline calls look the cache up themselves; offloaded ones are checked here first.
+        if self._ready and method in CACHED_METHODS:
+            cached = getattr(self._manager, CACHED_METHODS[method])(*args)
+            if cached is not None:
+                return cached
+        with self._lock:
+            executor = self._executor if self._ready else None
+            if executor is not None:
+                if self._in_flight >= self._capacity:
+                    self._counts["saturated"] += 1
+                    OFFLOAD_EVENTS.inc(event="saturated")
+                    retry_after = retry_after_seconds(self._seconds_per_call, self._in_flight, self._workers)
+                    raise PoolSaturatedError("scoring workers are saturated, retry shortly", retry_after)
+                self._in_flight += 1
+        if executor is None:
+            return self._inline("inline", method, args)
+
+        started_at = time.perf_counter()
+        try:
+            future = executor.submit(_run_in_worker, self._manager.model_version(), current_endpoint(), method, args)
+            result, changes, written = future.result()
+        except StaleWorkerError:
+            event = "stale"
+        except BrokenProcessPool:
+            self._restart(executor)
+            event = "restarted"
+        else:
+            self._observe(time.perf_counter() - started_at)
+            merge_metrics(changes)
+            self._manager.store_predictions(written)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        return self._inline(event, method, args)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self._workers,
+                "ready": self._ready,
+                "error": self._error,
+                "inFlight": self._in_flight,
+                "capacity": self._capacity,
+                "secondsPerCall": self._seconds_per_call,
+                **self._counts,
+            }
+
+    def _launch(self) -> Tuple[ProcessPoolExecutor, List[Future]]:
+        # Called with the lock held. spawn, like the retrainer: workers start without the
+        # server's threads and locks. One ping per worker starts them all now rather than
+        # on the first heavy request.
+        self._ready = False
+        executor = ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(self._manager.artifact_path),),
+        )
+        self._executor = executor
+        return executor, [executor.submit(os.getpid) for _ in range(self._workers)]
+
+    def _watch(self, executor: ProcessPoolExecutor, pings: List[Future]) -> None:
+        # Outside the lock: a callback on an already finished future runs immediately.
+        for ping in pings:
+            ping.add_done_callback(partial(self._on_ping, executor))
+
+    def _on_ping(self, executor: ProcessPoolExecutor, ping: Future) -> None:
+        with self._lock:
+            if executor is not self._executor:
+                return
+            error = ping.exception()
+            if error is None:
+                self._ready = True
+            elif not self._ready:
+                # Workers that cannot load the bundle leave every call in-process.
+                self._error = str(error) or error.__class__.__name__
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._counts["restarted"] += 1
+            replacement, pings = self._launch()
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._watch(replacement, pings)
+
+    def _inline(self, event: str, method: str, args: Tuple[Any, ...]) -> Any:
+        with self._lock:
+            self._counts[event] += 1
+        OFFLOAD_EVENTS.inc(event=event)
+        return getattr(self._manager, method)(*args)
+
+    def _observe(self, seconds: float) -> None:
+        with self._lock:
+            self._counts["offloaded"] += 1
+            if self._seconds_per_call is None:
+                self._seconds_per_call = seconds
+            else:
+                self._seconds_per_call += self._alpha * (seconds - self._seconds_per_call)
+        OFFLOAD_EVENTS.inc(event="offloaded")
+
+
+# Worker-process state: the read-only manager and the identity of the file it loaded.
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(artifact_path: str) -> None:
+    _WORKER["path"] = artifact_path
+    _load_worker_bundle()
+
+
+def _load_worker_bundle() -> None:
+    path = _WORKER["path"]
+    identity = file_identity(path)
+    journal = CacheJournal(settings.prediction_cache_size)
+    manager = ModelManager(artifact_path=path, read_only=True, prediction_cache=journal)
+    manager.ensure_ready()
+    manager.warm()
+    _WORKER.update(manager=manager, journal=journal, identity=identity)
+
+
+def _run_in_worker(
+    model_version: str, endpoint: str, method: str, args: Tuple[Any, ...]
+) -> Tuple[Any, Dict[str, Any], List[Tuple[Any, Dict[str, Any]]]]:
+    manager: ModelManager = _WORKER["manager"]
+    if manager.model_version() != model_version:
+        # The server writes every bundle it swaps in to the artifact first, so a changed
+        # file usually holds the server's version; reload only then, not on every call.
+        if file_identity(_WORKER["path"]) != _WORKER["identity"]:
+            _load_worker_bundle()
+            manager = _WORKER["manager"]
+        if manager.model_version() != model_version:
+            raise StaleWorkerError(f"worker serves {manager.model_version()}, server serves {model_version}")
+    before = metric_state()
+    with stage_scope(endpoint):
+        result = getattr(manager, method)(*args)
+    return result, metric_changes(before), _WORKER["journal"].drain()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.feature_map import FEATURE_KEYS, FEATURE_TYPES_BY_KEY
+
+OUTCOME_STORE_NAME = "outcomes.jsonl"
+
+
+class OutcomeStore:
+    # Append-only JSONL of labelled, already-normalized feature rows. Line numbers are the
+    # offsets bundles use to remember which outcomes a full rebuild has already absorbed.
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+        self._lock = threading.Lock()
+        # Line count as of _counted_bytes; other workers may append, so it is topped up from there.
+        self._count = 0
+        self._counted_bytes = 0
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def append(self, rows: List[Dict[str, Any]], labels: List[int]) -> int:
+        received_at = datetime.now(timezone.utc).isoformat()
+        lines = "".join(
+            json.dumps({"features": _json_row(row), "label": int(label), "receivedAt": received_at}) + "\n"
+            for row, label in zip(rows, labels)
+        )
+        with self._lock:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            # One write per request keeps concurrent O_APPEND writers from interleaving rows.
+            with open(self._path, "a", encoding="utf-8") as handle:
+                handle.write(lines)
+            return self._count_locked()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._count_locked()
+
+    def load(self, start: int = 0) -> Tuple[pd.DataFrame, pd.Series]:
+        features, labels, _ = self.read_from(0, skip=start)
+        return features, labels
+
+    def read_from(self, cursor: int, skip: int = 0) -> Tuple[pd.DataFrame, pd.Series, int]:
+        # Rows after byte offset cursor (0, or the offset an earlier call returned), minus the
+        # first skip lines, plus the offset to continue from; callers that follow the store
+        # read only what was appended since.
+        with self._lock:
+            if not self._path.exists():
+                return outcome_frame([]), pd.Series([], dtype=int), cursor
+            with open(self._path, "rb") as handle:
+                handle.seek(cursor)
+                data = handle.read()
+        # A line another worker is still appending is left for the next call.
+        complete = data[: data.rfind(b"\n") + 1]
+        records: List[Dict[str, Any]] = []
+        labels: List[int] = []
+        for index, line in enumerate(complete.splitlines()):
+            if index < skip or not line.strip():
+                continue
+            entry = json.loads(line)
+            records.append(entry["features"])
+            labels.append(int(entry["label"]))
+        return outcome_frame(records), pd.Series(labels, dtype=int), cursor + len(complete)
+
+    def _count_locked(self) -> int:
+        size = self._path.stat().st_size if self._path.exists() else 0
+        if size < self._counted_bytes:
+            self._count, self._counted_bytes = 0, 0
+        if size > self._counted_bytes:
+            with open(self._path, "rb") as handle:
+                handle.seek(self._counted_bytes)
+                self._count += handle.read(size - self._counted_bytes).count(b"\n")
+            self._counted_bytes = size
+        return self._count
+
+
+def outcome_frame(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    # Same dtypes as load_training_data: float64 numerics, object categoricals with NaN.
+    frame = pd.DataFrame(records, columns=FEATURE_KEYS)
+    for key in FEATURE_KEYS:
+        if FEATURE_TYPES_BY_KEY[key] == "numeric":
+            frame[key] = pd.to_numeric(frame[key], errors="coerce").astype(np.float64)
+        else:
+            frame[key] = frame[key].astype(object).where(frame[key].notna(), np.nan)
+    return frame
+
+
+def _json_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Missing values are stored as null rather than the non-standard NaN token.
+    return {key: None if isinstance(value, float) and np.isnan(value) else value for key, value in row.items()}
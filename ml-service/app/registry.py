@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import random
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from app.metrics import MODEL_REGISTRY_EVENTS, SHADOW_ABS_DELTA, SHADOW_EVENTS, request_scope
+from app.service import ModelManager, ModelNotFoundError
+
+DEFAULT_MODEL = "default"
+# "<name>" or "<name>@<version>"; names are directory names, so no separators or dot-dot.
+_SELECTOR = re.compile(r"^(?P<name>[A-Za-z0-9][A-Za-z0-9_-]*)(?:@(?P<version>[0-9A-Za-z]+))?$")
+
+
+class ModelRegistry:
+    # Named bundles live under <root>/<name>/model.joblib, earlier versions under
+    # <name>/versions/model-<version>.joblib; "default@<version>" addresses the default
+    # model's own versions. Bundles load read-only on first use and stay resident until the
+    # total footprint exceeds the memory budget, least recently used first out. The default
+    # manager trains, retrains and ingests outcomes, and is never evicted.
+    def __init__(
+        self,
+        default: ModelManager,
+        default_dir: str | Path,
+        root: str | Path,
+        memory_budget_bytes: int,
+        shadow_model: str = "",
+        shadow_sample_rate: float = 0.0,
+        shadow_queue_depth: int = 64,
+    ) -> None:
+        self._default = default
+        self._default_dir = Path(default_dir)
+        self._root = Path(root)
+        self._memory_budget_bytes = memory_budget_bytes
+        self._lock = threading.Lock()
+        self._resident: OrderedDict[str, Tuple[ModelManager, int]] = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._loads = 0
+        self._evictions = 0
+
+        self._shadow_model = self.normalize(shadow_model) if shadow_model else None
+        self._shadow_sample_rate = min(max(shadow_sample_rate, 0.0), 1.0)
+        # Shadow work queues behind one thread; a full queue drops the sample instead of
+        # growing, so a slow challenger can never back up the default model's requests.
+        self._shadow_slots = threading.BoundedSemaphore(max(shadow_queue_depth, 1))
+        self._shadow_executor: ThreadPoolExecutor | None = None
+        self._shadow_stats = {"requests": 0, "rows": 0, "dropped": 0, "failed": 0, "labelAgreements": 0, "absDeltaSum": 0.0}
+
+    @staticmethod
+    def normalize(selector: str | None) -> str:
+        if selector is None or not selector.strip() or selector.strip() == DEFAULT_MODEL:
+            return DEFAULT_MODEL
+        selector = selector.strip()
+        if _SELECTOR.match(selector) is None:
+            raise ValueError("model must be '<name>' or '<name>@<version>' using letters, digits, '-' and '_'")
+        return selector
+
+    def resolve(self, selector: str | None) -> Tuple[str, ModelManager]:
+        key = self.normalize(selector)
+        if key == DEFAULT_MODEL:
+            return key, self._default
+        with self._lock:
+            entry = self._resident.get(key)
+            if entry is not None:
+                self._resident.move_to_end(key)
+                return key, entry[0]
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # One loader per selector; concurrent requests for the same model wait for it.
+        with load_lock:
+            with self._lock:
+                entry = self._resident.get(key)
+                if entry is not None:
+                    self._resident.move_to_end(key)
+                    return key, entry[0]
+            try:
+                manager = ModelManager(artifact_path=self._artifact_path(key), read_only=True)
+                manager.ensure_ready()
+                # The loaded size is provisional: warm-up adds the explainer, compiled
+                # preprocessor and flat forest, and the bundle is measured again after it.
+                size = manager.memory_bytes()
+                with self._lock:
+                    self._resident[key] = (manager, size)
+                    self._loads += 1
+                    self._evict_over_budget(keep=key)
+                threading.Thread(
+                    target=self._warm_and_measure, args=(key, manager), name="model-warmup", daemon=True
+                ).start()
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        MODEL_REGISTRY_EVENTS.inc(event="load")
+        return key, manager
+
+    def shadow(self, selected: str, rows: List[Any], results: List[Dict[str, Any]]) -> None:
+        # Called after the default model answered; the challenger scores the same rows later
+        # on the shadow thread and only its agreement with the default is recorded.
+        challenger = self._shadow_model
+        if challenger is None or selected != DEFAULT_MODEL or random.random() >= self._shadow_sample_rate:
+            return
+        if not self._shadow_slots.acquire(blocking=False):
+            with self._lock:
+                self._shadow_stats["dropped"] += 1
+            SHADOW_EVENTS.inc(challenger=challenger, event="dropped")
+            return
+        primary = [(result.get("probability"), result.get("label")) for result in results]
+        with self._lock:
+            if self._shadow_executor is None:
+                self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-scoring")
+            executor = self._shadow_executor
+        executor.submit(self._score_shadow, challenger, rows, primary)
+
+    def stats(self) -> Dict[str, Any]:
+        default_bytes = self._default.memory_bytes()
+        with self._lock:
+            resident = [{"model": key, "bytes": size} for key, (_, size) in reversed(self._resident.items())]
+            shadow = dict(self._shadow_stats)
+            resident_bytes = default_bytes + sum(size for _, size in self._resident.values())
+            loads, evictions = self._loads, self._evictions
+        rows = shadow["rows"]
+        return {
+            "root": str(self._root),
+            "available": self.available(),
+            "resident": resident,
+            "residentBytes": resident_bytes,
+            "memoryBudgetBytes": self._memory_budget_bytes,
+            "loads": loads,
+            "evictions": evictions,
+            "shadow": {
+                "challenger": self._shadow_model,
+                "sampleRate": self._shadow_sample_rate,
+                "requests": shadow["requests"],
+                "rows": rows,
+                "dropped": shadow["dropped"],
+                "failed": shadow["failed"],
+                "meanAbsDelta": shadow["absDeltaSum"] / rows if rows else None,
+                "labelAgreement": shadow["labelAgreements"] / rows if rows else None,
+            },
+        }
+
+    def available(self) -> List[str]:
+        if not self._root.is_dir():
+            return []
+        return sorted(path.parent.name for path in self._root.glob("*/model.joblib"))
+
+    def _artifact_path(self, key: str) -> Path:
+        name, _, version = key.partition("@")
+        base = self._default_dir if name == DEFAULT_MODEL else self._root / name
+        path = base / "versions" / f"model-{version}.joblib" if version else base / "model.joblib"
+        if not path.exists():
+            raise ModelNotFoundError(f"Unknown model '{key}'")
+        return path
+
+    def _warm_and_measure(self, key: str, manager: ModelManager) -> None:
+        manager.warm()
+        size = manager.memory_bytes()
+        with self._lock:
+            entry = self._resident.get(key)
+            # Evicted, or replaced by a later load, while it warmed.
+            if entry is None or entry[0] is not manager:
+                return
+            self._resident[key] = (manager, size)
+            self._evict_over_budget(keep=key)
+
+    def _evict_over_budget(self, keep: str) -> None:
+        # Called with the lock held. Dropping the reference is enough: requests that already
+        # resolved the manager finish on it, and its mapped pages go once they let go.
+        total = self._default.memory_bytes() + sum(size for _, size in self._resident.values())
+        for key in list(self._resident):
+            if total <= self._memory_budget_bytes:
+                break
+            if key == keep:
+                continue
+            _, size = self._resident.pop(key)
+            total -= size
+            self._evictions += 1
+            MODEL_REGISTRY_EVENTS.inc(event="eviction")
+
+    def _score_shadow(self, challenger: str, rows: List[Any], primary: List[Tuple[Any, Any]]) -> None:
+        try:
+            with request_scope("shadow"):
+                _, manager = self.resolve(challenger)
+                shadow_results = manager.predict_many(rows, "none")
+            compared = agreements = 0
+            abs_delta_sum = 0.0
+            for (probability, label), result in zip(primary, shadow_results):
+                if probability is None or result.get("probability") is None:
+                    continue
+                delta = abs(float(result["probability"]) - float(probability))
+                SHADOW_ABS_DELTA.observe(delta, challenger=challenger)
+                compared += 1
+                agreements += int(result["label"] == label)
+                abs_delta_sum += delta
+            with self._lock:
+                self._shadow_stats["requests"] += 1
+                self._shadow_stats["rows"] += compared
+                self._shadow_stats["labelAgreements"] += agreements
+                self._shadow_stats["absDeltaSum"] += abs_delta_sum
+            SHADOW_EVENTS.inc(challenger=challenger, event="scored")
+        except Exception:
+            with self._lock:
+                self._shadow_stats["failed"] += 1
+            SHADOW_EVENTS.inc(challenger=challenger, event="failed")
+        finally:
+            self._shadow_slots.release()
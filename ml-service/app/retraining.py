@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+
+class RetrainInProgressError(RuntimeError):
+    pass
+
+
+class BackgroundRetrainer:
+    def __init__(
+        self,
+        job: Callable[[str], str],
+        accept: Callable[[str, bool], Dict[str, Any]],
+        versions_dir: str,
+        finished: Callable[[], None] | None = None,
+    ) -> None:
+        # job runs in a separate process and returns the path of the versioned artifact it
+        # wrote; accept runs back in the serving process to gate and install the candidate
+        # (the flag says whether the holdout gate applies). finished runs after every
+        # attempt, whether it was accepted, rejected or failed.
+        self._job = job
+        self._accept = accept
+        self._finished = finished
+        self._versions_dir = versions_dir
+        self._lock = threading.Lock()
+        self._status: Dict[str, Any] = {"state": "idle"}
+
+    def start(self, reason: str = "manual", validate: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            if self._status["state"] == "running":
+                raise RetrainInProgressError("A retrain is already running")
+            self._status = {
+                "state": "running",
+                "reason": reason,
+                "startedAt": datetime.now(timezone.utc).isoformat(),
+            }
+            thread = threading.Thread(target=self._run, args=(validate,), name="model-retrain", daemon=True)
+            thread.start()
+            return dict(self._status)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+    @property
+    def running(self) -> bool:
+        with self._lock:
+            return self._status["state"] == "running"
+
+    def _run(self, validate: bool) -> None:
+        update: Dict[str, Any]
+        try:
+            # spawn keeps the training process free of the server's threads and locks.
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                artifact_path = executor.submit(self._job, self._versions_dir).result()
+            outcome = self._accept(artifact_path, validate)
+            update = {"state": "succeeded" if outcome.get("accepted") else "rejected", **outcome}
+        except Exception as error:
+            update = {"state": "failed", "error": str(error)}
+        finally:
+            if self._finished is not None:
+                self._finished()
+
+        with self._lock:
+            self._status.update(update)
+            self._status["finishedAt"] = datetime.now(timezone.utc).isoformat()
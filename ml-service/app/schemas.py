@@ -1,19 +1,82 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Literal
 
 from pydantic import BaseModel, Field
 
+ExplanationMode = Literal["none", "fast", "shap", "auto"]
 
-class PredictRequest(BaseModel):
+
+class ModelSelector(BaseModel):
+    # Registry selector ("<name>" or "<name>@<version>"); takes precedence over the X-Model
+    # header. Empty means the default model.
+    model: str | None = Field(default=None, max_length=128)
+
+
+class ExplanationControls(ModelSelector):
+    # none: probability/bucket only; fast: model-native proxy; shap: SHAP attributions;
+    # auto: SHAP unless its estimated cost would exceed latencyBudgetMs, then fast.
+    explanationMode: ExplanationMode | None = None
+    topK: int | None = Field(default=None, ge=0, le=50)
+    latencyBudgetMs: float | None = Field(default=None, gt=0)
+
+
+class PredictRequest(ExplanationControls):
     features: Dict[str, Any] = Field(default_factory=dict)
 
 
-class WhatIfRequest(BaseModel):
+class BatchPredictRequest(ExplanationControls):
+    # Rows are validated one by one so a bad row does not reject the whole cohort.
+    rows: List[Any] = Field(default_factory=list)
+
+
+class WhatIfRequest(ExplanationControls):
     baselineFeatures: Dict[str, Any] = Field(default_factory=dict)
     overrides: Dict[str, Any] = Field(default_factory=dict)
 
 
+class SweepAxis(BaseModel):
+    featureKey: str
+    values: List[Any] = Field(default_factory=list)
+
+
+class WhatIfSweepRequest(ModelSelector):
+    baselineFeatures: Dict[str, Any] = Field(default_factory=dict)
+    axes: List[SweepAxis] = Field(default_factory=list)
+    includeExplanations: bool = False
+
+
+class SensitivityRequest(ModelSelector):
+    baselineFeatures: Dict[str, Any] = Field(default_factory=dict)
+    # step: numeric features move by -/+ step standard deviations; percentile: to each of
+    # the training percentiles. Categorical features try every other category either way.
+    perturbation: Literal["step", "percentile"] = "step"
+    step: float = Field(default=1.0, gt=0, le=10)
+    percentiles: List[float] | None = Field(default=None, max_length=21)
+    # Restricts the analysis to these features; all of FEATURE_DEFINITIONS by default.
+    features: List[str] | None = None
+    topK: int | None = Field(default=None, ge=1)
+
+
+class CounterfactualBounds(BaseModel):
+    min: float | None = None
+    max: float | None = None
+
+
+class CounterfactualRequest(ModelSelector):
+    baselineFeatures: Dict[str, Any] = Field(default_factory=dict)
+    # Defaults to the bucket below the baseline's.
+    targetBucket: Literal["green", "yellow"] | None = None
+    # Actionable features to search, all of them by default; other features never change.
+    features: List[str] | None = None
+    # Per-feature limits replacing the training range.
+    bounds: Dict[str, CounterfactualBounds] = Field(default_factory=dict)
+    maxScenarios: int = Field(default=3, ge=1, le=10)
+    # Both are capped by COUNTERFACTUAL_TIME_BUDGET_MS and COUNTERFACTUAL_MAX_EVALUATIONS.
+    timeBudgetMs: float | None = Field(default=None, gt=0)
+    maxEvaluations: int | None = Field(default=None, ge=1)
+
+
 class ExplanationItem(BaseModel):
     featureKey: str
     displayName: str
@@ -27,6 +90,21 @@ class PredictResponse(BaseModel):
     label: int
     bucket: str
     explanations: List[ExplanationItem]
+    explanationMode: str
+
+
+class BatchPredictItem(BaseModel):
+    index: int
+    probability: float | None = None
+    label: int | None = None
+    bucket: str | None = None
+    explanations: List[ExplanationItem] = Field(default_factory=list)
+    explanationMode: str | None = None
+    error: str | None = None
+
+
+class BatchPredictResponse(BaseModel):
+    results: List[BatchPredictItem]
 
 
 class WhatIfResponse(BaseModel):
@@ -36,6 +114,85 @@ class WhatIfResponse(BaseModel):
     bucket: str
     changedFeatures: List[Dict[str, Any]]
     explanations: List[ExplanationItem]
+    explanationMode: str
+
+
+class SweepAxisResult(BaseModel):
+    featureKey: str
+    displayName: str
+    values: List[Any]
+
+
+class WhatIfSweepResponse(BaseModel):
+    baselineProbability: float
+    baselineBucket: str
+    axes: List[SweepAxisResult]
+    # 1-D curve for one axis, 2-D surface (first axis x second axis) for two.
+    probabilities: List[float] | List[List[float]]
+    buckets: List[str] | List[List[str]]
+    # Row-major over the grid, only when includeExplanations is set.
+    explanations: List[List[ExplanationItem]] | None = None
+
+
+class SensitivityScenario(BaseModel):
+    featureKey: str
+    displayName: str
+    # "-1sd" / "+1sd", "p75" or "category".
+    change: str
+    oldValue: Any | None = None
+    newValue: Any | None = None
+    probability: float
+    delta: float
+    bucket: str
+
+
+class SensitivityResponse(BaseModel):
+    baselineProbability: float
+    baselineBucket: str
+    perturbation: str
+    evaluated: int
+    # Ranked by delta, most risk-reducing change first.
+    scenarios: List[SensitivityScenario]
+
+
+class CounterfactualScenario(BaseModel):
+    probability: float
+    delta: float
+    bucket: str
+    # Total movement in training standard deviations.
+    distance: float
+    changedFeatures: List[Dict[str, Any]]
+
+
+class CounterfactualResponse(BaseModel):
+    baselineProbability: float
+    baselineBucket: str
+    targetBucket: str
+    evaluations: int
+    # already_in_target, converged, completed, time_budget or max_evaluations.
+    stoppedBy: str
+    # Fewest changed features first, then smallest distance; one per set of changed features.
+    scenarios: List[CounterfactualScenario]
+
+
+class OutcomeRow(BaseModel):
+    features: Dict[str, Any] = Field(default_factory=dict)
+    label: int = Field(ge=0, le=1)
+
+
+class IngestOutcomesRequest(BaseModel):
+    rows: List[OutcomeRow] = Field(default_factory=list)
+
+
+class IngestOutcomesResponse(BaseModel):
+    stored: int
+    storeRows: int
+    rowsSinceRebuild: int
+    drift: float
+    # Result of the incremental update (accepted, candidate version, holdout F1), if one ran.
+    update: Dict[str, Any] | None = None
+    # Status of the full rebuild started because a drift or row-count threshold was crossed.
+    rebuild: Dict[str, Any] | None = None
 
 
 class CourseRiskPredictRequest(BaseModel):
@@ -44,3 +201,11 @@ class CourseRiskPredictRequest(BaseModel):
 
 class CourseRiskPredictResponse(BaseModel):
     probabilityFail: float
+
+
+class CourseRiskBatchPredictRequest(BaseModel):
+    rows: List[Dict[str, float]] = Field(default_factory=list)
+
+
+class CourseRiskBatchPredictResponse(BaseModel):
+    probabilityFail: List[float]
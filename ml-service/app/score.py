@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from app.config import settings
+from app.service import EXPLANATION_MODES, ModelManager
+from app.training import resolve_worker_budget
+
+INPUT_SUFFIXES = (".csv", ".json", ".jsonl")
+DEFAULT_CHUNK_ROWS = 2000
+
+# Set in the parent before the pool forks, so workers share the loaded bundle copy-on-write.
+_MANAGER: ModelManager | None = None
+
+
+def score_files(
+    inputs: List[Path],
+    output_path: Path,
+    artifact_dir: str | None = None,
+    explanation_mode: str = "none",
+    top_k: int | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    workers: int = 1,
+) -> Dict[str, Any]:
+    global _MANAGER
+    artifact_path = Path(artifact_dir or settings.artifact_dir) / "model.joblib"
+    if not artifact_path.exists():
+        raise FileNotFoundError(f"No trained bundle at {artifact_path}; start the service or retrain first")
+    if explanation_mode not in EXPLANATION_MODES:
+        raise ValueError(f"explanation mode must be one of {', '.join(EXPLANATION_MODES)}")
+
+    # The prediction cache is off: every row is scored once and the cache would only cost memory.
+    # Read-only: the CLI scores with the bundle as stored, never retraining a stale one.
+    _MANAGER = ModelManager(artifact_path=artifact_path, prediction_cache_size=0, read_only=True)
+    _MANAGER.ensure_ready()
+    # Warmed before the fork, so every worker starts on the fast paths.
+    _MANAGER.warm()
+    model_version = _MANAGER.health()["modelVersion"]
+
+    files = _expand_inputs(inputs)
+    if not files:
+        raise FileNotFoundError("No CSV/JSON inputs found")
+    chunks = _read_chunks(files, max(chunk_rows, 1))
+    tasks = ((source, offset, records, explanation_mode, top_k) for source, offset, records in chunks)
+
+    writer = _ResultWriter(output_path, include_explanations=explanation_mode != "none")
+    rows = errors = 0
+    started_at = time.perf_counter()
+    try:
+        if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                # imap keeps chunk order, so the output follows the input files row for row.
+                for frame in pool.imap(_score_chunk, tasks):
+                    rows, errors = rows + len(frame), errors + int(frame["error"].notna().sum())
+                    writer.write(frame)
+        else:
+            workers = 1
+            for task in tasks:
+                frame = _score_chunk(task)
+                rows, errors = rows + len(frame), errors + int(frame["error"].notna().sum())
+                writer.write(frame)
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - started_at
+
+    return {
+        "inputs": [str(path) for path in files],
+        "output": str(output_path),
+        "modelVersion": model_version,
+        "explanationMode": explanation_mode,
+        "rows": rows,
+        "errors": errors,
+        "seconds": seconds,
+        "rowsPerSecond": rows / seconds if seconds > 0 else None,
+        "workers": workers,
+        "chunkRows": chunk_rows,
+    }
+
+
+def _score_chunk(task: Tuple[str, int, List[Dict[str, Any]], str, int | None]) -> pd.DataFrame:
+    source, offset, records, explanation_mode, top_k = task
+    assert _MANAGER is not None
+    # predict_many is the /predict/batch path: same normalization, per-row errors, same model.
+    results = _MANAGER.predict_many(records, explanation_mode, top_k)
+    frame = pd.DataFrame(
+        {
+            "source": source,
+            "row": [offset + result["index"] for result in results],
+            "probability": [result.get("probability") for result in results],
+            "label": pd.array([result.get("label") for result in results], dtype="Int64"),
+            "bucket": [result.get("bucket") for result in results],
+            "error": [result.get("error") for result in results],
+        }
+    )
+    if explanation_mode != "none":
+        frame["explanationMode"] = [result.get("explanationMode") for result in results]
+        frame["explanations"] = [
+            json.dumps(result["explanations"]) if "explanations" in result else None for result in results
+        ]
+    return frame
+
+
+def _expand_inputs(inputs: List[Path]) -> List[Path]:
+    files: List[Path] = []
+    for path in inputs:
+        if path.is_dir():
+            files.extend(sorted(item for item in path.rglob("*") if item.is_file() and item.suffix.lower() in INPUT_SUFFIXES))
+        elif path.exists():
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"Input not found: {path}")
+    return files
+
+
+def _read_chunks(files: List[Path], chunk_rows: int) -> Iterator[Tuple[str, int, List[Dict[str, Any]]]]:
+    # Yields (source, first row index, raw records); values stay as exported so the API's
+    # normalize_features sees exactly what a client would send.
+    for path in files:
+        suffix = path.suffix.lower()
+        if suffix == ".csv":
+            offset = 0
+            for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+                yield path.name, offset, chunk.to_dict("records")
+                offset += len(chunk)
+        elif suffix == ".jsonl":
+            yield from _batched_lines(path, chunk_rows)
+        else:
+            records = json.loads(path.read_text(encoding="utf-8"))
+            if isinstance(records, dict):
+                records = records.get("rows", [records])
+            for offset in range(0, len(records), chunk_rows):
+                yield path.name, offset, records[offset : offset + chunk_rows]
+
+
+def _batched_lines(path: Path, chunk_rows: int) -> Iterator[Tuple[str, int, List[Dict[str, Any]]]]:
+    batch: List[Dict[str, Any]] = []
+    offset = 0
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            batch.append(json.loads(line))
+            if len(batch) == chunk_rows:
+                yield path.name, offset, batch
+                offset += len(batch)
+                batch = []
+    if batch:
+        yield path.name, offset, batch
+
+
+class _ResultWriter:
+    # Appends chunk frames as they arrive: Parquet row groups or CSV blocks, by file suffix.
+    def __init__(self, output_path: Path, include_explanations: bool) -> None:
+        self._path = output_path
+        self._include_explanations = include_explanations
+        self._parquet = output_path.suffix.lower() == ".parquet"
+        self._writer: Any = None
+        self._wrote_csv_header = False
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, schema=self._schema(), preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._path, table.schema)
+            self._writer.write_table(table)
+            return
+        frame.to_csv(self._path, mode="a" if self._wrote_csv_header else "w", header=not self._wrote_csv_header, index=False)
+        self._wrote_csv_header = True
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+    def _schema(self) -> Any:
+        # Fixed types so an all-error or all-null chunk cannot change the file schema.
+        import pyarrow as pa
+
+        fields = [
+            ("source", pa.string()),
+            ("row", pa.int64()),
+            ("probability", pa.float64()),
+            ("label", pa.int64()),
+            ("bucket", pa.string()),
+            ("error", pa.string()),
+        ]
+        if self._include_explanations:
+            fields += [("explanationMode", pa.string()), ("explanations", pa.string())]
+        return pa.schema(fields)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score student exports offline with the persisted bundle.")
+    parser.add_argument("inputs", nargs="+", type=Path, help="CSV, JSON (array) or JSONL files, or directories of them")
+    parser.add_argument("--output", type=Path, default=Path(settings.artifact_dir) / "scores.parquet", help=".parquet or .csv")
+    parser.add_argument("--artifact-dir", default=settings.artifact_dir)
+    parser.add_argument("--explanation-mode", choices=EXPLANATION_MODES, default="none")
+    parser.add_argument("--top-k", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=0, help="Forked scoring processes sharing the loaded bundle (0: all cores)")
+    parser.add_argument("--report", type=Path, help="Also write the throughput report as JSON")
+    args = parser.parse_args()
+
+    try:
+        report = score_files(
+            args.inputs,
+            args.output,
+            args.artifact_dir,
+            args.explanation_mode,
+            args.top_k,
+            args.chunk_rows,
+            resolve_worker_budget(args.workers),
+        )
+    except (FileNotFoundError, ValueError) as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+
+    print(
+        f"Scored {report['rows']} rows ({report['errors']} errors) in {report['seconds']:.2f}s "
+        f"= {report['rowsPerSecond'] or 0:.1f} rows/s with {report['workers']} worker(s) -> {report['output']}"
+    )
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
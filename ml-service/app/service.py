@@ -1,28 +1,139 @@
 from __future__ import annotations
 
+import hashlib
+import itertools
+import pickle
 import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
-import joblib
 import numpy as np
 import pandas as pd
 
+from app.artifact_store import (
+    artifact_lock,
+    atomic_copy,
+    atomic_dump,
+    claim,
+    file_identity,
+    load_artifact,
+    prune_least_recent,
+    touch,
+)
 from app.config import settings
-from app.data_loader import load_training_data, resolve_train_dataset_path
-from app.explainability import local_explanations
-from app.feature_map import FEATURE_KEYS
-from app.training import ModelArtifacts, train_best_model
-from app.utils import display_name, ensure_feature_frame_dict, normalize_features, risk_bucket
+from app.cache import PredictionCache, feature_cache_key
+from app.compiled_preprocessor import compile_preprocessor, max_parity_error
+from app.counterfactual import SearchSpace, find_counterfactuals
+from app.data_loader import (
+    LOADER_VERSION,
+    file_digest,
+    load_training_data,
+    resolve_test_dataset_path,
+    resolve_train_dataset_path,
+)
+from app.explainability import ExplanationCostEstimator, build_explainer, build_proxy_weights, explain_batch
+from app.feature_map import ACTIONABLE_FEATURES, FEATURE_DEFINITIONS, FEATURE_KEYS, FEATURE_TYPES_BY_KEY, RAW_OR_INTERNAL_TO_KEY, normalize_feature_key
+from app.forest import FlatForest, flatten_forest, reference_predict_proba
+from app.metrics import EXPLAINER_CACHE_HITS, EXPLAINER_REBUILDS, bind_model, timed_stage
+from app.outcomes import OUTCOME_STORE_NAME, OutcomeStore, outcome_frame
+from app.retraining import BackgroundRetrainer, RetrainInProgressError
+from app.utils import (
+    BUCKET_UPPER_BOUNDS,
+    RISK_BUCKETS,
+    convert_value,
+    display_name,
+    ensure_feature_frame_dict,
+    normalize_features,
+    risk_bucket,
+)
+
+if TYPE_CHECKING:
+    from app.training import ModelArtifacts
+
+# app.training and the sklearn modules only needed for training, validation or flattening
+# are imported where they are used: serving a loaded bundle should not pay for them.
+
+
+EXPLANATION_MODES = ("none", "fast", "shap", "auto")
+SENSITIVITY_PERTURBATIONS = ("step", "percentile")
+DEFAULT_SENSITIVITY_PERCENTILES = (10.0, 25.0, 50.0, 75.0, 90.0)
+# Settings that change what training produces; together with the dataset bytes, the feature
+# map and the code versions they make up the artifact key.
+TRAINING_SETTING_FIELDS = ("random_state", "cv_folds", "background_size", "background_method", "background_fidelity_tolerance")
+
+
+@dataclass(frozen=True)
+class ExplanationOptions:
+    mode: str
+    top_k: int
+    deadline: float | None = None
+
+
+COURSE_RISK_FEATURE_KEYS = [
+    "weightedPercent",
+    "remainingWeight",
+    "maxAchievablePercent",
+    "totalAbsences",
+    "absencesRate",
+    "missingWeeksCount",
+    "examCompletedRatio",
+    "quizTrend",
+]
+
+
+class ModelNotFoundError(LookupError):
+    pass
 
 
 class ModelManager:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        artifact_dir: str | None = None,
+        prediction_cache_size: int | None = None,
+        artifact_path: str | Path | None = None,
+        read_only: bool = False,
+        prediction_cache: PredictionCache | None = None,
+    ) -> None:
+        # Overrides let tools such as the benchmark run against an isolated artifact directory.
+        # A read-only manager serves exactly the artifact at artifact_path: it never trains,
+        # rebuilds or writes, which is how the model registry loads named bundles.
         self._lock = threading.Lock()
+        self._read_only = read_only
         self._bundle: Dict[str, Any] | None = None
-        self._artifact_path = Path(settings.artifact_dir) / "model.joblib"
-        self._artifact_path.parent.mkdir(parents=True, exist_ok=True)
+        self._prediction_cache = (
+            prediction_cache
+            if prediction_cache is not None
+            else PredictionCache(
+                settings.prediction_cache_size if prediction_cache_size is None else prediction_cache_size,
+                settings.prediction_cache_ttl_seconds,
+                int(settings.prediction_cache_max_mb * 1024 * 1024),
+            )
+        )
+        self._artifact_path = (
+            Path(artifact_path) if artifact_path is not None else Path(artifact_dir or settings.artifact_dir) / "model.joblib"
+        )
+        if not read_only:
+            self._artifact_path.parent.mkdir(parents=True, exist_ok=True)
+        self._versions_dir = self._artifact_path.parent / "versions"
+        self._keyed_dir = self._artifact_path.parent / "keyed"
+        self._expected_key: str | None = None
+        self._rebuild_claim: Any = None
+        self._artifact_identity: Tuple[int, int] | None = None
+        self._retrainer = BackgroundRetrainer(
+            job=_retrain_job,
+            accept=self._accept_candidate,
+            versions_dir=str(self._versions_dir),
+            finished=self._release_rebuild_claim,
+        )
+        self._outcomes = OutcomeStore(self._artifact_path.parent / OUTCOME_STORE_NAME)
+        self._update_lock = threading.Lock()
+        self._drift_lock = threading.Lock()
+        self._drift_state: Dict[str, Any] | None = None
+        self._startup: Dict[str, Dict[str, Any]] = {}
+        self._load_source = "artifact"
 
     def ensure_ready(self) -> None:
         if self._bundle is not None:
@@ -30,37 +141,161 @@ class ModelManager:
         with self._lock:
             if self._bundle is not None:
                 return
-            self._bundle = self._load_or_train()
+            started_at = time.perf_counter()
+            # Taken before loading, so a write during the load shows up as a change later.
+            self._artifact_identity = self._stat_artifact()
+            self._swap_bundle(self._load_or_train())
+            self._startup["load"] = {"seconds": time.perf_counter() - started_at, "source": self._load_source}
+
+    def warm(self) -> None:
+        # Second startup phase, after the bundle serves: build the SHAP explainer (the shap
+        # import alone takes about a second), parity-check the compiled preprocessor and the
+        # flat forest, then score one row per explanation path so first requests run hot.
+        # A rebuilt bundle arrives already warmed; only the scoring pass runs for it.
+        bundle = self._current_bundle()
+        self._startup["warm"] = {"state": "running"}
+        started_at = time.perf_counter()
+        try:
+            _warm_bundle(bundle)
+            row = [ensure_feature_frame_dict({})]
+            for mode in ("none", "fast", "shap"):
+                self._score_rows(bundle, row, [mode])
+        except Exception as error:
+            self._startup["warm"] = {"state": "failed", "error": str(error)}
+            return
+        self._startup["warm"] = {"state": "done", "seconds": time.perf_counter() - started_at}
+
+    def start_warmup(self) -> None:
+        if "warm" not in self._startup:
+            self._startup["warm"] = {"state": "pending"}
+            threading.Thread(target=self.warm, name="model-warmup", daemon=True).start()
+
+    def record_startup_phase(self, phase: str, seconds: float) -> None:
+        self._startup[phase] = {"seconds": seconds}
 
     def health(self) -> Dict[str, Any]:
-        self.ensure_ready()
-        assert self._bundle is not None
+        bundle = self._current_bundle()
         return {
             "status": "ok",
-            "modelName": self._bundle["modelName"],
-            "trainedAt": self._bundle["trainedAt"],
-            "datasetPath": self._bundle["datasetPath"],
+            "modelName": bundle["modelName"],
+            "trainedAt": bundle["trainedAt"],
+            "datasetPath": bundle["datasetPath"],
+            "modelVersion": bundle["modelVersion"],
+            "startup": dict(self._startup),
+            "retrain": self._retrainer.status(),
+            "artifact": {
+                "key": bundle.get("artifactKey"),
+                "expectedKey": self._expected_key,
+                "stale": self._expected_key is not None and not _key_matches(bundle, self._expected_key),
+                "pinned": self._expected_key is not None and bundle.get("pinned") == self._expected_key,
+            },
+            "outcomes": {
+                "storeRows": self._outcomes.count(),
+                "rowsSinceRebuild": self._outcomes.count() - bundle.get("outcomeRowsAtRebuild", 0),
+                "parentVersion": bundle.get("parentVersion"),
+            },
+            "predictionCache": self._prediction_cache.stats(),
+            "explainerCache": {
+                "cached": bundle.get("explainer") is not None,
+                "hits": EXPLAINER_CACHE_HITS.value(model=bundle["model"].__class__.__name__),
+                "rebuilds": EXPLAINER_REBUILDS.value(model=bundle["model"].__class__.__name__),
+            },
+            "flatForest": {
+                "active": bundle.get("flatForest") is not None,
+                "bytes": bundle["flatForest"].nbytes if bundle.get("flatForest") is not None else None,
+            },
+            "background": {
+                "rows": int(bundle["backgroundMatrix"].shape[0]),
+                "weighted": bundle.get("backgroundWeights") is not None,
+                "fidelity": bundle["metrics"].get(bundle["modelName"], {}).get("backgroundFidelity"),
+            },
+            "memory": bundle["footprint"],
         }
 
-    def predict(self, features: Dict[str, Any]) -> Dict[str, Any]:
-        self.ensure_ready()
-        assert self._bundle is not None
+    def predict(
+        self,
+        features: Dict[str, Any],
+        explanation_mode: str | None = None,
+        top_k: int | None = None,
+        latency_budget_ms: float | None = None,
+    ) -> Dict[str, Any]:
+        options = explanation_options(explanation_mode, top_k, latency_budget_ms)
+        bundle = self._current_bundle()
+        with timed_stage("normalize"):
+            row_dict = ensure_feature_frame_dict(features)
+        mode = self._resolve_mode(bundle, options, 1)
+        return self._predict_rows(bundle, [row_dict], [mode], options.top_k)[0]
 
-        row_dict = ensure_feature_frame_dict(features)
-        row_df = pd.DataFrame([row_dict], columns=FEATURE_KEYS)
+    def cached_prediction(
+        self,
+        features: Dict[str, Any],
+        explanation_mode: str | None = None,
+        top_k: int | None = None,
+        latency_budget_ms: float | None = None,
+    ) -> Dict[str, Any] | None:
+        # predict() answered from this process's cache only, or None; the server tries it
+        # before sending a /predict to an offload worker.
+        options = explanation_options(explanation_mode, top_k, latency_budget_ms)
+        bundle = self._current_bundle()
+        with timed_stage("normalize"):
+            row_dict = ensure_feature_frame_dict(features)
+        mode = self._resolve_mode(bundle, options, 1)
+        with timed_stage("cache_lookup"):
+            cached = self._prediction_cache.get(feature_cache_key(bundle["modelVersion"], row_dict, mode))
+        return None if cached is None else {**cached, "explanations": cached["explanations"][: options.top_k]}
 
-        prediction = self._predict_from_df(row_df)
-        return prediction
+    def store_predictions(self, entries: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        # Cache entries an offload worker wrote; those for another model version are dropped.
+        version = self.model_version()
+        for key, prediction in entries:
+            if key[0] == version:
+                self._prediction_cache.put(key, prediction)
 
-    def what_if(self, baseline_features: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
-        self.ensure_ready()
-        assert self._bundle is not None
+    def predict_many(
+        self,
+        rows: List[Any],
+        explanation_mode: str | None = None,
+        top_k: int | None = None,
+        latency_budget_ms: float | None = None,
+    ) -> List[Dict[str, Any]]:
+        options = explanation_options(explanation_mode, top_k, latency_budget_ms)
+        bundle = self._current_bundle()
 
-        baseline_row = ensure_feature_frame_dict(baseline_features)
-        normalized_overrides = normalize_features(overrides)
+        # Invalid rows keep their slot so results stay aligned with the input order.
+        results: List[Dict[str, Any]] = [{"index": index} for index in range(len(rows))]
+        valid_indexes: List[int] = []
+        valid_rows: List[Dict[str, Any]] = []
+        with timed_stage("normalize"):
+            for index, features in enumerate(rows):
+                if not isinstance(features, dict):
+                    results[index]["error"] = "features must be an object"
+                    continue
+                if not features:
+                    results[index]["error"] = "features must not be empty"
+                    continue
+                valid_indexes.append(index)
+                valid_rows.append(ensure_feature_frame_dict(features))
 
-        baseline_df = pd.DataFrame([baseline_row], columns=FEATURE_KEYS)
-        baseline_prediction = self._predict_from_df(baseline_df)
+        if valid_rows:
+            mode = self._resolve_mode(bundle, options, len(valid_rows))
+            predictions = self._predict_rows(bundle, valid_rows, [mode] * len(valid_rows), options.top_k)
+            for index, prediction in zip(valid_indexes, predictions):
+                results[index].update(prediction)
+        return results
+
+    def what_if(
+        self,
+        baseline_features: Dict[str, Any],
+        overrides: Dict[str, Any],
+        explanation_mode: str | None = None,
+        top_k: int | None = None,
+        latency_budget_ms: float | None = None,
+    ) -> Dict[str, Any]:
+        options = explanation_options(explanation_mode, top_k, latency_budget_ms)
+        bundle = self._current_bundle()
+        with timed_stage("normalize"):
+            baseline_row = ensure_feature_frame_dict(baseline_features)
+            normalized_overrides = normalize_features(overrides)
 
         # Partial overrides only replace fields provided by the caller.
         updated_row = dict(baseline_row)
@@ -79,8 +314,11 @@ class ModelManager:
                 }
             )
 
-        updated_df = pd.DataFrame([updated_row], columns=FEATURE_KEYS)
-        updated_prediction = self._predict_from_df(updated_df)
+        # Only the updated scenario's explanations are returned, so the baseline is scored without them.
+        mode = self._resolve_mode(bundle, options, 1)
+        baseline_prediction, updated_prediction = self._predict_rows(
+            bundle, [baseline_row, updated_row], ["none", mode], options.top_k
+        )
         delta = updated_prediction["probability"] - baseline_prediction["probability"]
 
         return {
@@ -90,12 +328,267 @@ class ModelManager:
             "bucket": updated_prediction["bucket"],
             "changedFeatures": changed_features,
             "explanations": updated_prediction["explanations"],
+            "explanationMode": updated_prediction["explanationMode"],
+        }
+
+    def what_if_sweep(
+        self,
+        baseline_features: Dict[str, Any],
+        axes: List[Tuple[str, List[Any]]],
+        include_explanations: bool = False,
+    ) -> Dict[str, Any]:
+        bundle = self._current_bundle()
+        if not 1 <= len(axes) <= 2:
+            raise ValueError("axes must contain one or two features")
+
+        normalized_axes: List[Tuple[str, List[Any]]] = []
+        for raw_key, raw_values in axes:
+            key = _resolve_feature_key(raw_key)
+            if any(key == existing for existing, _ in normalized_axes):
+                raise ValueError(f"Feature {key} appears on more than one axis")
+            if not raw_values:
+                raise ValueError(f"values for {key} must not be empty")
+            values = [convert_value(value, FEATURE_TYPES_BY_KEY[key]) for value in raw_values]
+            if any(value is None for value in values):
+                raise ValueError(f"values for {key} must be valid {FEATURE_TYPES_BY_KEY[key]} values")
+            normalized_axes.append((key, values))
+
+        grid_shape = [len(values) for _, values in normalized_axes]
+        if int(np.prod(grid_shape)) > settings.max_sweep_points:
+            raise ValueError(f"Sweep grid must not exceed {settings.max_sweep_points} points")
+
+        # The baseline is predicted (and cached) once; the grid is one matrix scored in one call.
+        with timed_stage("normalize"):
+            baseline_row = ensure_feature_frame_dict(baseline_features)
+        baseline_prediction = self._predict_rows(bundle, [baseline_row], ["none"], 0)[0]
+
+        with timed_stage("grid_build"):
+            grid_rows: List[Dict[str, Any]] = []
+            for combination in itertools.product(*(values for _, values in normalized_axes)):
+                row = dict(baseline_row)
+                for (key, _), value in zip(normalized_axes, combination):
+                    row[key] = value
+                grid_rows.append(row)
+
+        if include_explanations:
+            grid_predictions = self._predict_rows(
+                bundle, grid_rows, ["shap"] * len(grid_rows), settings.explanation_top_k
+            )
+        else:
+            grid_predictions = self._score_rows(bundle, grid_rows, ["none"] * len(grid_rows))
+
+        probabilities = np.asarray([prediction["probability"] for prediction in grid_predictions]).reshape(grid_shape)
+        buckets = np.asarray([prediction["bucket"] for prediction in grid_predictions], dtype=object).reshape(grid_shape)
+
+        return {
+            "baselineProbability": baseline_prediction["probability"],
+            "baselineBucket": baseline_prediction["bucket"],
+            "axes": [
+                {"featureKey": key, "displayName": display_name(key), "values": values}
+                for key, values in normalized_axes
+            ],
+            "probabilities": probabilities.tolist(),
+            "buckets": buckets.tolist(),
+            "explanations": [prediction["explanations"] for prediction in grid_predictions]
+            if include_explanations
+            else None,
         }
 
+    def sensitivity(
+        self,
+        baseline_features: Dict[str, Any],
+        perturbation: str = "step",
+        step: float = 1.0,
+        percentiles: List[float] | None = None,
+        features: List[str] | None = None,
+        top_k: int | None = None,
+    ) -> Dict[str, Any]:
+        # One-feature-at-a-time what-ifs for every feature (or the requested ones), scored as
+        # one matrix: numeric features move by +/- step standard deviations or to training
+        # percentiles, categorical features to each other category.
+        bundle = self._current_bundle()
+        if perturbation not in SENSITIVITY_PERTURBATIONS:
+            raise ValueError(f"perturbation must be one of {', '.join(SENSITIVITY_PERTURBATIONS)}")
+        if step <= 0:
+            raise ValueError("step must be positive")
+        percentiles = list(DEFAULT_SENSITIVITY_PERCENTILES if percentiles is None else percentiles)
+        if any(not 0 <= percentile <= 100 for percentile in percentiles):
+            raise ValueError("percentiles must be between 0 and 100")
+        keys = FEATURE_KEYS if not features else list(dict.fromkeys(_resolve_feature_key(key) for key in features))
+        stats = bundle["featureStats"]
+        if perturbation == "percentile" and not any("percentiles" in stats.get(key, {}) for key in keys):
+            raise ValueError("this model was trained without feature percentiles; retrain it or use perturbation=step")
+
+        with timed_stage("normalize"):
+            baseline_row = ensure_feature_frame_dict(baseline_features)
+        baseline_prediction = self._predict_rows(bundle, [baseline_row], ["none"], 0)[0]
+
+        with timed_stage("grid_build"):
+            scenarios = _sensitivity_scenarios(baseline_row, keys, stats, perturbation, step, percentiles)
+            if len(scenarios) > settings.max_sweep_points:
+                raise ValueError(f"Sensitivity grid must not exceed {settings.max_sweep_points} scenarios")
+            rows = []
+            for key, value, _ in scenarios:
+                row = dict(baseline_row)
+                row[key] = value
+                rows.append(row)
+        predictions = self._score_rows(bundle, rows, ["none"] * len(rows)) if rows else []
+
+        baseline_probability = baseline_prediction["probability"]
+        ranked = [
+            {
+                "featureKey": key,
+                "displayName": display_name(key),
+                "change": change,
+                "oldValue": _safe_json(baseline_row[key]),
+                "newValue": _safe_json(value),
+                "probability": prediction["probability"],
+                "delta": prediction["probability"] - baseline_probability,
+                "bucket": prediction["bucket"],
+            }
+            for (key, value, change), prediction in zip(scenarios, predictions)
+        ]
+        # Most risk-reducing change first.
+        ranked.sort(key=lambda scenario: scenario["delta"])
+        return {
+            "baselineProbability": baseline_probability,
+            "baselineBucket": baseline_prediction["bucket"],
+            "perturbation": perturbation,
+            "evaluated": len(ranked),
+            "scenarios": ranked if top_k is None else ranked[:top_k],
+        }
+
+    def counterfactual(
+        self,
+        baseline_features: Dict[str, Any],
+        target_bucket: str | None = None,
+        features: List[str] | None = None,
+        bounds: Dict[str, Tuple[float | None, float | None]] | None = None,
+        max_scenarios: int = 3,
+        time_budget_ms: float | None = None,
+        max_evaluations: int | None = None,
+    ) -> Dict[str, Any]:
+        # Smallest changes to actionable features that move the baseline into the target
+        # bucket (by default the one below its own): fewest features changed, then least
+        # movement in training standard deviations. Other features never change.
+        bundle = self._current_bundle()
+        with timed_stage("normalize"):
+            baseline_row = ensure_feature_frame_dict(baseline_features)
+        baseline_prediction = self._predict_rows(bundle, [baseline_row], ["none"], 0)[0]
+        baseline_probability = baseline_prediction["probability"]
+        target = target_bucket or RISK_BUCKETS[max(RISK_BUCKETS.index(baseline_prediction["bucket"]) - 1, 0)]
+        if target not in BUCKET_UPPER_BOUNDS:
+            raise ValueError(f"targetBucket must be one of {', '.join(BUCKET_UPPER_BOUNDS)}")
+        threshold = BUCKET_UPPER_BOUNDS[target]
+        keys = ACTIONABLE_FEATURES if not features else list(dict.fromkeys(_resolve_feature_key(key) for key in features))
+        for key in keys:
+            if key not in ACTIONABLE_FEATURES:
+                raise ValueError(f"{key} is not an actionable feature")
+        requested_bounds = {_resolve_feature_key(key): value for key, value in (bounds or {}).items()}
+        for key in requested_bounds:
+            if key not in keys:
+                raise ValueError(f"bounds given for {key}, which is not searched")
+
+        result: Dict[str, Any] = {
+            "baselineProbability": baseline_probability,
+            "baselineBucket": baseline_prediction["bucket"],
+            "targetBucket": target,
+            "evaluations": 0,
+            "stoppedBy": "already_in_target",
+            "scenarios": [],
+        }
+        if baseline_probability < threshold:
+            return result
+
+        # The layout (numeric columns the model uses, their medians and spreads) is read from
+        # the fitted pipeline; only a parity-checked compiled preprocessor also scores.
+        compiled = bundle.get("compiledPreprocessor")
+        layout = compiled or compile_preprocessor(bundle["preprocessor"])
+        columns_by_key = {key: index for index, key in enumerate(layout.numeric_keys)}
+        keys = [key for key in keys if key in columns_by_key]
+        if not keys:
+            raise ValueError("the model uses none of the requested actionable features")
+        columns = np.asarray([columns_by_key[key] for key in keys])
+        means, scales = layout.numeric_means[columns], layout.numeric_scales[columns]
+        base_matrix = compiled.transform_rows([baseline_row]) if compiled is not None else None
+
+        def evaluate(values: np.ndarray) -> np.ndarray:
+            if base_matrix is None:
+                # Before warm-up or with COMPILED_INFERENCE=0 candidates go through the sklearn
+                # pipeline as rows.
+                rows = [{**baseline_row, **dict(zip(keys, candidate))} for candidate in values.tolist()]
+                return _predict_transformed(bundle, _transform_rows(bundle, rows))
+            # The transformed baseline with only the searched columns rewritten: the same
+            # arithmetic the compiled preprocessor applies to a row.
+            matrix = np.repeat(base_matrix, len(values), axis=0)
+            matrix[:, columns] = (values - means) / scales
+            return _predict_transformed(bundle, matrix)
+
+        space = _counterfactual_space(bundle["featureStats"], keys, baseline_row, layout, columns, requested_bounds)
+        budget_ms = settings.counterfactual_time_budget_ms
+        if time_budget_ms is not None:
+            budget_ms = min(time_budget_ms, budget_ms)
+        evaluation_cap = settings.counterfactual_max_evaluations
+        if max_evaluations is not None:
+            evaluation_cap = min(max_evaluations, evaluation_cap)
+        with timed_stage("counterfactual_search"):
+            found = find_counterfactuals(
+                evaluate, space, threshold, max_scenarios, budget_ms / 1000.0, evaluation_cap, settings.random_state
+            )
+
+        # Winners are rescored as ordinary rows, so the reported numbers match /whatif exactly.
+        rows: List[Dict[str, Any]] = []
+        changes: List[List[Dict[str, Any]]] = []
+        for values in found.values:
+            row = dict(baseline_row)
+            changed: List[Dict[str, Any]] = []
+            for key, current, value in zip(keys, space.origin, values):
+                if value == current:
+                    continue
+                row[key] = float(value)
+                changed.append(
+                    {
+                        "featureKey": key,
+                        "displayName": display_name(key),
+                        "oldValue": _safe_json(baseline_row[key]),
+                        "newValue": float(value),
+                    }
+                )
+            rows.append(row)
+            changes.append(changed)
+        predictions = self._score_rows(bundle, rows, ["none"] * len(rows)) if rows else []
+        result["evaluations"] = found.evaluations
+        result["stoppedBy"] = found.stopped_by
+        result["scenarios"] = [
+            {
+                "probability": prediction["probability"],
+                "delta": prediction["probability"] - baseline_probability,
+                "bucket": prediction["bucket"],
+                "distance": float(distance),
+                "changedFeatures": changed,
+            }
+            for changed, distance, prediction in zip(changes, found.distances, predictions)
+            if prediction["probability"] < threshold
+        ]
+        return result
+
+    def memory_bytes(self) -> int:
+        return int(self._current_bundle()["footprint"]["totalBytes"])
+
+    def model_version(self) -> str:
+        return self._current_bundle()["modelVersion"]
+
+    def current_bundle(self) -> Dict[str, Any]:
+        # The bundle being served, for tools that time its parts directly; treat it as read-only.
+        return self._current_bundle()
+
+    @property
+    def artifact_path(self) -> Path:
+        return self._artifact_path
+
     def feature_importance(self) -> Dict[str, Any]:
-        self.ensure_ready()
-        assert self._bundle is not None
-        return {"features": self._bundle["featureImportance"]}
+        bundle = self._current_bundle()
+        return {"features": bundle["featureImportance"]}
 
     def predict_course_risk(self, features: Dict[str, Any]) -> Dict[str, Any]:
         weighted_percent = _to_float(features.get("weightedPercent"), 0.0)
@@ -122,101 +615,835 @@ class ModelManager:
         probability = 1.0 / (1.0 + float(np.exp(-raw)))
         return {"probabilityFail": _clamp(probability, 0.0, 1.0)}
 
-    def _predict_from_df(self, row_df: pd.DataFrame) -> Dict[str, Any]:
-        assert self._bundle is not None
-        preprocessor = self._bundle["preprocessor"]
-        model = self._bundle["model"]
-        transformed_feature_names = self._bundle["transformedFeatureNames"]
-        background_matrix = self._bundle["backgroundMatrix"]
-
-        transformed = preprocessor.transform(row_df)
-        probabilities = model.predict_proba(transformed)
-        probability_fail = float(probabilities[0][1])
-        label = 1 if probability_fail >= 0.5 else 0
-        bucket = risk_bucket(probability_fail)
-
-        explanations = local_explanations(
-            model=model,
-            transformed_feature_names=transformed_feature_names,
-            background_matrix=background_matrix,
-            transformed_row=transformed,
-            original_row=row_df,
-            top_k=5,
+    def predict_course_risk_many(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Same scorer as predict_course_risk, evaluated over an (N x 8) matrix; missing or
+        # non-finite inputs are NaN here and receive the scalar version's defaults below.
+        try:
+            matrix = np.array(
+                [[row.get(key, np.nan) for key in COURSE_RISK_FEATURE_KEYS] for row in rows],
+                dtype=float,
+            ).reshape(len(rows), len(COURSE_RISK_FEATURE_KEYS))
+        except (TypeError, ValueError):
+            matrix = np.array(
+                [[_to_float(row.get(key), np.nan) for key in COURSE_RISK_FEATURE_KEYS] for row in rows],
+                dtype=float,
+            ).reshape(len(rows), len(COURSE_RISK_FEATURE_KEYS))
+        matrix[~np.isfinite(matrix)] = np.nan
+
+        (
+            weighted_percent,
+            remaining_weight,
+            max_achievable_percent,
+            total_absences,
+            absences_rate,
+            missing_weeks_count,
+            exam_completed_ratio,
+            quiz_trend,
+        ) = matrix.T
+        weighted_percent = np.nan_to_num(weighted_percent, nan=0.0)
+        remaining_weight = np.nan_to_num(remaining_weight, nan=0.0)
+        max_achievable_percent = np.where(np.isnan(max_achievable_percent), weighted_percent, max_achievable_percent)
+        total_absences = np.nan_to_num(total_absences, nan=0.0)
+        absences_rate = np.where(np.isnan(absences_rate), np.minimum(total_absences / 30.0, 1.0), absences_rate)
+        missing_weeks_count = np.nan_to_num(missing_weeks_count, nan=0.0)
+        exam_completed_ratio = np.nan_to_num(exam_completed_ratio, nan=0.0)
+        quiz_trend = np.nan_to_num(quiz_trend, nan=0.0)
+
+        raw = (
+            2.1 * (1.0 - _clamp_array(weighted_percent / 100.0, 0.0, 1.0))
+            + 1.6 * _clamp_array(absences_rate, 0.0, 1.0)
+            + 1.2 * _clamp_array(missing_weeks_count / 15.0, 0.0, 1.0)
+            + 1.3 * (1.0 - _clamp_array(max_achievable_percent / 100.0, 0.0, 1.0))
+            + 0.4 * (1.0 - _clamp_array(exam_completed_ratio, 0.0, 1.0))
+            + 0.3 * np.maximum(0.0, -quiz_trend)
+            - 0.2 * _clamp_array(remaining_weight / 100.0, 0.0, 1.0)
+            - 1.7
         )
+        probabilities = 1.0 / (1.0 + np.exp(-raw))
+        return {"probabilityFail": _clamp_array(probabilities, 0.0, 1.0).tolist()}
 
-        return {
-            "probability": probability_fail,
-            "label": label,
-            "bucket": bucket,
-            "explanations": explanations,
+    def start_retrain(self, reason: str = "manual") -> Dict[str, Any]:
+        self.ensure_ready()
+        return self._retrainer.start(reason)
+
+    def retrain_status(self) -> Dict[str, Any]:
+        return self._retrainer.status()
+
+    def ingest_outcomes(self, rows: List[Dict[str, Any]], labels: List[int]) -> Dict[str, Any]:
+        bundle = self._current_bundle()
+        normalized = [ensure_feature_frame_dict(features) for features in rows]
+        store_rows = self._outcomes.append(normalized, labels)
+        rebuild_offset = bundle.get("outcomeRowsAtRebuild", 0)
+        drift = self._outcome_drift(bundle)
+        result: Dict[str, Any] = {
+            "stored": len(normalized),
+            "storeRows": store_rows,
+            "rowsSinceRebuild": store_rows - rebuild_offset,
+            "drift": drift,
+            "update": None,
+            "rebuild": None,
         }
 
-    def _load_or_train(self) -> Dict[str, Any]:
-        if self._artifact_path.exists():
+        if result["rowsSinceRebuild"] >= settings.outcome_rebuild_rows or drift >= settings.outcome_drift_threshold:
             try:
-                return joblib.load(self._artifact_path)
-            except Exception:
-                pass
+                result["rebuild"] = self._retrainer.start("outcomes")
+            except RetrainInProgressError:
+                result["rebuild"] = self._retrainer.status()
+        # The update serves the new outcomes until a rebuild, which trains on all of them, lands.
+        result["update"] = self._apply_incremental_update(normalized, labels)
+        return result
 
-        trained_bundle = self._train_fresh_bundle()
-        joblib.dump(trained_bundle, self._artifact_path)
-        return trained_bundle
+    def _outcome_drift(self, bundle: Dict[str, Any]) -> float:
+        from app.training import feature_drift, numeric_column_moments
+
+        # Drift is measured on every outcome since the last full rebuild, not just this request.
+        # Column moments are kept between ingests, so each one transforms only the rows appended
+        # since the previous (by any worker); a rebuild's new preprocessor starts them over.
+        key = (bundle.get("outcomeRowsAtRebuild", 0), _standardization_key(bundle["preprocessor"]))
+        with self._drift_lock:
+            state = self._drift_state
+            if state is None or state["key"] != key:
+                state = self._drift_state = {"key": key, "cursor": 0, "rows": 0, "moments": None}
+                features, _, state["cursor"] = self._outcomes.read_from(0, skip=key[0])
+            else:
+                features, _, state["cursor"] = self._outcomes.read_from(state["cursor"])
+            if len(features):
+                moments = numeric_column_moments(bundle["preprocessor"].transform(features), bundle["transformedFeatureNames"])
+                state["moments"] = moments if state["moments"] is None else state["moments"] + moments
+                state["rows"] += len(features)
+            return 0.0 if state["moments"] is None else feature_drift(state["moments"], state["rows"])
+
+    def _apply_incremental_update(self, rows: List[Dict[str, Any]], labels: List[int]) -> Dict[str, Any]:
+        from app.training import compute_global_feature_importance, incremental_update
+
+        # Updates are serialized so each one starts from the version the previous one published.
+        with self._update_lock:
+            bundle = self._current_bundle()
+            model = incremental_update(
+                bundle["model"],
+                bundle["preprocessor"].transform(outcome_frame(rows)),
+                labels,
+                bundle.get("trainingRows", 0),
+                settings.outcome_learning_rate,
+                settings.outcome_update_epochs,
+                settings.random_state,
+            )
+            if model is None:
+                return {"accepted": False, "reason": f"{bundle['modelName']} needs a full rebuild to learn from outcomes"}
+
+            trained_at = datetime.now(timezone.utc)
+            candidate = {
+                **{key: value for key, value in _persistable(bundle).items() if key != "explainer"},
+                "model": model,
+                "featureImportance": compute_global_feature_importance(model, bundle["transformedFeatureNames"]),
+                "trainingRows": bundle.get("trainingRows", 0) + len(labels),
+                "trainedAt": trained_at.isoformat(),
+                "modelVersion": _version_stamp(trained_at),
+                "parentVersion": bundle["modelVersion"],
+            }
+            target = self._versions_dir / f"model-{candidate['modelVersion']}.joblib"
+            write_bundle(candidate, target)
+            return self._accept_candidate(str(target))
 
-    def _train_fresh_bundle(self) -> Dict[str, Any]:
+    def _accept_candidate(self, artifact_path: str, validate: bool = True) -> Dict[str, Any]:
+        # Candidates are warmed before the swap; only the first bundle of a process warms later.
+        candidate = _warm_bundle(_prepare_bundle(load_artifact(artifact_path, settings.artifact_mmap)))
+        current = self._current_bundle()
+
+        # Validation gate: the candidate must score on the holdout and must not lose more
+        # than the allowed F1 margin against the model it replaces.
+        # A rebuild of a stale artifact skips it: the model it would be compared against was
+        # trained from inputs that no longer apply.
+        holdout_rows, holdout_labels = _load_holdout() if validate else ([], [])
+        outcome: Dict[str, Any] = {"candidateVersion": candidate["modelVersion"], "artifactPath": artifact_path}
+        if holdout_rows:
+            candidate_f1 = self._holdout_f1(candidate, holdout_rows, holdout_labels)
+            current_f1 = self._holdout_f1(current, holdout_rows, holdout_labels)
+            outcome.update({"candidateF1": candidate_f1, "currentF1": current_f1})
+            if candidate_f1 < settings.retrain_min_f1:
+                return {**outcome, "accepted": False, "reason": "candidate F1 is below RETRAIN_MIN_F1"}
+            if candidate_f1 + settings.retrain_max_f1_drop < current_f1:
+                return {**outcome, "accepted": False, "reason": "candidate F1 dropped more than RETRAIN_MAX_F1_DROP"}
+
+        with artifact_lock(self._artifact_path):
+            write_bundle(candidate, self._artifact_path)
+            self._store_keyed(candidate)
+            identity = self._stat_artifact()
+        prune_least_recent(self._versions_dir, "model-*.joblib", settings.artifact_versions_kept)
+        with self._lock:
+            self._artifact_identity = identity
+            self._swap_bundle(candidate)
+        return {**outcome, "accepted": True}
+
+    def _release_rebuild_claim(self) -> None:
+        # Released after every rebuild attempt, so a failed or rejected one does not keep
+        # the key claimed; the next worker to start on the stale artifact tries again.
+        claimed, self._rebuild_claim = self._rebuild_claim, None
+        if claimed is not None:
+            claimed.close()
+
+    def _holdout_f1(self, bundle: Dict[str, Any], rows: List[Dict[str, Any]], labels: List[int]) -> float:
+        from sklearn.metrics import f1_score
+
+        predictions = self._score_rows(bundle, rows, ["none"] * len(rows))
+        return float(f1_score(labels, [prediction["label"] for prediction in predictions], zero_division=0))
+
+    def _swap_bundle(self, bundle: Dict[str, Any]) -> None:
+        self._bundle = bundle
+        self._prediction_cache.clear()
+
+    def _current_bundle(self) -> Dict[str, Any]:
+        # Requests capture the bundle once so a concurrent swap never mixes two models.
+        self.ensure_ready()
+        bundle = self._bundle
+        assert bundle is not None
+        if not self._read_only and not _key_matches(bundle, self._expected_key):
+            bundle = self._reload_if_replaced(bundle)
+        bind_model(bundle["modelName"])
+        return bundle
+
+    def _reload_if_replaced(self, bundle: Dict[str, Any]) -> Dict[str, Any]:
+        # Only the worker that claimed the rebuild of a stale artifact trains; the others
+        # keep serving the stale bundle until model.joblib changes on disk, then load it.
+        identity = self._stat_artifact()
+        if identity is None or identity == self._artifact_identity:
+            return bundle
+        with self._lock:
+            if self._bundle is not bundle or identity == self._artifact_identity:
+                return self._bundle or bundle
+            self._artifact_identity = identity
+            replacement = self._load_artifact()
+            if replacement is None:
+                return bundle
+            self._swap_bundle(replacement)
+        threading.Thread(target=_warm_bundle, args=(replacement,), name="model-warmup", daemon=True).start()
+        return replacement
+
+    def _stat_artifact(self) -> Tuple[int, int] | None:
         try:
-            dataset_path = resolve_train_dataset_path(settings.data_root, settings.train_dataset)
-            features_df, labels = load_training_data(dataset_path)
-            if labels.nunique() < 2:
-                raise ValueError("Dataset label contains only one class")
-            artifacts: ModelArtifacts = train_best_model(features_df, labels, settings.random_state)
+            return file_identity(self._artifact_path)
+        except OSError:
+            return None
+
+    def _resolve_mode(self, bundle: Dict[str, Any], options: ExplanationOptions, rows: int) -> str:
+        if options.mode != "auto":
+            return options.mode
+        if options.deadline is None:
+            return "shap"
+        # Without an observation yet SHAP runs once, which seeds the estimate for later calls.
+        estimate = bundle["explanationCost"].estimate(rows)
+        if estimate is None or estimate <= options.deadline - time.perf_counter():
+            return "shap"
+        return "fast"
+
+    def _predict_rows(
+        self,
+        bundle: Dict[str, Any],
+        row_dicts: List[Dict[str, Any]],
+        modes: List[str],
+        top_k: int,
+    ) -> List[Dict[str, Any]]:
+        # Repeated rows (dashboard reloads, what-if baselines) are served from the cache;
+        # only the misses go through the vectorized scoring pass. Entries are kept per
+        # explanation mode with every feature's contribution, and cut to top_k on the way out.
+        # Probability-only rows also take an entry stored with explanations, so the baseline
+        # of a what-if after /predict is a hit: the probability does not depend on the mode.
+        with timed_stage("cache_lookup"):
+            cache_keys = [
+                feature_cache_key(bundle["modelVersion"], row, mode) for row, mode in zip(row_dicts, modes)
+            ]
+            predictions: List[Dict[str, Any] | None] = []
+            for row, mode, key in zip(row_dicts, modes, cache_keys):
+                if mode != "none":
+                    predictions.append(self._prediction_cache.get(key))
+                    continue
+                explained_keys = [feature_cache_key(bundle["modelVersion"], row, other) for other in ("shap", "fast")]
+                cached = self._prediction_cache.get_first([key, *explained_keys])
+                predictions.append(None if cached is None else {**cached, "explanations": [], "explanationMode": "none"})
+        missing_indexes = [index for index, prediction in enumerate(predictions) if prediction is None]
+        if missing_indexes:
+            computed = self._score_rows(
+                bundle, [row_dicts[index] for index in missing_indexes], [modes[index] for index in missing_indexes]
+            )
+            for index, prediction in zip(missing_indexes, computed):
+                self._prediction_cache.put(cache_keys[index], prediction)
+                predictions[index] = prediction
+        return [
+            {**prediction, "explanations": prediction["explanations"][:top_k]}
+            for prediction in predictions
+            if prediction is not None
+        ]
+
+    def _score_rows(
+        self,
+        bundle: Dict[str, Any],
+        row_dicts: List[Dict[str, Any]],
+        modes: List[str],
+    ) -> List[Dict[str, Any]]:
+        model = bundle["model"]
+
+        # One transform and one predict_proba for the whole batch, then one explanation pass per mode.
+        transformed = _transform_rows(bundle, row_dicts)
+        probabilities = _predict_transformed(bundle, transformed)
+
+        explanations: List[List[Dict[str, Any]]] = [[] for _ in row_dicts]
+        modes_used = ["none"] * len(row_dicts)
+        for mode in ("fast", "shap"):
+            indexes = [index for index, row_mode in enumerate(modes) if row_mode == mode]
+            if not indexes:
+                continue
+            started_at = time.perf_counter()
+            with timed_stage("explain"):
+                mode_explanations, mode_used = explain_batch(
+                    model=model,
+                    transformed_feature_names=bundle["transformedFeatureNames"],
+                    background_matrix=bundle["backgroundMatrix"],
+                    transformed_rows=transformed if len(indexes) == len(row_dicts) else transformed[indexes],
+                    original_rows=[row_dicts[index] for index in indexes],
+                    method=mode,
+                    top_k=None,
+                    explainer=_bundle_explainer(bundle) if mode == "shap" else None,
+                    proxy_weights=bundle.get("proxyWeights"),
+                    flat_forest=bundle.get("flatForest"),
+                )
+            if mode_used == "shap":
+                bundle["explanationCost"].observe(time.perf_counter() - started_at, len(indexes))
+            for index, row_explanations in zip(indexes, mode_explanations):
+                explanations[index] = row_explanations
+                modes_used[index] = mode_used
+
+        predictions: List[Dict[str, Any]] = []
+        for probability, row_explanations, mode_used in zip(probabilities, explanations, modes_used):
+            probability_fail = float(probability)
+            predictions.append(
+                {
+                    "probability": probability_fail,
+                    "label": 1 if probability_fail >= 0.5 else 0,
+                    "bucket": risk_bucket(probability_fail),
+                    "explanations": row_explanations,
+                    "explanationMode": mode_used,
+                }
+            )
+        return predictions
+
+    def _load_or_train(self) -> Dict[str, Any]:
+        # model.joblib is served when its key matches the current inputs, then a keyed copy
+        # trained from the same inputs earlier. A model trained from other inputs is served
+        # while its replacement trains in the background; only a cold start trains inline.
+        if self._read_only:
+            self._load_source = "readOnly"
+            bundle = self._load_artifact()
+            if bundle is None:
+                raise ModelNotFoundError(f"No loadable bundle at {self._artifact_path}")
+            return bundle
+        key = self._expected_key = artifact_key()
+        self._load_source = "artifact"
+        bundle = self._load_artifact()
+        if bundle is not None and _key_matches(bundle, key):
+            return bundle
+
+        # Workers that start together queue on the lock: the first one trains and writes the
+        # artifact, the others find it on the re-check and load it instead of training again.
+        with artifact_lock(self._artifact_path):
+            bundle = self._load_artifact()
+            if bundle is not None and _key_matches(bundle, key):
+                return bundle
+            keyed_path = self._keyed_dir / f"model-{key}.joblib"
+            if keyed_path.exists():
+                self._load_source = "keyed"
+                atomic_copy(keyed_path, self._artifact_path)
+                touch(keyed_path)
+            elif bundle is not None:
+                self._load_source = "stale"
+                self._rebuild_stale()
+                return bundle
+            else:
+                self._load_source = "trained"
+                fresh = _train_fresh_bundle(self._outcomes)
+                write_bundle(fresh, self._artifact_path)
+                self._store_keyed(fresh)
+        # Reloading from disk gives this process the same mapped arrays as the other workers.
+        return _prepare_bundle(load_artifact(self._artifact_path, settings.artifact_mmap))
+
+    def _rebuild_stale(self) -> None:
+        # One worker per key claims the rebuild; the others keep serving the stale model.
+        self._rebuild_claim = claim(self._keyed_dir / f"model-{self._expected_key}.joblib")
+        if self._rebuild_claim is not None:
+            self._retrainer.start("stale artifact", validate=False)
+
+    def _store_keyed(self, bundle: Dict[str, Any]) -> None:
+        # Keeps the last ARTIFACT_CACHE_ENTRIES keys, so switching back to earlier inputs
+        # loads their model instead of retraining it. Called with the artifact lock held.
+        if not bundle.get("artifactKey"):
+            return
+        atomic_copy(self._artifact_path, self._keyed_dir / f"model-{bundle['artifactKey']}.joblib")
+        prune_least_recent(self._keyed_dir, "model-*.joblib", settings.artifact_cache_entries)
+
+    def _load_artifact(self) -> Dict[str, Any] | None:
+        if not self._artifact_path.exists():
+            return None
+        try:
+            return _prepare_bundle(load_artifact(self._artifact_path, settings.artifact_mmap))
         except Exception:
-            features_df, labels, dataset_path = self._fallback_dataset()
-            artifacts = train_best_model(features_df, labels, settings.random_state)
-        return {
-            "model": artifacts.model,
-            "modelName": artifacts.model_name,
-            "preprocessor": artifacts.preprocessor,
-            "metrics": artifacts.metrics,
-            "featureImportance": artifacts.feature_importance,
-            "transformedFeatureNames": artifacts.transformed_feature_names,
-            "backgroundMatrix": artifacts.background_matrix,
-            "trainedAt": datetime.now(timezone.utc).isoformat(),
-            "datasetPath": str(dataset_path),
+            return None
+
+
+def explanation_options(
+    explanation_mode: str | None = None,
+    top_k: int | None = None,
+    latency_budget_ms: float | None = None,
+) -> ExplanationOptions:
+    mode = explanation_mode or settings.explanation_mode
+    if mode not in EXPLANATION_MODES:
+        raise ValueError(f"explanationMode must be one of {', '.join(EXPLANATION_MODES)}")
+    deadline = time.perf_counter() + latency_budget_ms / 1000.0 if latency_budget_ms else None
+    return ExplanationOptions(
+        mode=mode,
+        top_k=settings.explanation_top_k if top_k is None else max(top_k, 0),
+        deadline=deadline,
+    )
+
+
+def _train_fresh_bundle(outcome_store: OutcomeStore | None = None) -> Dict[str, Any]:
+    # Stored outcomes are trained on alongside the CSV; the bundle remembers how many it
+    # absorbed so later ingests only count rows that arrived after this rebuild.
+    outcome_features, outcome_labels = outcome_store.load() if outcome_store is not None else (None, None)
+    try:
+        dataset_path = resolve_train_dataset_path(settings.data_root, settings.train_dataset)
+        features_df, labels = load_training_data(dataset_path, settings.data_cache_dir or None, settings.ingest_chunk_rows)
+        features_df, labels = _with_outcomes(features_df, labels, outcome_features, outcome_labels)
+        if labels.nunique() < 2:
+            raise ValueError("Dataset label contains only one class")
+        artifacts: ModelArtifacts = train_with_settings(features_df, labels)
+    except Exception:
+        features_df, labels, dataset_path = _fallback_dataset()
+        features_df, labels = _with_outcomes(features_df, labels, outcome_features, outcome_labels)
+        artifacts = train_with_settings(features_df, labels)
+    bundle = bundle_from_artifacts(artifacts, dataset_path)
+    bundle["artifactKey"] = artifact_key()
+    bundle["outcomeRowsAtRebuild"] = 0 if outcome_labels is None else int(len(outcome_labels))
+    return bundle
+
+
+def artifact_key() -> str:
+    # Content address of a trained bundle: the dataset bytes, the training settings, the
+    # feature map and the loader and training code versions. Stored outcomes are left out;
+    # outcomeRowsAtRebuild tracks those.
+    try:
+        dataset = file_digest(resolve_train_dataset_path(settings.data_root, settings.train_dataset))
+    except (FileNotFoundError, OSError):
+        dataset = "synthetic-fallback"
+    digest = hashlib.sha256(dataset.encode())
+    digest.update(training_config_digest().encode())
+    return digest.hexdigest()[:24]
+
+
+def training_config_digest() -> str:
+    from app.training import TRAINING_CODE_VERSION
+
+    digest = hashlib.sha256()
+    for name in TRAINING_SETTING_FIELDS:
+        digest.update(f"{name}={getattr(settings, name)!r};".encode())
+    digest.update(repr(FEATURE_DEFINITIONS).encode())
+    digest.update(f"loader={LOADER_VERSION};training={TRAINING_CODE_VERSION}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _standardization_key(preprocessor: Any) -> bytes:
+    # Incremental updates keep the fitted preprocessor, so drift moments carry over; a rebuild
+    # refits the scaler and the moments start over.
+    scaler = preprocessor.named_transformers_["num"].named_steps["scaler"]
+    return np.asarray(scaler.mean_).tobytes() + np.asarray(scaler.scale_).tobytes()
+
+
+def _key_matches(bundle: Dict[str, Any], key: str | None) -> bool:
+    # Leaderboard promotions are pinned to the key they were promoted under: the operator chose
+    # that model over TRAIN_DATASET, but not over later changes to the data, settings or code.
+    return key is not None and key in (bundle.get("artifactKey"), bundle.get("pinned"))
+
+
+def _with_outcomes(
+    features_df: pd.DataFrame,
+    labels: pd.Series,
+    outcome_features: pd.DataFrame | None,
+    outcome_labels: pd.Series | None,
+) -> Tuple[pd.DataFrame, pd.Series]:
+    if outcome_labels is None or outcome_labels.empty:
+        return features_df, labels
+    return (
+        pd.concat([features_df, outcome_features], ignore_index=True),
+        pd.concat([labels, outcome_labels], ignore_index=True),
+    )
+
+
+def train_with_settings(features_df: pd.DataFrame, labels: pd.Series, n_workers: int | None = None) -> ModelArtifacts:
+    from app.training import train_best_model
+
+    return train_best_model(
+        features_df,
+        labels,
+        settings.random_state,
+        settings.cv_folds,
+        settings.train_workers if n_workers is None else n_workers,
+        background_size=settings.background_size,
+        background_method=settings.background_method,
+        fidelity_tolerance=settings.background_fidelity_tolerance,
+    )
+
+
+def bundle_from_artifacts(
+    artifacts: ModelArtifacts,
+    dataset_path: Path | str,
+    model_name: str | None = None,
+) -> Dict[str, Any]:
+    from app.training import compute_global_feature_importance
+
+    # model_name picks a non-winning candidate, e.g. when the leaderboard promotes it.
+    model_name = model_name or artifacts.model_name
+    model = artifacts.candidate_models.get(model_name, artifacts.model)
+    feature_importance = (
+        artifacts.feature_importance
+        if model is artifacts.model
+        else compute_global_feature_importance(model, artifacts.transformed_feature_names)
+    )
+    trained_at = datetime.now(timezone.utc)
+    return {
+        "model": model,
+        "modelName": model_name,
+        "preprocessor": artifacts.preprocessor,
+        "metrics": artifacts.metrics,
+        "featureImportance": feature_importance,
+        "transformedFeatureNames": artifacts.transformed_feature_names,
+        "backgroundMatrix": artifacts.background_matrix,
+        "backgroundWeights": artifacts.background_weights,
+        "trainingRows": getattr(artifacts, "training_rows", 0),
+        "featureStats": getattr(artifacts, "feature_stats", {}),
+        "trainedAt": trained_at.isoformat(),
+        "modelVersion": _version_stamp(trained_at),
+        "datasetPath": str(dataset_path),
+    }
+
+
+def _version_stamp(moment: datetime) -> str:
+    return moment.strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def write_bundle(bundle: Dict[str, Any], target: Path) -> None:
+    payload = _persistable(bundle)
+    # The flat forest is stored with the bundle so workers can memory-map its arrays
+    # instead of each flattening a private copy; it is still parity-checked on load.
+    if "flatForest" not in payload:
+        payload["flatForest"] = _flatten_or_none(payload["model"])
+    atomic_dump(payload, target)
+
+
+def _fallback_dataset() -> Tuple[pd.DataFrame, pd.Series, Path]:
+    rng = np.random.default_rng(settings.random_state)
+    n = 200
+    fallback = pd.DataFrame(
+        {
+            "gender": rng.choice(["male", "female"], size=n),
+            "age": rng.normal(24, 4, size=n),
+            "logins": rng.integers(1, 120, size=n),
+            "totalHoursInModuleArea": rng.normal(35, 15, size=n),
+            "percentOfAverageHours": rng.normal(100, 25, size=n),
+            "presence": rng.normal(60, 15, size=n),
+            "absence": rng.normal(40, 12, size=n),
+            "percentAttended": rng.normal(72, 15, size=n),
+            "attendingFromHome": rng.choice(["yes", "no"], size=n),
+            "distanceToUniversityKm": rng.normal(12, 8, size=n),
+            "polar4Quintile": rng.integers(1, 6, size=n),
+            "polar3Quintile": rng.integers(1, 6, size=n),
+            "adultHe2001Quintile": rng.integers(1, 6, size=n),
+            "adultHe2011Quintile": rng.integers(1, 6, size=n),
+            "tundraMsoaQuintile": rng.integers(1, 6, size=n),
+            "tundraLsoaQuintile": rng.integers(1, 6, size=n),
+            "gapsGcseQuintile": rng.integers(1, 6, size=n),
+            "gapsGcseEthnicityQuintile": rng.integers(1, 6, size=n),
+            "uniConnectTargetWard": rng.choice(["yes", "no"], size=n),
         }
+    )
+    risk_signal = (
+        (fallback["absence"] > 50).astype(int)
+        + (fallback["logins"] < 15).astype(int)
+        + (fallback["percentAttended"] < 60).astype(int)
+    )
+    labels = pd.Series((risk_signal >= 2).astype(int))
+    return fallback[FEATURE_KEYS], labels, Path("synthetic-fallback")
+
+
+def _retrain_job(versions_dir: str) -> str:
+    # Executed in the retrain worker process; only the artifact path crosses back.
+    bundle = _train_fresh_bundle(OutcomeStore(Path(versions_dir).parent / OUTCOME_STORE_NAME))
+    target = Path(versions_dir) / f"model-{bundle['modelVersion']}.joblib"
+    write_bundle(bundle, target)
+    return str(target)
+
+
+def _prepare_bundle(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    # Runtime helpers travel with their bundle, so swapping the bundle swaps them all at once.
+    # This is the cheap part, enough to serve through the sklearn paths; _warm_bundle adds
+    # the rest.
+    bundle.setdefault("modelVersion", bundle["trainedAt"])
+    # Bundles written before the background was summarized still carry float64 rows.
+    bundle["backgroundMatrix"] = np.asanyarray(bundle["backgroundMatrix"], dtype=np.float32)
+    if bundle.get("explainer") is None:
+        bundle.pop("explainer", None)
+    bundle["proxyWeights"] = build_proxy_weights(bundle["model"])
+    # Bundles trained before feature statistics were stored get what the fitted preprocessor
+    # knows (medians, spreads, categories) but no percentiles.
+    if not bundle.get("featureStats"):
+        bundle["featureStats"] = _preprocessor_feature_stats(bundle["preprocessor"])
+    bundle["explanationCost"] = ExplanationCostEstimator()
+    bundle["compiledPreprocessor"] = None
+    # A stored flat forest is only served once warm-up has parity-checked it.
+    bundle["pendingFlatForest"] = bundle.get("flatForest")
+    bundle["flatForest"] = None
+    bundle["footprint"] = bundle_footprint(bundle)
+    return bundle
+
+
+def _warm_bundle(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    if bundle.get("warmed"):
+        return bundle
+    _bundle_explainer(bundle)
+    bundle["compiledPreprocessor"] = _compile_with_parity_check(bundle["preprocessor"])
+    bundle["flatForest"] = _flatten_with_parity_check(bundle["model"], bundle["preprocessor"], bundle.pop("pendingFlatForest", None))
+    bundle["footprint"] = bundle_footprint(bundle)
+    bundle["warmed"] = True
+    return bundle
+
+
+_EXPLAINER_LOCK = threading.Lock()
 
-    def _fallback_dataset(self) -> Tuple[pd.DataFrame, pd.Series, Path]:
-        rng = np.random.default_rng(settings.random_state)
-        n = 200
-        fallback = pd.DataFrame(
-            {
-                "gender": rng.choice(["male", "female"], size=n),
-                "age": rng.normal(24, 4, size=n),
-                "logins": rng.integers(1, 120, size=n),
-                "totalHoursInModuleArea": rng.normal(35, 15, size=n),
-                "percentOfAverageHours": rng.normal(100, 25, size=n),
-                "presence": rng.normal(60, 15, size=n),
-                "absence": rng.normal(40, 12, size=n),
-                "percentAttended": rng.normal(72, 15, size=n),
-                "attendingFromHome": rng.choice(["yes", "no"], size=n),
-                "distanceToUniversityKm": rng.normal(12, 8, size=n),
-                "polar4Quintile": rng.integers(1, 6, size=n),
-                "polar3Quintile": rng.integers(1, 6, size=n),
-                "adultHe2001Quintile": rng.integers(1, 6, size=n),
-                "adultHe2011Quintile": rng.integers(1, 6, size=n),
-                "tundraMsoaQuintile": rng.integers(1, 6, size=n),
-                "tundraLsoaQuintile": rng.integers(1, 6, size=n),
-                "gapsGcseQuintile": rng.integers(1, 6, size=n),
-                "gapsGcseEthnicityQuintile": rng.integers(1, 6, size=n),
-                "uniConnectTargetWard": rng.choice(["yes", "no"], size=n),
-            }
-        )
-        risk_signal = (
-            (fallback["absence"] > 50).astype(int)
-            + (fallback["logins"] < 15).astype(int)
-            + (fallback["percentAttended"] < 60).astype(int)
-        )
-        labels = pd.Series((risk_signal >= 2).astype(int))
-        return fallback[FEATURE_KEYS], labels, Path("synthetic-fallback")
+
+def _bundle_explainer(bundle: Dict[str, Any]) -> Any | None:
+    # Built once per bundle by whichever comes first, warm-up or the first SHAP request.
+    if "explainer" not in bundle:
+        with _EXPLAINER_LOCK:
+            if "explainer" not in bundle:
+                bundle["explainer"] = build_explainer(
+                    bundle["model"], bundle["backgroundMatrix"], bundle.get("backgroundWeights")
+                )
+    return bundle["explainer"]
+
+
+def bundle_footprint(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    # Array-backed parts report their buffers; everything else its pickled size, which
+    # tracks the in-memory size of sklearn estimators closely. Unpicklable helpers are skipped.
+    components: Dict[str, int] = {}
+    mapped: List[str] = []
+    for key, value in bundle.items():
+        if key == "footprint" or value is None or isinstance(value, (str, int, float)):
+            continue
+        if isinstance(value, np.ndarray) or hasattr(value, "nbytes"):
+            components[key] = int(value.nbytes)
+            # Memory-mapped parts live in the shared page cache rather than in this process.
+            if isinstance(value, np.memmap) or isinstance(getattr(value, "children", None), np.memmap):
+                mapped.append(key)
+            continue
+        try:
+            components[key] = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            continue
+    return {
+        "totalBytes": sum(components.values()),
+        "mappedBytes": sum(components[key] for key in mapped),
+        "components": components,
+    }
+
+
+def _compile_with_parity_check(preprocessor: Any) -> Any | None:
+    if not settings.compiled_inference:
+        return None
+    try:
+        compiled = compile_preprocessor(preprocessor)
+    except Exception:
+        return None
+
+    # The compiled path is only served if it reproduces the sklearn pipeline on the holdout set.
+    parity_rows = [ensure_feature_frame_dict({})] + _load_holdout()[0]
+    if max_parity_error(compiled, preprocessor, parity_rows) > 0.0:
+        return None
+    return compiled
+
+
+def _flatten_with_parity_check(model: Any, preprocessor: Any, stored: Any = None) -> FlatForest | None:
+    flat_forest = stored if isinstance(stored, FlatForest) else _flatten_or_none(model)
+    if flat_forest is None:
+        return None
+
+    # Like the compiled preprocessor, the flat forest is only served if its probabilities
+    # match the fitted forest bit for bit on the holdout set.
+    parity_rows = [ensure_feature_frame_dict({})] + _load_holdout()[0]
+    transformed = preprocessor.transform(pd.DataFrame(parity_rows, columns=FEATURE_KEYS))
+    if not np.array_equal(flat_forest.predict_proba(transformed), reference_predict_proba(model, transformed)):
+        return None
+    return flat_forest
+
+
+def _flatten_or_none(model: Any) -> FlatForest | None:
+    from sklearn.ensemble import RandomForestClassifier
+
+    if not settings.flat_forest_inference or not isinstance(model, RandomForestClassifier):
+        return None
+    try:
+        return flatten_forest(model)
+    except Exception:
+        return None
+
+
+def _load_holdout() -> Tuple[List[Dict[str, Any]], List[int]]:
+    test_path = resolve_test_dataset_path(settings.data_root)
+    if test_path is None:
+        return [], []
+    try:
+        test_df, labels = load_training_data(test_path, settings.data_cache_dir or None, settings.ingest_chunk_rows)
+    except Exception:
+        return [], []
+    records = test_df.astype(object).where(test_df.notna(), None).to_dict("records")
+    return [ensure_feature_frame_dict(record) for record in records], [int(label) for label in labels]
+
+
+def _transform_rows(bundle: Dict[str, Any], row_dicts: List[Dict[str, Any]]) -> Any:
+    compiled = bundle.get("compiledPreprocessor")
+    if compiled is not None:
+        with timed_stage("transform"):
+            return compiled.transform_rows(row_dicts)
+    with timed_stage("frame_build"):
+        frame = pd.DataFrame(row_dicts, columns=FEATURE_KEYS)
+    with timed_stage("transform"):
+        return bundle["preprocessor"].transform(frame)
+
+
+def _predict_transformed(bundle: Dict[str, Any], transformed: Any) -> np.ndarray:
+    # Small batches skip sklearn's per-tree overhead; above the cutoff its compiled
+    # per-tree loop is faster than stepping the whole batch through NumPy.
+    flat_forest = bundle.get("flatForest")
+    if flat_forest is not None and transformed.shape[0] > settings.flat_forest_max_rows:
+        flat_forest = None
+    with timed_stage("predict_proba"):
+        return (flat_forest or bundle["model"]).predict_proba(transformed)[:, 1]
+
+
+def _resolve_feature_key(raw_key: Any) -> str:
+    key = RAW_OR_INTERNAL_TO_KEY.get(normalize_feature_key(str(raw_key)))
+    if key is None:
+        raise ValueError(f"Unknown feature: {raw_key}")
+    return key
+
+
+def _sensitivity_scenarios(
+    baseline_row: Dict[str, Any],
+    keys: List[str],
+    stats: Dict[str, Dict[str, Any]],
+    perturbation: str,
+    step: float,
+    percentiles: List[float],
+) -> List[Tuple[str, Any, str]]:
+    # (feature, new value, change label) per scenario. A missing baseline value is treated
+    # as the imputed one (training median or most frequent category), so moving "to" it is
+    # not a change. Numeric targets stay inside the training range and are rounded for
+    # features that only took whole values.
+    scenarios: List[Tuple[str, Any, str]] = []
+    for key in keys:
+        feature_stats = stats.get(key)
+        if not feature_stats:
+            continue
+        baseline = baseline_row[key]
+        missing = baseline is None or (isinstance(baseline, float) and np.isnan(baseline))
+
+        if FEATURE_TYPES_BY_KEY[key] == "categorical":
+            categories = feature_stats["categories"]
+            current = categories[0] if missing else str(baseline)
+            scenarios.extend((key, category, "category") for category in categories if category != current)
+            continue
+
+        current = feature_stats["median"] if missing else float(baseline)
+        if perturbation == "step":
+            spread = feature_stats.get("std") or 0.0
+            if spread <= 0:
+                continue
+            targets = [(current - step * spread, ""), (current + step * spread, "")]
+        else:
+            if "percentiles" not in feature_stats:
+                continue
+            # Stored percentiles are evenly spaced from the 0th to the 100th.
+            stored = feature_stats["percentiles"]
+            grid = np.linspace(0.0, 100.0, len(stored))
+            targets = [(float(np.interp(percentile, grid, stored)), f"p{percentile:g}") for percentile in percentiles]
+
+        seen = {current}
+        for value, change in targets:
+            if "min" in feature_stats:
+                value = _clamp(value, feature_stats["min"], feature_stats["max"])
+            if feature_stats.get("integral"):
+                value = float(round(value))
+            if value in seen:
+                continue
+            seen.add(value)
+            if perturbation == "step":
+                # Clamping and rounding change the step; the label reports the one applied.
+                change = f"{round((value - current) / spread, 2):+g}sd"
+            scenarios.append((key, value, change))
+    return scenarios
+
+
+def _counterfactual_space(
+    stats: Dict[str, Dict[str, Any]],
+    keys: List[str],
+    baseline_row: Dict[str, Any],
+    layout: Any,
+    columns: np.ndarray,
+    requested_bounds: Dict[str, Tuple[float | None, float | None]],
+) -> SearchSpace:
+    # Bounds default to the training range (median +/- 3 standard deviations for bundles
+    # without feature statistics); a missing baseline value starts from the imputed median.
+    origin, lower, upper, spreads, integral = [], [], [], [], []
+    for key, column in zip(keys, columns):
+        feature_stats = stats.get(key, {})
+        value = baseline_row[key]
+        current = float(layout.numeric_medians[column]) if pd.isna(value) else float(value)
+        spread = feature_stats.get("std") or float(layout.numeric_scales[column])
+        low, high = requested_bounds.get(key, (None, None))
+        low = feature_stats.get("min", current - 3 * spread) if low is None else low
+        high = feature_stats.get("max", current + 3 * spread) if high is None else high
+        if low > high:
+            raise ValueError(f"bounds for {key}: min must not exceed max")
+        origin.append(current)
+        lower.append(low)
+        upper.append(high)
+        spreads.append(spread if spread > 0 else 1.0)
+        integral.append(bool(feature_stats.get("integral")))
+    return SearchSpace(
+        origin=np.asarray(origin, dtype=float),
+        lower=np.asarray(lower, dtype=float),
+        upper=np.asarray(upper, dtype=float),
+        scales=np.asarray(spreads, dtype=float),
+        integral=np.asarray(integral, dtype=bool),
+    )
+
+
+def _preprocessor_feature_stats(preprocessor: Any) -> Dict[str, Dict[str, Any]]:
+    try:
+        compiled = compile_preprocessor(preprocessor)
+    except Exception:
+        return {}
+    stats: Dict[str, Dict[str, Any]] = {
+        key: {"median": float(median), "std": float(scale)}
+        for key, median, scale in zip(compiled.numeric_keys, compiled.numeric_medians, compiled.numeric_scales)
+    }
+    for key, mode, columns in zip(compiled.categorical_keys, compiled.categorical_modes, compiled.category_columns):
+        # The imputed category first, like the most frequent one in training statistics.
+        stats[key] = {"categories": [mode] + [category for category in columns if category != mode]}
+    return stats
+
+
+def _persistable(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    runtime_keys = {"compiledPreprocessor", "explanationCost", "footprint", "pendingFlatForest", "proxyWeights", "warmed"}
+    if not settings.persist_explainer:
+        runtime_keys.add("explainer")
+    return {key: value for key, value in bundle.items() if key not in runtime_keys}
 
 
 def _safe_json(value: Any) -> Any:
@@ -239,3 +1466,7 @@ def _to_float(value: Any, default: float) -> float:
 
 def _clamp(value: float, min_value: float, max_value: float) -> float:
     return min(max(value, min_value), max_value)
+
+
+def _clamp_array(values: np.ndarray, min_value: float, max_value: float) -> np.ndarray:
+    return np.minimum(np.maximum(values, min_value), max_value)
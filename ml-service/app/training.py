@@ -1,22 +1,29 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import copy
+import os
+import time
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import f1_score
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.utils.class_weight import compute_sample_weight
 
+from app.explainability import background_fidelity
 from app.feature_map import CATEGORICAL_FEATURES, FEATURE_KEYS, NUMERIC_FEATURES
-from app.utils import display_name
+from app.utils import display_name, map_transformed_to_base_feature
 
 
 @dataclass
@@ -24,13 +31,37 @@ class ModelArtifacts:
     model: Any
     model_name: str
     preprocessor: ColumnTransformer
-    metrics: Dict[str, Dict[str, float]]
+    metrics: Dict[str, Dict[str, Any]]
     feature_importance: List[Dict[str, Any]]
     transformed_feature_names: List[str]
     background_matrix: np.ndarray
+    candidate_models: Dict[str, Any] = field(default_factory=dict)
+    background_weights: np.ndarray | None = None
+    training_rows: int = 0
+    feature_stats: Dict[str, Dict[str, Any]] = field(default_factory=dict)
 
 
-def train_best_model(dataframe: pd.DataFrame, labels: pd.Series, random_state: int) -> ModelArtifacts:
+# Part of every artifact key: bump it when a change here alters the models training produces,
+# so artifacts trained by the old code are treated as stale.
+TRAINING_CODE_VERSION = "1"
+CANDIDATE_NAMES: List[str] = ["logistic_regression", "random_forest"]
+BACKGROUND_METHODS = ("kmeans", "stratified")
+FIDELITY_ROWS = 200
+DRIFT_NOISE_Z = 3.0
+# Numeric features keep their 0th, 5th, ..., 100th percentiles; others are interpolated.
+STAT_PERCENTILES = np.linspace(0.0, 100.0, 21)
+
+
+def train_best_model(
+    dataframe: pd.DataFrame,
+    labels: pd.Series,
+    random_state: int,
+    cv_folds: int = 5,
+    n_workers: int = 0,
+    background_size: int = 100,
+    background_method: str = "kmeans",
+    fidelity_tolerance: float = 0.05,
+) -> ModelArtifacts:
     x_train, x_val, y_train, y_val = train_test_split(
         dataframe,
         labels,
@@ -44,40 +75,76 @@ def train_best_model(dataframe: pd.DataFrame, labels: pd.Series, random_state: i
     x_val_transformed = preprocessor.transform(x_val)
     transformed_feature_names = list(preprocessor.get_feature_names_out())
 
-    candidates = {
-        "logistic_regression": LogisticRegression(
-            max_iter=1500,
-            class_weight="balanced",
-            random_state=random_state,
-        ),
-        "random_forest": RandomForestClassifier(
-            n_estimators=350,
-            class_weight="balanced_subsample",
-            random_state=random_state,
-            n_jobs=-1,
-        ),
-    }
+    # Every (candidate, fold) fit plus the final fit per candidate is an independent task.
+    # The worker budget is shared: parallel tasks x forest n_jobs never exceeds it.
+    folds = _stratified_folds(y_train, cv_folds, random_state)
+    workers = resolve_worker_budget(n_workers)
+    n_parallel = max(1, min(workers, len(CANDIDATE_NAMES) * (len(folds) + 1)))
+    inner_jobs = max(1, workers // n_parallel)
+    tasks = [
+        delayed(_fit_fold)(
+            name,
+            fold_index,
+            x_train.iloc[train_index],
+            y_train.iloc[train_index],
+            x_train.iloc[test_index],
+            y_train.iloc[test_index],
+            random_state,
+            inner_jobs,
+        )
+        for name in CANDIDATE_NAMES
+        for fold_index, (train_index, test_index) in enumerate(folds, start=1)
+    ]
+    tasks.extend(
+        delayed(_fit_final)(name, x_train_transformed, y_train, x_val_transformed, y_val, random_state, inner_jobs)
+        for name in CANDIDATE_NAMES
+    )
+    results = Parallel(n_jobs=n_parallel)(tasks)
+
+    metrics: Dict[str, Dict[str, Any]] = {name: {"folds": []} for name in CANDIDATE_NAMES}
+    fitted: Dict[str, Any] = {}
+    for result in results:
+        name = result.pop("name")
+        model = result.pop("model", None)
+        if model is None:
+            metrics[name]["folds"].append(result)
+            continue
+        # inner_jobs only sized the fit; served models predict one request at a time.
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=None)
+        fitted[name] = model
+        metrics[name].update(result)
 
     best_model = None
     best_name = ""
-    best_f1 = -1.0
-    metrics: Dict[str, Dict[str, float]] = {}
-
-    for name, model in candidates.items():
-        model.fit(x_train_transformed, y_train)
-        predictions = model.predict(x_val_transformed)
-        f1 = float(f1_score(y_val, predictions, zero_division=0))
-        metrics[name] = {"f1": f1}
-        if f1 > best_f1:
-            best_f1 = f1
+    best_score = -1.0
+    for name in CANDIDATE_NAMES:
+        fold_scores = [fold["f1"] for fold in metrics[name]["folds"]]
+        if fold_scores:
+            metrics[name]["cvF1Mean"] = float(np.mean(fold_scores))
+            metrics[name]["cvF1Std"] = float(np.std(fold_scores))
+        # Selection uses the k-fold mean when CV ran, the single validation split otherwise.
+        score = metrics[name].get("cvF1Mean", metrics[name]["f1"])
+        if score > best_score:
+            best_score = score
             best_name = name
-            best_model = model
+            best_model = fitted.get(name)
 
     if best_model is None:
         raise RuntimeError("Model selection failed. No model was trained.")
 
     feature_importance = compute_global_feature_importance(best_model, transformed_feature_names)
-    background_matrix = _to_dense_array(x_train_transformed)[:200]
+    full_background = _to_dense_array(x_train_transformed)
+    background_matrix, background_weights = summarize_background(
+        full_background, y_train.to_numpy(), background_size, background_method, random_state
+    )
+
+    # Each candidate records how far its attributions move when the summary replaces the full training set.
+    fidelity_rows = _to_dense_array(x_val_transformed)[:FIDELITY_ROWS]
+    for name, model in fitted.items():
+        metrics[name]["backgroundFidelity"] = background_fidelity(
+            model, background_matrix, background_weights, full_background, fidelity_rows, fidelity_tolerance
+        )
 
     return ModelArtifacts(
         model=best_model,
@@ -87,7 +154,207 @@ def train_best_model(dataframe: pd.DataFrame, labels: pd.Series, random_state: i
         feature_importance=feature_importance,
         transformed_feature_names=transformed_feature_names,
         background_matrix=background_matrix,
+        candidate_models=fitted,
+        background_weights=background_weights,
+        training_rows=int(len(y_train)),
+        feature_stats=feature_stats(x_train),
+    )
+
+
+def summarize_background(
+    matrix: np.ndarray,
+    labels: np.ndarray,
+    size: int,
+    method: str = "kmeans",
+    random_state: int = 42,
+) -> Tuple[np.ndarray, np.ndarray | None]:
+    # Returns float32 background rows plus per-row weights (None means uniform). k-means
+    # centers are recomputed as exact cluster means and weighted by cluster size, so the
+    # weighted background mean equals the training mean that linear SHAP depends on.
+    if method not in BACKGROUND_METHODS:
+        raise ValueError(f"Unknown background method: {method}")
+    dense = np.asarray(matrix, dtype=float)
+    if size <= 0 or dense.shape[0] <= size:
+        return dense.astype(np.float32), None
+
+    if method == "stratified":
+        stratify = labels if np.unique(labels).size > 1 and size >= np.unique(labels).size else None
+        indexes, _ = train_test_split(
+            np.arange(dense.shape[0]), train_size=size, random_state=random_state, stratify=stratify
+        )
+        return dense[np.sort(indexes)].astype(np.float32), None
+
+    clustering = MiniBatchKMeans(n_clusters=size, random_state=random_state, n_init=3, batch_size=4096)
+    assignments = clustering.fit_predict(dense)
+    counts = np.bincount(assignments, minlength=size)
+    sums = np.zeros((size, dense.shape[1]), dtype=float)
+    np.add.at(sums, assignments, dense)
+    occupied = counts > 0
+    centers = sums[occupied] / counts[occupied, None]
+    weights = counts[occupied] / counts.sum()
+    return centers.astype(np.float32), weights.astype(np.float32)
+
+
+def feature_stats(dataframe: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    # Training-split distribution per feature, stored with the bundle for sensitivity
+    # analysis: numeric spread and percentiles, categories from most to least frequent.
+    stats: Dict[str, Dict[str, Any]] = {}
+    for key in NUMERIC_FEATURES:
+        values = pd.to_numeric(dataframe[key], errors="coerce").dropna().to_numpy(dtype=float)
+        if values.size == 0:
+            continue
+        stats[key] = {
+            "median": float(np.median(values)),
+            "std": float(values.std()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "integral": bool(np.all(values == np.round(values))),
+            "percentiles": [float(value) for value in np.percentile(values, STAT_PERCENTILES)],
+        }
+    for key in CATEGORICAL_FEATURES:
+        counts = dataframe[key].dropna().astype(str).value_counts()
+        if not counts.empty:
+            stats[key] = {"categories": list(counts.index)}
+    return stats
+
+
+def incremental_update(
+    model: Any,
+    transformed_rows: Any,
+    labels: Any,
+    rows_seen: int,
+    learning_rate: float = 0.01,
+    epochs: int = 5,
+    random_state: int = 42,
+) -> Any | None:
+    # Online logistic-loss SGD started from the fitted coefficients, on rows already
+    # transformed by the fitted preprocessor. Returns an updated copy, or None for models
+    # without a linear decision function (forests need a full rebuild).
+    if not isinstance(model, LogisticRegression) or len(labels) == 0:
+        return None
+    dense = _to_dense_array(transformed_rows)
+    targets = np.asarray(labels, dtype=int)
+
+    # alpha matches LogisticRegression's C penalty once it is spread over every row seen so far.
+    sgd = SGDClassifier(
+        loss="log_loss",
+        alpha=1.0 / (model.C * max(rows_seen + len(targets), 1)),
+        learning_rate="constant",
+        eta0=learning_rate,
+        random_state=random_state,
     )
+    sample_weight = compute_sample_weight("balanced", targets) if model.class_weight == "balanced" else None
+    sgd.partial_fit(dense[:1], targets[:1], classes=model.classes_)
+    sgd.coef_ = np.array(model.coef_, dtype=float)
+    sgd.intercept_ = np.array(model.intercept_, dtype=float)
+    for _ in range(max(epochs, 1)):
+        sgd.partial_fit(dense, targets, sample_weight=sample_weight)
+
+    updated = copy.deepcopy(model)
+    updated.coef_ = sgd.coef_.copy()
+    updated.intercept_ = sgd.intercept_.copy()
+    return updated
+
+
+def numeric_column_moments(transformed_rows: Any, transformed_feature_names: List[str]) -> np.ndarray:
+    # Per-column sums (row 0) and sums of squares (row 1), so drift can be kept up to date
+    # by adding the moments of each new batch.
+    numeric_columns = [index for index, name in enumerate(transformed_feature_names) if name.startswith("num__")]
+    values = _to_dense_array(transformed_rows)[:, numeric_columns]
+    return np.vstack([values.sum(axis=0), np.square(values).sum(axis=0)])
+
+
+def feature_drift(column_moments: np.ndarray, rows: int) -> float:
+    # Numeric columns leave the preprocessor standardized against the training set, so a
+    # column mean is a mean shift in training standard deviations. Only the part of it
+    # beyond DRIFT_NOISE_Z standard errors counts: a few in-distribution rows of a
+    # heavy-tailed feature move the mean a lot. The standard error uses the outcomes' own
+    # spread, but never less than the training one.
+    if rows == 0 or column_moments.size == 0:
+        return 0.0
+    means = column_moments[0] / rows
+    spreads = np.sqrt(np.maximum(column_moments[1] / rows - np.square(means), 1.0))
+    return float(max(np.max(np.abs(means) - DRIFT_NOISE_Z * spreads / np.sqrt(rows)), 0.0))
+
+
+def build_candidate(name: str, random_state: int, n_jobs: int = -1) -> Any:
+    if name == "logistic_regression":
+        return LogisticRegression(
+            max_iter=1500,
+            class_weight="balanced",
+            random_state=random_state,
+        )
+    if name == "random_forest":
+        return RandomForestClassifier(
+            n_estimators=350,
+            class_weight="balanced_subsample",
+            random_state=random_state,
+            n_jobs=n_jobs,
+        )
+    raise ValueError(f"Unknown candidate model: {name}")
+
+
+def resolve_worker_budget(n_workers: int) -> int:
+    if n_workers > 0:
+        return n_workers
+    return os.cpu_count() or 1
+
+
+def _stratified_folds(labels: pd.Series, cv_folds: int, random_state: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    smallest_class = int(labels.value_counts().min()) if labels.nunique() > 1 else 0
+    n_splits = min(cv_folds, smallest_class)
+    if n_splits < 2:
+        return []
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    return list(splitter.split(np.zeros(len(labels)), labels))
+
+
+def _fit_fold(
+    name: str,
+    fold_index: int,
+    x_fit: pd.DataFrame,
+    y_fit: pd.Series,
+    x_score: pd.DataFrame,
+    y_score: pd.Series,
+    random_state: int,
+    n_jobs: int,
+) -> Dict[str, Any]:
+    # The preprocessor is refit inside the fold so imputation/scaling never sees the scoring rows.
+    started = time.perf_counter()
+    preprocessor = build_preprocessor()
+    model = build_candidate(name, random_state, n_jobs)
+    model.fit(preprocessor.fit_transform(x_fit), y_fit)
+    fit_seconds = time.perf_counter() - started
+    predictions = model.predict(preprocessor.transform(x_score))
+    return {
+        "name": name,
+        "fold": fold_index,
+        "f1": float(f1_score(y_score, predictions, zero_division=0)),
+        "fitSeconds": fit_seconds,
+        "totalSeconds": time.perf_counter() - started,
+    }
+
+
+def _fit_final(
+    name: str,
+    x_fit: Any,
+    y_fit: pd.Series,
+    x_score: Any,
+    y_score: pd.Series,
+    random_state: int,
+    n_jobs: int,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    model = build_candidate(name, random_state, n_jobs)
+    model.fit(x_fit, y_fit)
+    fit_seconds = time.perf_counter() - started
+    predictions = model.predict(x_score)
+    return {
+        "name": name,
+        "model": model,
+        "f1": float(f1_score(y_score, predictions, zero_division=0)),
+        "fitSeconds": fit_seconds,
+    }
 
 
 def build_preprocessor() -> ColumnTransformer:
@@ -140,15 +407,6 @@ def compute_global_feature_importance(model: Any, transformed_feature_names: Lis
     return importance
 
 
-def map_transformed_to_base_feature(transformed_name: str) -> str:
-    if transformed_name.startswith("num__"):
-        return transformed_name.replace("num__", "", 1)
-    if transformed_name.startswith("cat__"):
-        tail = transformed_name.replace("cat__", "", 1)
-        return tail.split("_", 1)[0]
-    return transformed_name
-
-
 def _to_dense_array(matrix: Any) -> np.ndarray:
     if sparse.issparse(matrix):
         return matrix.toarray()
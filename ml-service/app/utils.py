@@ -7,11 +7,16 @@ import numpy as np
 from app.feature_map import DISPLAY_NAME_BY_KEY, FEATURE_KEYS, FEATURE_TYPES_BY_KEY, RAW_OR_INTERNAL_TO_KEY, normalize_feature_key
 
 
+# Product-level threshold contract shared with frontend/backend: a probability below a
+# bucket's bound falls in that bucket (or a lower one); everything else is red.
+BUCKET_UPPER_BOUNDS: Dict[str, float] = {"green": 0.33, "yellow": 0.66}
+RISK_BUCKETS = ("green", "yellow", "red")
+
+
 def risk_bucket(probability: float) -> str:
-    # Product-level threshold contract shared with frontend/backend.
-    if probability < 0.33:
+    if probability < BUCKET_UPPER_BOUNDS["green"]:
         return "green"
-    if probability < 0.66:
+    if probability < BUCKET_UPPER_BOUNDS["yellow"]:
         return "yellow"
     return "red"
 
@@ -39,9 +44,11 @@ def convert_value(value: Any, feature_type: str) -> Any:
             return None
         if feature_type == "numeric":
             try:
-                return float(stripped)
+                casted = float(stripped)
             except ValueError:
                 return None
+            # "inf" and "nan" parse too; like non-finite numbers they count as missing.
+            return casted if np.isfinite(casted) else None
         return stripped
 
     if feature_type == "numeric":
@@ -69,3 +76,12 @@ def ensure_feature_frame_dict(input_features: Dict[str, Any]) -> Dict[str, Any]:
 
 def display_name(feature_key: str) -> str:
     return DISPLAY_NAME_BY_KEY.get(feature_key, feature_key)
+
+
+def map_transformed_to_base_feature(transformed_name: str) -> str:
+    if transformed_name.startswith("num__"):
+        return transformed_name.replace("num__", "", 1)
+    if transformed_name.startswith("cat__"):
+        tail = transformed_name.replace("cat__", "", 1)
+        return tail.split("_", 1)[0]
+    return transformed_name
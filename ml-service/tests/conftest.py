@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import dataclasses
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import service  # noqa: E402
+from app.data_loader import load_training_data, resolve_test_dataset_path, resolve_train_dataset_path  # noqa: E402
+from app.utils import ensure_feature_frame_dict  # noqa: E402
+
+# The repository's data/ directory, or DATA_ROOT where the service mounts it.
+DATA_ROOT = Path(os.getenv("DATA_ROOT", Path(__file__).resolve().parents[2] / "data"))
+
+
+@pytest.fixture(scope="session")
+def training_data() -> Tuple[pd.DataFrame, pd.Series]:
+    try:
+        return load_training_data(resolve_train_dataset_path(str(DATA_ROOT), "none.csv"))
+    except FileNotFoundError:
+        pytest.skip(f"no training dataset under {DATA_ROOT}")
+
+
+@pytest.fixture(scope="session")
+def test_rows() -> List[Dict[str, Any]]:
+    # Rows as the service builds them for its holdout set (see _load_holdout).
+    test_path = resolve_test_dataset_path(str(DATA_ROOT))
+    if test_path is None:
+        pytest.skip(f"no test dataset under {DATA_ROOT}")
+    test_df, _ = load_training_data(test_path)
+    records = test_df.astype(object).where(test_df.notna(), None).to_dict("records")
+    return [ensure_feature_frame_dict(record) for record in records]
+
+
+@pytest.fixture(scope="session")
+def edge_case_rows() -> List[Dict[str, Any]]:
+    # Request rows as clients send them: keys missing or unknown, numbers as strings,
+    # unparseable strings, non-finite values and unseen categories.
+    return [
+        {"unknownKey": 1},
+        {"age": "31", "logins": " 12 ", "gender": "never-seen"},
+        {"age": "abc", "percentAttended": ""},
+        {"age": float("nan"), "logins": float("inf"), "totalHoursInModuleArea": float("-inf")},
+        {"age": "inf", "logins": "nan", "percentAttended": "-Infinity"},
+        {"gender": 1, "attendingFromHome": True},
+    ]
+
+
+@pytest.fixture(scope="session")
+def fitted_preprocessor(training_data: Tuple[pd.DataFrame, pd.Series]) -> Any:
+    from app.training import build_preprocessor
+
+    return build_preprocessor().fit(training_data[0])
+
+
+def use_settings(monkeypatch: pytest.MonkeyPatch, artifact_dir: Path, random_state: int = 42) -> None:
+    # Points the service at the test data and an isolated artifact directory. Rebuilds train
+    # in a spawned process, which reads its settings from the environment.
+    overrides = {"data_root": str(DATA_ROOT), "artifact_dir": str(artifact_dir), "data_cache_dir": "", "random_state": random_state}
+    for name, value in overrides.items():
+        monkeypatch.setenv(name.upper(), str(value))
+    patched = dataclasses.replace(service.settings, **overrides)
+    for module in [module for name, module in sys.modules.items() if name.startswith("app.")]:
+        if getattr(module, "settings", None) is service.settings:
+            monkeypatch.setattr(module, "settings", patched)
+
+
+@pytest.fixture(scope="session")
+def trained_artifact(tmp_path_factory: pytest.TempPathFactory, training_data: Tuple[pd.DataFrame, pd.Series]) -> Path:
+    # model.joblib trained once per session from the default settings; tests copy it.
+    artifact_dir = tmp_path_factory.mktemp("trained")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        use_settings(monkeypatch, artifact_dir)
+        service.ModelManager().ensure_ready()
+    return artifact_dir / "model.joblib"
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Any, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.explainability import background_fidelity, build_explainer
+from app.training import build_candidate, summarize_background
+
+# BACKGROUND_FIDELITY_TOLERANCE's default: largest attribution error over the largest attribution.
+TOLERANCE = 0.05
+
+
+def _summary_size(full: np.ndarray) -> int:
+    # BACKGROUND_SIZE's default, or a quarter of the rows for a training set smaller than that.
+    return min(100, max(full.shape[0] // 4, 1))
+
+
+@pytest.fixture(scope="module")
+def linear_setup(fitted_preprocessor: Any, training_data: Tuple[pd.DataFrame, pd.Series]) -> Tuple[Any, np.ndarray, np.ndarray]:
+    pytest.importorskip("shap")
+    features, labels = training_data
+    transformed = fitted_preprocessor.transform(features)
+    full = np.asarray(transformed.toarray() if hasattr(transformed, "toarray") else transformed, dtype=float)
+    model = build_candidate("logistic_regression", 42).fit(full, labels)
+    return model, full, labels.to_numpy()
+
+
+def test_summarized_background_explains_like_the_full_background(linear_setup: Tuple[Any, np.ndarray, np.ndarray]) -> None:
+    model, full, labels = linear_setup
+    background, weights = summarize_background(full, labels, _summary_size(full), "kmeans", 42)
+    assert background.shape[0] < full.shape[0]
+
+    rows = full[:200]
+    summary_values = np.asarray(build_explainer(model, background, weights).shap_values(rows), dtype=float)
+    reference_values = np.asarray(build_explainer(model, full).shap_values(rows), dtype=float)
+    assert np.max(np.abs(summary_values - reference_values)) <= TOLERANCE * np.max(np.abs(reference_values))
+
+
+def test_background_fidelity_reports_the_summary_within_tolerance(linear_setup: Tuple[Any, np.ndarray, np.ndarray]) -> None:
+    model, full, labels = linear_setup
+    background, weights = summarize_background(full, labels, _summary_size(full), "kmeans", 42)
+
+    fidelity = background_fidelity(model, background, weights, full, full[:200], TOLERANCE)
+    assert fidelity["applicable"]
+    assert fidelity["withinTolerance"], fidelity
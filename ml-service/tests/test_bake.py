@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from app import bake as bake_module
+from app import service
+from app.service import ModelManager
+
+from conftest import use_settings
+
+
+@pytest.fixture
+def stale_artifact_dir(tmp_path: Path, trained_artifact: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    # An image built with RANDOM_STATE=7 on top of an artifact trained for 42.
+    shutil.copy(trained_artifact, tmp_path / "model.joblib")
+    use_settings(monkeypatch, tmp_path, random_state=7)
+    return tmp_path
+
+
+def test_bake_rebuilds_stale_artifact(stale_artifact_dir: Path) -> None:
+    report = bake_module.bake()
+
+    assert report["source"] == "stale"
+    assert report["startup"]["warm"]["state"] == "done"
+    assert "seconds" in report["startup"]["warm"]
+    assert report["artifactKey"] == service.artifact_key()
+
+
+def test_bake_fails_when_stale_rebuild_fails(stale_artifact_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def reject(self: ModelManager, artifact_path: str, validate: bool = True) -> dict:
+        return {"accepted": False, "reason": "rejected by test"}
+
+    monkeypatch.setattr(ModelManager, "_accept_candidate", reject)
+
+    with pytest.raises(RuntimeError, match="rejected"):
+        bake_module.bake()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from app.cache import PredictionCache, estimate_bytes
+
+
+def _prediction(explanations: int) -> Dict[str, Any]:
+    return {
+        "probability": 0.4,
+        "label": 0,
+        "bucket": "yellow",
+        "explanations": [{"feature": f"feature{index}", "shapValue": 0.01 * index} for index in range(explanations)],
+        "explanationMode": "shap" if explanations else "none",
+    }
+
+
+def test_byte_cap_evicts_least_recent_entries() -> None:
+    large = _prediction(40)
+    entry_bytes = estimate_bytes(("v1", 0)) + estimate_bytes(large)
+    cache = PredictionCache(max_entries=100, ttl_seconds=0, max_bytes=3 * entry_bytes)
+
+    for index in range(5):
+        cache.put(("v1", index), large)
+
+    stats = cache.stats()
+    assert stats["size"] == 3
+    assert stats["bytes"] <= stats["maxBytes"]
+    assert cache.get(("v1", 0)) is None
+    assert cache.get(("v1", 4)) == large
+
+
+def test_byte_cap_holds_more_small_entries_than_large_ones() -> None:
+    small, large = _prediction(0), _prediction(40)
+    max_bytes = 10 * (estimate_bytes(("v1", 0)) + estimate_bytes(large))
+    small_cache = PredictionCache(max_entries=1000, ttl_seconds=0, max_bytes=max_bytes)
+    large_cache = PredictionCache(max_entries=1000, ttl_seconds=0, max_bytes=max_bytes)
+
+    for index in range(200):
+        small_cache.put(("v1", index), small)
+        large_cache.put(("v1", index), large)
+
+    assert large_cache.stats()["size"] == 10
+    assert small_cache.stats()["size"] > 5 * large_cache.stats()["size"]
+
+
+def test_replacing_and_clearing_entries_keeps_the_byte_count() -> None:
+    cache = PredictionCache(max_entries=10, ttl_seconds=0, max_bytes=1 << 20)
+
+    cache.put(("v1", 0), _prediction(40))
+    cache.put(("v1", 0), _prediction(0))
+    assert cache.stats()["bytes"] == estimate_bytes(("v1", 0)) + estimate_bytes(_prediction(0))
+
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.compiled_preprocessor import compile_preprocessor, max_parity_error
+from app.feature_map import CATEGORICAL_FEATURES, FEATURE_KEYS, NUMERIC_FEATURES
+from app.utils import ensure_feature_frame_dict
+
+
+def _sklearn_transform(preprocessor: Any, rows: List[Dict[str, Any]]) -> np.ndarray:
+    transformed = preprocessor.transform(pd.DataFrame(rows, columns=FEATURE_KEYS))
+    return np.asarray(transformed.toarray() if hasattr(transformed, "toarray") else transformed, dtype=np.float64)
+
+
+def test_compiled_matches_sklearn_on_every_test_row(fitted_preprocessor: Any, test_rows: List[Dict[str, Any]]) -> None:
+    compiled = compile_preprocessor(fitted_preprocessor)
+
+    # The test split has empty cells, so imputation is covered by the real rows too.
+    assert any(pd.isna(value) for row in test_rows for value in row.values())
+    # Bit for bit, as the warm-up gate requires before it serves the compiled path.
+    assert np.array_equal(compiled.transform_rows(test_rows), _sklearn_transform(fitted_preprocessor, test_rows))
+    assert max_parity_error(compiled, fitted_preprocessor, test_rows) == 0.0
+
+
+def test_compiled_matches_sklearn_on_missing_and_unseen_values(
+    fitted_preprocessor: Any, test_rows: List[Dict[str, Any]]
+) -> None:
+    compiled = compile_preprocessor(fitted_preprocessor)
+    rows = [
+        ensure_feature_frame_dict({}),
+        ensure_feature_frame_dict({key: "never-seen" for key in CATEGORICAL_FEATURES}),
+        ensure_feature_frame_dict({key: None for key in NUMERIC_FEATURES} | {"gender": "never-seen"}),
+    ]
+    # Each test row once more with every categorical value replaced by an unseen one.
+    rows.extend({**row, **{key: "never-seen" for key in CATEGORICAL_FEATURES}} for row in test_rows)
+
+    assert np.array_equal(compiled.transform_rows(rows), _sklearn_transform(fitted_preprocessor, rows))
+    assert max_parity_error(compiled, fitted_preprocessor, rows) == 0.0
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+
+from app.service import COURSE_RISK_FEATURE_KEYS, ModelManager
+
+
+@pytest.fixture
+def manager(tmp_path: Path) -> ModelManager:
+    # The course-risk scorer needs no trained bundle.
+    return ModelManager(artifact_dir=str(tmp_path))
+
+
+def _random_rows(count: int) -> List[Dict[str, Any]]:
+    # Values around and beyond every clamp, with keys dropped at random.
+    rng = np.random.default_rng(7)
+    rows = []
+    for _ in range(count):
+        values = rng.uniform(-150.0, 150.0, len(COURSE_RISK_FEATURE_KEYS))
+        keep = rng.random(len(COURSE_RISK_FEATURE_KEYS)) > 0.2
+        rows.append({key: float(value) for key, value, kept in zip(COURSE_RISK_FEATURE_KEYS, values, keep) if kept})
+    return rows
+
+
+EDGE_ROWS: List[Dict[str, Any]] = [
+    {},
+    {"unknownKey": 3.0},
+    {"weightedPercent": 55.0},
+    {"totalAbsences": 45.0, "absencesRate": None},
+    {"weightedPercent": "62.5", "missingWeeksCount": " 4 "},
+    {"weightedPercent": "abc", "quizTrend": "-0.3"},
+    {"weightedPercent": float("nan"), "maxAchievablePercent": float("inf"), "absencesRate": float("-inf")},
+    {"weightedPercent": "inf", "remainingWeight": "nan", "quizTrend": -1e300},
+    {"examCompletedRatio": True, "missingWeeksCount": 1},
+]
+
+
+@pytest.mark.parametrize("rows", [_random_rows(5000), EDGE_ROWS], ids=["random", "edge"])
+def test_batch_matches_scalar_scorer(manager: ModelManager, rows: List[Dict[str, Any]]) -> None:
+    batch = manager.predict_course_risk_many(rows)["probabilityFail"]
+
+    assert batch == [manager.predict_course_risk(row)["probabilityFail"] for row in rows]
+
+
+def test_one_unparseable_row_does_not_change_the_others(manager: ModelManager) -> None:
+    rows = _random_rows(50)
+    clean = manager.predict_course_risk_many(rows)["probabilityFail"]
+
+    mixed = manager.predict_course_risk_many(rows + [{"weightedPercent": "abc"}])["probabilityFail"]
+
+    assert mixed[:-1] == clean
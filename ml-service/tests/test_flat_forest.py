@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.feature_map import FEATURE_KEYS
+from app.forest import FlatForest, flatten_forest
+from app.training import build_candidate
+from app.utils import ensure_feature_frame_dict
+
+
+def _dense(matrix: Any) -> np.ndarray:
+    return np.asarray(matrix.toarray() if hasattr(matrix, "toarray") else matrix, dtype=np.float64)
+
+
+@pytest.fixture(scope="module")
+def forest(fitted_preprocessor: Any, training_data: Tuple[pd.DataFrame, pd.Series]) -> Tuple[Any, FlatForest]:
+    features, labels = training_data
+    model = build_candidate("random_forest", 42, n_jobs=1).fit(_dense(fitted_preprocessor.transform(features)), labels)
+    return model, flatten_forest(model)
+
+
+def _served_matrix(preprocessor: Any, rows: List[Dict[str, Any]]) -> np.ndarray:
+    # Rows as the service scores them: normalized, then through the fitted preprocessor.
+    normalized = [ensure_feature_frame_dict(row) for row in rows]
+    return _dense(preprocessor.transform(pd.DataFrame(normalized, columns=FEATURE_KEYS)))
+
+
+def test_flat_forest_matches_predict_proba_on_served_rows(
+    forest: Tuple[Any, FlatForest],
+    fitted_preprocessor: Any,
+    test_rows: List[Dict[str, Any]],
+    edge_case_rows: List[Dict[str, Any]],
+) -> None:
+    model, flat = forest
+    matrix = _served_matrix(fitted_preprocessor, test_rows + edge_case_rows)
+
+    assert np.array_equal(flat.predict_proba(matrix), model.predict_proba(matrix))
+
+
+def test_flat_forest_matches_predict_proba_at_split_thresholds(forest: Tuple[Any, FlatForest]) -> None:
+    # Values on, just below and just above every threshold exercise the float32 rounding,
+    # and values far outside the training range every extreme branch.
+    model, flat = forest
+    rng = np.random.default_rng(0)
+    thresholds = np.concatenate([estimator.tree_.threshold[estimator.tree_.feature >= 0] for estimator in model.estimators_])
+    picked = rng.choice(thresholds, size=(2000, model.n_features_in_))
+    matrix = np.vstack(
+        [
+            picked,
+            np.nextafter(picked, -np.inf),
+            np.nextafter(picked, np.inf),
+            rng.normal(0.0, 50.0, size=(500, model.n_features_in_)),
+        ]
+    )
+
+    assert np.array_equal(flat.predict_proba(matrix), model.predict_proba(matrix))
+
+
+def test_flat_forest_routes_missing_values_like_sklearn(training_data: Tuple[pd.DataFrame, pd.Series]) -> None:
+    # Forests fitted on NaN learn a direction for missing values at each split.
+    features, labels = training_data
+    numeric = features.select_dtypes("number").to_numpy(dtype=np.float64)
+    model = build_candidate("random_forest", 42, n_jobs=1).fit(numeric, labels)
+    flat = flatten_forest(model)
+    rng = np.random.default_rng(1)
+    matrix = np.where(rng.random((1000, numeric.shape[1])) < 0.3, np.nan, numeric[rng.integers(0, len(numeric), 1000)])
+
+    assert np.array_equal(flat.predict_proba(matrix), model.predict_proba(matrix))
+
+
+def test_path_contributions_add_up_to_the_probability(
+    forest: Tuple[Any, FlatForest], fitted_preprocessor: Any, test_rows: List[Dict[str, Any]]
+) -> None:
+    model, flat = forest
+    matrix = _served_matrix(fitted_preprocessor, test_rows)
+
+    totals = flat.expected_value() + flat.path_contributions(matrix).sum(axis=1)
+
+    assert np.allclose(totals, model.predict_proba(matrix)[:, 1])
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+from typing import Any, Tuple
+
+import pandas as pd
+import pytest
+
+from app.config import settings
+from app.feature_map import NUMERIC_FEATURES
+from app.service import ModelManager
+from app.training import feature_drift, numeric_column_moments
+
+from conftest import use_settings
+
+BATCH_ROWS = 10
+
+
+@pytest.fixture
+def manager(tmp_path: Path, trained_artifact: Path, monkeypatch: pytest.MonkeyPatch) -> ModelManager:
+    shutil.copy(trained_artifact, tmp_path / "model.joblib")
+    use_settings(monkeypatch, tmp_path)
+    manager = ModelManager()
+    manager.ensure_ready()
+    return manager
+
+
+def test_in_distribution_outcomes_do_not_trigger_rebuild(
+    manager: ModelManager, training_data: Tuple[pd.DataFrame, pd.Series]
+) -> None:
+    # The model's own training rows, ingested a few at a time as early outcomes arrive.
+    features, labels = training_data
+    records = features.astype(object).where(features.notna(), None).to_dict("records")
+    for start in range(0, len(records), BATCH_ROWS):
+        result = manager.ingest_outcomes(records[start : start + BATCH_ROWS], labels.iloc[start : start + BATCH_ROWS].tolist())
+
+        assert result["drift"] < settings.outcome_drift_threshold
+        assert result["rebuild"] is None
+        assert result["update"] is not None
+    assert manager.retrain_status()["state"] == "idle"
+
+
+def test_shifted_outcomes_register_drift(fitted_preprocessor: Any, training_data: Tuple[pd.DataFrame, pd.Series]) -> None:
+    features = training_data[0]
+    names = list(fitted_preprocessor.get_feature_names_out())
+    numeric = NUMERIC_FEATURES[0]
+    shifted = features.copy()
+    shifted[numeric] = shifted[numeric] + 3 * features[numeric].std()
+
+    in_distribution = feature_drift(numeric_column_moments(fitted_preprocessor.transform(features), names), len(features))
+    drifted = feature_drift(numeric_column_moments(fitted_preprocessor.transform(shifted), names), len(shifted))
+
+    assert in_distribution == 0.0
+    assert drifted >= settings.outcome_drift_threshold
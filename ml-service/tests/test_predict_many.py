@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from app.config import settings
+from app.service import ModelManager
+
+from conftest import use_settings
+
+
+@pytest.fixture
+def manager(trained_artifact: Path, monkeypatch: pytest.MonkeyPatch) -> ModelManager:
+    # No prediction cache: every per-row call is scored, not answered from the batch's entries.
+    use_settings(monkeypatch, trained_artifact.parent)
+    manager = ModelManager(artifact_path=trained_artifact, read_only=True, prediction_cache_size=0)
+    manager.warm()
+    return manager
+
+
+@pytest.fixture
+def rows(test_rows: List[Dict[str, Any]], edge_case_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return test_rows + edge_case_rows
+
+
+@pytest.mark.parametrize("mode", ["none", "fast", "shap"])
+def test_predict_many_matches_per_row_predict(manager: ModelManager, rows: List[Dict[str, Any]], mode: str) -> None:
+    batch = manager.predict_many(rows, mode, top_k=100)
+
+    for index, (result, row) in enumerate(zip(batch, rows)):
+        assert result == {"index": index, **manager.predict(row, mode, top_k=100)}
+
+
+def test_predict_many_matches_per_row_predict_above_flat_forest_rows(manager: ModelManager, rows: List[Dict[str, Any]]) -> None:
+    # Batches over FLAT_FOREST_MAX_ROWS are scored by the fitted forest instead.
+    repeats = settings.flat_forest_max_rows // len(rows) + 1
+    batch = manager.predict_many(rows * repeats, "none")
+
+    single = [manager.predict(row, "none") for row in rows]
+    assert [{key: value for key, value in result.items() if key != "index"} for result in batch] == single * repeats
+
+
+def test_predict_many_keeps_invalid_rows_in_place(manager: ModelManager, rows: List[Dict[str, Any]]) -> None:
+    batch = manager.predict_many([rows[0], {}, "not a row", rows[1]], "none")
+
+    assert [result["index"] for result in batch] == [0, 1, 2, 3]
+    assert batch[1]["error"] == "features must not be empty"
+    assert batch[2]["error"] == "features must be an object"
+    assert batch[0]["probability"] == manager.predict(rows[0], "none")["probability"]
+    assert batch[3]["probability"] == manager.predict(rows[1], "none")["probability"]